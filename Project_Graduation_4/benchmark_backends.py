@@ -0,0 +1,112 @@
+import argparse
+import statistics
+from typing import Dict, List, Optional
+
+import config
+from core.ai import AIEngine
+from core.backends import BACKENDS
+from test_model_batch import collect_images, evaluate_images, percentile
+
+
+def evaluate_backend(name: str, img_paths: List[str], batch_size: int) -> Optional[Dict]:
+    """Run the batch evaluation with one inference backend."""
+    if not BACKENDS[name].available():
+        print(f"[BACKEND] {name}: not installed, skipping")
+        return None
+
+    config.INFERENCE_BACKEND = name
+    config.INFERENCE_PROCESS = False
+    ai = AIEngine(model_path=config.MODEL_PATH, config=config)
+    ai.debug_mode = False
+    if not ai.model_loaded or ai.backend.name != name:
+        print(f"[BACKEND] {name}: model not loaded, skipping")
+        ai.shutdown()
+        return None
+
+    rows, times, counts, infer_time = evaluate_images(ai, img_paths, batch_size)
+    ai.shutdown()
+    if not times:
+        return None
+
+    labelled = counts["expected_ok"] + counts["expected_ng"]
+    return {
+        "backend": name,
+        "description": ai.backend.describe(),
+        "results": {row.path: row.result for row in rows},
+        "mean_ms": statistics.mean(times),
+        "p95_ms": percentile(times, 0.95),
+        "throughput": counts["total"] / infer_time if infer_time > 0 else 0.0,
+        "accuracy": (counts["tp_ok"] + counts["tp_ng"]) / labelled * 100 if labelled else None,
+        "false_pass": counts["fp_ok"],
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Compare latency and OK/NG agreement of the inference backends on this board."
+    )
+    parser.add_argument("--images", default="captures", help="Images to evaluate (default: captures).")
+    parser.add_argument("--backends", nargs="*", default=list(BACKENDS),
+                        help=f"Backends to compare, first is the baseline (default: {' '.join(BACKENDS)}).")
+    parser.add_argument("--limit", type=int, default=0, help="Limit images (0 = no limit).")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--min-agreement", type=float, default=99.0,
+                        help="Minimum OK/NG agreement with the baseline in percent (default 99).")
+    args = parser.parse_args()
+
+    unknown = [b for b in args.backends if b not in BACKENDS]
+    if unknown:
+        print(f"[BACKEND] Unknown backend(s) {unknown}, expected {list(BACKENDS)}")
+        return 2
+
+    img_paths = collect_images(args.images)
+    if args.limit and args.limit > 0:
+        img_paths = img_paths[: args.limit]
+    if not img_paths:
+        print(f"[BACKEND] No images found under: {args.images}")
+        return 2
+
+    configured = getattr(config, "INFERENCE_BACKEND", "ncnn")
+    results = []
+    for name in args.backends:
+        print(f"[BACKEND] Evaluating {name} on {len(img_paths)} images...")
+        r = evaluate_backend(name, img_paths, args.batch_size)
+        if r is not None:
+            results.append(r)
+
+    if not results:
+        print("[BACKEND] No backend could be evaluated.")
+        return 2
+
+    baseline = results[0]
+    for r in results:
+        common = [p for p in baseline["results"] if p in r["results"]]
+        same = sum(1 for p in common if baseline["results"][p] == r["results"][p])
+        r["agreement"] = same / len(common) * 100 if common else 0.0
+
+    print("\n" + "=" * 78)
+    print("[BACKEND] Inference backend vs latency / agreement with baseline")
+    print("=" * 78)
+    print(f"Images:    {args.images} ({len(img_paths)})")
+    print(f"Model:     {config.MODEL_PATH}")
+    print(f"Baseline:  {baseline['backend']}")
+    print()
+    print(f"{'backend':>12}{'mean ms':>10}{'p95 ms':>10}{'img/s':>10}{'agree':>9}{'accuracy':>10}{'NG->OK':>8}  runtime")
+    for r in sorted(results, key=lambda r: r["mean_ms"]):
+        accuracy = f"{r['accuracy']:9.1f}%" if r["accuracy"] is not None else f"{'-':>10}"
+        print(f"{r['backend']:>12}{r['mean_ms']:10.1f}{r['p95_ms']:10.1f}{r['throughput']:10.1f}"
+              f"{r['agreement']:8.1f}%{accuracy}{r['false_pass']:8d}  {r['description']}")
+
+    safe = [r for r in results if r["agreement"] >= args.min_agreement and r["false_pass"] <= baseline["false_pass"]]
+    best = min(safe, key=lambda r: r["mean_ms"])
+    print()
+    print(f"[BACKEND] Fastest backend with >= {args.min_agreement:.1f}% agreement and no extra false passes: "
+          f"{best['backend']} ({best['mean_ms']:.1f} ms)")
+    if best["backend"] != configured:
+        print(f"[BACKEND] To use it set INFERENCE_BACKEND = \"{best['backend']}\" in config.py")
+
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
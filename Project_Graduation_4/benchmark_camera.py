@@ -0,0 +1,176 @@
+import argparse
+import resource
+import threading
+import time
+from typing import Dict, List
+
+import cv2
+import numpy as np
+
+import config
+from core.camera import Camera
+
+
+def parse_source(source: str):
+    """Camera index ('0') or video file / stream URL."""
+    return int(source) if source.isdigit() else source
+
+
+def minor_faults() -> int:
+    """Page faults of this process; every fresh frame-sized buffer adds ~size/4096."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_minflt
+
+
+def run_legacy(source, seconds: float, ui_fps: float, snapshot_interval: float) -> Dict:
+    """Previous pipeline: cap.read() per frame, copy per reader, allocating cvtColor/resize in the UI."""
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        return {}
+    roi_camera = Camera(width=config.CAMERA_WIDTH, height=config.CAMERA_HEIGHT)  # ROI crop helper only
+    roi_active = roi_camera.geometry.crop_size != (roi_camera.width, roi_camera.height)
+
+    allocations = 0
+    frames = 0
+    latest = None
+    lock = threading.Lock()
+    running = True
+
+    def capture():
+        nonlocal allocations, frames, latest
+        while running:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            with lock:
+                latest = frame
+                allocations += 1
+                frames += 1
+
+    def read_frame():
+        nonlocal allocations
+        with lock:
+            if latest is None:
+                return None
+            frame = latest.copy()
+            allocations += 1
+        cropped = roi_camera._apply_roi_crop(frame) if roi_active else frame
+        if cropped is not frame:
+            with lock:
+                allocations += 1
+        return cropped
+
+    thread = threading.Thread(target=capture, daemon=True)
+    faults = minor_faults()
+    thread.start()
+    reads = consumer_loop(read_frame_ui=lambda: legacy_ui(read_frame), snapshot=read_frame,
+                          seconds=seconds, ui_fps=ui_fps, snapshot_interval=snapshot_interval)
+    running = False
+    thread.join()
+    cap.release()
+
+    with lock:
+        allocations += reads["ui"] * 2  # cvtColor + resize without dst
+    return {"frames": frames, "decoded": frames, "allocations": allocations,
+            "faults": minor_faults() - faults, **reads}
+
+
+def legacy_ui(read_frame):
+    frame = read_frame()
+    if frame is not None:
+        cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB), (640, 480))
+    return frame is not None
+
+
+def run_current(source, seconds: float, ui_fps: float, snapshot_interval: float) -> Dict:
+    """Camera as shipped: grab/retrieve into ring slots, borrowed views for the UI, raw ROI crops for inspection."""
+    camera = Camera(camera_id=source, width=config.CAMERA_WIDTH, height=config.CAMERA_HEIGHT,
+                    fps=config.CAMERA_FPS, exposure=config.CAMERA_EXPOSURE,
+                    auto_exposure=config.CAMERA_AUTO_EXPOSURE)
+    if not camera.start():
+        return {}
+
+    display = np.empty((480, 640, 3), dtype=np.uint8)
+    scaled = np.empty((480, 640, 3), dtype=np.uint8)
+
+    def ui():
+        with camera.frame_view() as frame:
+            if frame is None:
+                return False
+            if frame.shape[:2] != (480, 640):
+                frame = cv2.resize(frame, (640, 480), dst=scaled)
+            cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=display)
+        return True
+
+    faults = minor_faults()
+    reads = consumer_loop(read_frame_ui=ui, snapshot=lambda: camera.capture_snapshot(raw=True),
+                          seconds=seconds, ui_fps=ui_fps, snapshot_interval=snapshot_interval)
+    stats = camera.get_capture_stats()
+    camera.stop()
+
+    return {"frames": stats["grabbed"], "decoded": stats["decoded"],
+            "allocations": stats["reallocated"] + stats["copies"],
+            "faults": minor_faults() - faults, **reads}
+
+
+def consumer_loop(read_frame_ui, snapshot, seconds: float, ui_fps: float, snapshot_interval: float) -> Dict:
+    """Live view at ui_fps plus one inspection snapshot every snapshot_interval."""
+    ui_reads = snapshots = 0
+    ui_ms: List[float] = []
+    start = time.monotonic()
+    next_ui = next_snapshot = start
+    while time.monotonic() - start < seconds:
+        now = time.monotonic()
+        if now >= next_ui:
+            t0 = time.perf_counter()
+            if read_frame_ui():
+                ui_reads += 1
+                ui_ms.append((time.perf_counter() - t0) * 1000.0)
+            next_ui += 1.0 / ui_fps
+        if now >= next_snapshot:
+            if snapshot() is not None:
+                snapshots += 1
+            next_snapshot += snapshot_interval
+        time.sleep(0.001)
+    return {"ui": ui_reads, "snapshots": snapshots, "ui_ms": float(np.mean(ui_ms)) if ui_ms else 0.0}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Measure per-frame buffer allocations of the old and current camera pipelines."
+    )
+    parser.add_argument("--source", default=str(getattr(config, "CAMERA_ID", 0)),
+                        help="Camera index or video file (default: CAMERA_ID).")
+    parser.add_argument("--seconds", type=float, default=5.0, help="Duration per pipeline (default 5).")
+    parser.add_argument("--ui-fps", type=float, default=30.0, help="Live view refresh rate (default 30).")
+    parser.add_argument("--snapshot-interval", type=float, default=0.5,
+                        help="Seconds between inspection snapshots (default 0.5).")
+    args = parser.parse_args()
+
+    source = parse_source(args.source)
+    results = {}
+    for name, run in (("legacy", run_legacy), ("current", run_current)):
+        print(f"[CAMERA] {name}: {args.seconds:.0f}s on {args.source}...")
+        r = run(source, args.seconds, args.ui_fps, args.snapshot_interval)
+        if not r or not r["frames"]:
+            print(f"[CAMERA] {name}: no frames from {args.source}")
+            return 2
+        results[name] = r
+
+    print("\n" + "=" * 78)
+    print("[CAMERA] Frame buffer allocations (frame-sized arrays)")
+    print("=" * 78)
+    print(f"Source:  {args.source}, live view {args.ui_fps:.0f} FPS, "
+          f"snapshot every {args.snapshot_interval}s, ROI crop {'on' if config.ENABLE_ROI_CROP else 'off'}")
+    print()
+    print(f"{'':10}{'frames':>8}{'decoded':>9}{'allocs':>8}{'per frame':>11}{'faults/frame':>14}{'UI ms':>8}")
+    for name, r in results.items():
+        print(f"{name:10}{r['frames']:8d}{r['decoded']:9d}{r['allocations']:8d}"
+              f"{r['allocations'] / r['frames']:11.2f}{r['faults'] / r['frames']:14.1f}{r['ui_ms']:8.2f}")
+    print()
+    print("[CAMERA] allocs = new frame buffers (capture, reader copies, UI conversions)")
+    print("[CAMERA] faults = minor page faults; fresh buffers fault in, reused ones do not")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
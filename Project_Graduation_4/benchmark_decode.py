@@ -0,0 +1,166 @@
+import argparse
+import statistics
+import time
+from typing import List, Tuple
+
+import cv2
+import numpy as np
+
+import config
+from core.ai import AIEngine
+from test_model_batch import collect_images, percentile
+
+
+def legacy_parse_loop(output_np: np.ndarray, img_w: int, img_h: int, input_size: Tuple[int, int],
+                      class_names: List[str], threshold: float) -> List[dict]:
+    """Reference copy of the original per-anchor Python loop decoder."""
+    detections = []
+
+    if len(output_np.shape) == 3:
+        output_np = output_np[0]
+    if output_np.shape[0] < output_np.shape[1]:
+        output_np = output_np.T
+
+    num_classes = len(class_names)
+    scale_x = img_w / input_size[0]
+    scale_y = img_h / input_size[1]
+
+    for i in range(min(output_np.shape[0], 8400)):
+        detection = output_np[i]
+        if len(detection) < 4 + num_classes:
+            continue
+
+        x_center = detection[0] * scale_x
+        y_center = detection[1] * scale_y
+        width = detection[2] * scale_x
+        height = detection[3] * scale_y
+
+        class_scores = detection[4:4 + num_classes]
+        class_id = np.argmax(class_scores)
+        confidence = float(class_scores[class_id])
+
+        if confidence > threshold:
+            x1 = max(0, min(int(x_center - width / 2), img_w))
+            y1 = max(0, min(int(y_center - height / 2), img_h))
+            x2 = max(0, min(int(x_center + width / 2), img_w))
+            y2 = max(0, min(int(y_center + height / 2), img_h))
+            if x2 > x1 and y2 > y1:
+                detections.append({
+                    'class_id': int(class_id),
+                    'class_name': class_names[class_id],
+                    'confidence': confidence,
+                    'bbox': [x1, y1, x2, y2]
+                })
+
+    return detections
+
+
+def synthetic_output(rng: np.random.Generator, num_classes: int, num_anchors: int,
+                     num_hot: int, input_size: Tuple[int, int]) -> np.ndarray:
+    """Build a YOLOv8-shaped (4+num_classes, num_anchors) tensor with a few confident anchors."""
+    out = np.empty((4 + num_classes, num_anchors), dtype=np.float32)
+    out[0] = rng.uniform(0, input_size[0], size=num_anchors)
+    out[1] = rng.uniform(0, input_size[1], size=num_anchors)
+    out[2:4] = rng.uniform(8, min(input_size) / 3, size=(2, num_anchors))
+    out[4:] = rng.uniform(0, 0.3, size=(num_classes, num_anchors))
+
+    hot = rng.choice(num_anchors, size=num_hot, replace=False)
+    out[4 + rng.integers(0, num_classes, size=num_hot), hot] = rng.uniform(0.5, 1.0, size=num_hot)
+    return out
+
+
+def real_outputs(ai: AIEngine, img_paths: List[str]) -> List[Tuple[np.ndarray, int, int]]:
+    """Run the network once per image and keep the raw output tensors."""
+    outputs = []
+    for p in img_paths:
+        img = cv2.imread(p)
+        if img is None:
+            continue
+        blob, _ = ai._preprocess(img)
+        out = ai.backend.infer(ai.net, blob)
+        if out is not None:
+            outputs.append((np.array(out), img.shape[1], img.shape[0]))
+    return outputs
+
+
+def time_ms(fn, repeat: int) -> List[float]:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000.0)
+    return times
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare the loop and vectorized YOLOv8 output decoders.")
+    parser.add_argument("--images", default="", help="Decode real model outputs for images in this folder.")
+    parser.add_argument("--limit", type=int, default=20, help="Max images / synthetic frames (default 20).")
+    parser.add_argument("--hot", type=int, default=40, help="Confident anchors per synthetic frame.")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed repetitions per frame.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    config.INFERENCE_PROCESS = False  # Decoding is timed on this process's net
+    ai = AIEngine(model_path=config.MODEL_PATH, config=config)
+    ai.debug_mode = False
+    ai.letterbox = False  # the reference loop only knows the stretch mapping
+    num_classes = len(ai.class_names)
+    input_size = (ai.input_w, ai.input_h)
+
+    if args.images:
+        if not ai.model_loaded:
+            print("[BENCH] Model not loaded, cannot decode real outputs.")
+            return 2
+        frames = real_outputs(ai, collect_images(args.images)[: args.limit])
+        source = f"model outputs ({args.images})"
+    else:
+        rng = np.random.default_rng(args.seed)
+        frames = [
+            (synthetic_output(rng, num_classes, 8400, args.hot, input_size),
+             config.CAMERA_WIDTH, config.CAMERA_HEIGHT)
+            for _ in range(args.limit)
+        ]
+        source = f"synthetic ({args.hot} confident anchors/frame)"
+
+    if not frames:
+        print("[BENCH] No frames to decode.")
+        return 2
+
+    loop_times: List[float] = []
+    vec_times: List[float] = []
+    mismatches = 0
+
+    for output_np, img_w, img_h in frames:
+        legacy = legacy_parse_loop(output_np, img_w, img_h, input_size,
+                                   ai.class_names, ai.confidence_threshold)
+        boxes, scores, class_ids = ai._parse_ncnn_output(output_np, img_w, img_h)
+
+        expected = sorted((d['class_id'], tuple(d['bbox'])) for d in legacy)
+        got = sorted(zip(class_ids.tolist(), map(tuple, boxes.tolist())))
+        if expected != got:
+            mismatches += 1
+
+        loop_times.extend(time_ms(lambda: legacy_parse_loop(
+            output_np, img_w, img_h, input_size, ai.class_names, ai.confidence_threshold), args.repeat))
+        vec_times.extend(time_ms(lambda: ai._parse_ncnn_output(output_np, img_w, img_h), args.repeat))
+
+    print("\n" + "=" * 70)
+    print("[BENCH] Decoder timing per frame (ms)")
+    print("=" * 70)
+    print(f"Source:      {source}")
+    print(f"Frames:      {len(frames)} x {args.repeat} repeats")
+    print(f"Mismatches:  {mismatches}")
+    print()
+    print(f"{'':12}{'mean':>10}{'median':>10}{'p95':>10}")
+    for name, times in (("loop", loop_times), ("vectorized", vec_times)):
+        print(f"{name:12}{statistics.mean(times):10.3f}{statistics.median(times):10.3f}"
+              f"{percentile(times, 0.95):10.3f}")
+    print()
+    print(f"Speedup (median): {statistics.median(loop_times) / max(statistics.median(vec_times), 1e-9):.1f}x")
+
+    return 0 if mismatches == 0 else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,120 @@
+import argparse
+import statistics
+import threading
+import time
+from typing import Dict, List
+
+import cv2
+import numpy as np
+
+import config
+from core.ai import AIEngine
+from test_model_batch import collect_images, percentile
+
+
+class JitterProbe:
+    """Thread that wakes every interval and records how late it woke (stand-in for Tk / serial threads)."""
+
+    def __init__(self, interval: float = 0.002):
+        self.interval = interval
+        self.lateness: List[float] = []
+        self.running = False
+        self.thread = None
+
+    def start(self) -> None:
+        self.running = True
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.running = False
+        self.thread.join()
+
+    def _loop(self) -> None:
+        while self.running:
+            start = time.perf_counter()
+            time.sleep(self.interval)
+            self.lateness.append((time.perf_counter() - start - self.interval) * 1000.0)
+
+
+def run_mode(in_process: bool, frames: List[np.ndarray], warmup: int) -> Dict:
+    """Inspect every frame once in one mode, timing trigger -> decision and the full result."""
+    config.INFERENCE_PROCESS = not in_process
+    ai = AIEngine(model_path=config.MODEL_PATH, config=config)
+    ai.debug_mode = False
+    if not ai.model_loaded:
+        print("[BENCH] Model not loaded, skipping")
+        ai.shutdown()
+        return {}
+
+    for frame in frames[:warmup]:
+        ai.predict(frame)
+
+    decision_ms: List[float] = []
+    total_ms: List[float] = []
+    probe = JitterProbe()
+    probe.start()
+    for frame in frames:
+        start = time.perf_counter()
+        decided: List[float] = []
+        ai.predict(frame, on_decision=lambda _: decided.append(time.perf_counter()))
+        total_ms.append((time.perf_counter() - start) * 1000.0)
+        decision_ms.append((decided[0] - start) * 1000.0)
+    probe.stop()
+
+    stats = ai.server.get_stats() if ai.server else None
+    ai.shutdown()
+    return {"decision": decision_ms, "total": total_ms, "jitter": probe.lateness, "server": stats}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Compare decision latency and thread jitter of in-process vs process-isolated inference."
+    )
+    parser.add_argument("--images", default="", help="Images to inspect (default: random frames).")
+    parser.add_argument("--limit", type=int, default=30, help="Frames per mode (default 30).")
+    parser.add_argument("--warmup", type=int, default=3, help="Untimed frames per mode.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.images:
+        frames = [img for img in (cv2.imread(p) for p in collect_images(args.images)[: args.limit])
+                  if img is not None]
+    else:
+        rng = np.random.default_rng(args.seed)
+        frames = [rng.integers(0, 256, size=(config.CAMERA_HEIGHT, config.CAMERA_WIDTH, 3), dtype=np.uint8)
+                  for _ in range(args.limit)]
+    if not frames:
+        print(f"[BENCH] No images found under: {args.images}")
+        return 2
+
+    results = {}
+    for name, in_process in (("in-process", True), ("process", False)):
+        print(f"[BENCH] {name}: {len(frames)} frames...")
+        r = run_mode(in_process, frames, args.warmup)
+        if r:
+            results[name] = r
+
+    print("\n" + "=" * 78)
+    print("[BENCH] Inference process vs in-process (ms)")
+    print("=" * 78)
+    print(f"Frames:  {len(frames)} ({args.images or 'random'})")
+    print()
+    print(f"{'':12}{'decision p50':>14}{'p95':>9}{'total p50':>12}{'p95':>9}{'jitter p99':>12}{'max':>9}")
+    for name, r in results.items():
+        print(f"{name:12}{statistics.median(r['decision']):14.1f}{percentile(r['decision'], 0.95):9.1f}"
+              f"{statistics.median(r['total']):12.1f}{percentile(r['total'], 0.95):9.1f}"
+              f"{percentile(r['jitter'], 0.99):12.1f}{max(r['jitter']):9.1f}")
+
+    if len(results) == 2:
+        overhead = statistics.median(results["process"]["decision"]) - statistics.median(results["in-process"]["decision"])
+        print()
+        print(f"[BENCH] Decision overhead of the inference process (median): {overhead:+.1f} ms")
+        print(f"[BENCH] Server: {results['process']['server']}")
+        print("[BENCH] Jitter = how late a 2ms sleeper thread wakes up (UI / serial stalls)")
+
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,187 @@
+import argparse
+import os
+import random
+import shutil
+import statistics
+import subprocess
+from typing import Dict, List, Optional, Tuple
+
+import config
+from core.ai import AIEngine, load_model_metadata
+from test_model_batch import collect_images, evaluate_images, percentile
+
+
+def find_tool(name: str, tools_dir: str) -> Optional[str]:
+    """Locate an ncnn command line tool (ncnn2table / ncnn2int8)."""
+    if tools_dir:
+        path = os.path.join(tools_dir, name)
+        return path if os.path.isfile(path) else None
+    return shutil.which(name)
+
+
+def sample_calibration_images(captures_dir: str, per_class: int, seed: int) -> List[str]:
+    """Pick up to per_class images from captures/ok and captures/ng."""
+    rng = random.Random(seed)
+    images: List[str] = []
+    for sub in ("ok", "ng"):
+        paths = collect_images(os.path.join(captures_dir, sub))
+        rng.shuffle(paths)
+        images.extend(paths[:per_class] if per_class > 0 else paths)
+        print(f"[INT8] {sub}: using {min(len(paths), per_class) if per_class > 0 else len(paths)} "
+              f"of {len(paths)} images")
+    return images
+
+
+def build_int8_model(model_dir: str, images: List[str], input_size: Tuple[int, int], tools_dir: str,
+                     threads: int, method: str) -> bool:
+    """Build the calibration table and the int8 param/bin pair with ncnn's quantize tools."""
+    ncnn2table = find_tool("ncnn2table", tools_dir)
+    ncnn2int8 = find_tool("ncnn2int8", tools_dir)
+    if not ncnn2table or not ncnn2int8:
+        print("[INT8] ncnn2table / ncnn2int8 not found. Build ncnn with NCNN_BUILD_TOOLS=ON "
+              "and pass --tools-dir <ncnn>/build/tools/quantize")
+        return False
+
+    fp32_param, fp32_bin = (os.path.join(model_dir, f) for f in AIEngine.MODEL_FILES["fp32"])
+    int8_param, int8_bin = (os.path.join(model_dir, f) for f in AIEngine.MODEL_FILES["int8"])
+    list_path = os.path.join(model_dir, "calibration_images.txt")
+    table_path = os.path.join(model_dir, "model.table")
+
+    with open(list_path, "w") as f:
+        f.write("\n".join(os.path.abspath(p) for p in images) + "\n")
+
+    # Same normalization as AIEngine._preprocess (RGB, 0-1)
+    norm = 1 / 255.0
+    table_cmd = [
+        ncnn2table, fp32_param, fp32_bin, list_path, table_path,
+        "mean=[0,0,0]",
+        f"norm=[{norm},{norm},{norm}]",
+        f"shape=[{input_size[0]},{input_size[1]},3]",
+        "pixel=RGB",
+        f"thread={threads}",
+        f"method={method}",
+    ]
+    int8_cmd = [ncnn2int8, fp32_param, fp32_bin, int8_param, int8_bin, table_path]
+
+    for cmd in (table_cmd, int8_cmd):
+        print(f"[INT8] Running: {' '.join(cmd)}")
+        if subprocess.run(cmd).returncode != 0:
+            print(f"[INT8] {os.path.basename(cmd[0])} failed")
+            return False
+
+    print(f"[INT8] Wrote {int8_param}")
+    print(f"[INT8] Wrote {int8_bin}")
+    return True
+
+
+def evaluate_precision(precision: str, img_paths: List[str], batch_size: int) -> Optional[Dict]:
+    """Run the batch evaluation for one model precision."""
+    ai = AIEngine(model_path=config.MODEL_PATH, config=config, precision=precision)
+    ai.debug_mode = False
+    if not ai.model_loaded:
+        print(f"[INT8] {precision} model not loaded, skipping")
+        return None
+
+    rows, times, counts, infer_time = evaluate_images(ai, img_paths, batch_size)
+    return {
+        "rows": rows,
+        "times": times,
+        "counts": counts,
+        "throughput": counts["total"] / infer_time if infer_time > 0 else 0.0,
+    }
+
+
+def format_report(results: Dict[str, Dict], images_dir: str) -> List[str]:
+    lines = [
+        "=" * 70,
+        "[INT8] FP32 vs INT8 comparison",
+        "=" * 70,
+        f"Images dir:  {images_dir}",
+        f"Model path:  {config.MODEL_PATH}",
+        "",
+        f"{'':8}{'mean ms':>10}{'p95 ms':>10}{'img/s':>10}{'accuracy':>10}{'NG->OK':>8}{'OK->NG':>8}",
+    ]
+    for precision, r in results.items():
+        c = r["counts"]
+        labelled = c["expected_ok"] + c["expected_ng"]
+        accuracy = (c["tp_ok"] + c["tp_ng"]) / labelled * 100 if labelled else 0.0
+        lines.append(
+            f"{precision:8}{statistics.mean(r['times']):10.1f}{percentile(r['times'], 0.95):10.1f}"
+            f"{r['throughput']:10.1f}{accuracy:9.1f}%{c['fp_ok']:8d}{c['fp_ng']:8d}"
+        )
+
+    if "fp32" in results and "int8" in results:
+        fp32 = {row.path: row.result for row in results["fp32"]["rows"]}
+        int8 = {row.path: row.result for row in results["int8"]["rows"]}
+        common = [p for p in fp32 if p in int8]
+        disagree = [p for p in common if fp32[p] != int8[p]]
+        speedup = statistics.mean(results["fp32"]["times"]) / max(statistics.mean(results["int8"]["times"]), 1e-9)
+        lines += [
+            "",
+            f"Speedup (mean):        {speedup:.2f}x",
+            f"OK/NG agreement:       {len(common) - len(disagree)}/{len(common)}",
+        ]
+        for p in disagree[:20]:
+            lines.append(f"  differs: {p} (fp32={fp32[p]}, int8={int8[p]})")
+
+    return lines
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Build an INT8 NCNN model from captured images and compare it to FP32.")
+    parser.add_argument("--captures", default="captures", help="Folder with ok/ and ng/ subfolders (default: captures).")
+    parser.add_argument("--per-class", type=int, default=200, help="Calibration images per class (0 = all).")
+    parser.add_argument("--tools-dir", default="", help="Folder containing ncnn2table and ncnn2int8 (default: PATH).")
+    parser.add_argument("--threads", type=int, default=4, help="Threads for ncnn2table.")
+    parser.add_argument("--method", default="kl", choices=["kl", "aciq", "eq"], help="Calibration method.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skip-build", action="store_true", help="Only run the comparison (int8 model already built).")
+    parser.add_argument("--eval-images", default="", help="Images for the comparison (default: --captures).")
+    parser.add_argument("--limit", type=int, default=0, help="Limit comparison images (0 = no limit).")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--report", default="", help="Report file (default: <model>/int8_report.txt).")
+    args = parser.parse_args()
+
+    if not args.skip_build:
+        images = sample_calibration_images(args.captures, args.per_class, args.seed)
+        if not images:
+            print(f"[INT8] No calibration images under {args.captures}/ok or {args.captures}/ng")
+            return 2
+        # Calibrate at the size the model was exported with (ncnn2table shape is [w,h,c])
+        imgsz = load_model_metadata(config.MODEL_PATH).get("imgsz") or [640, 640]
+        input_size = (int(imgsz[1]), int(imgsz[0]))
+        if not build_int8_model(config.MODEL_PATH, images, input_size, args.tools_dir,
+                                args.threads, args.method):
+            return 1
+
+    eval_dir = args.eval_images or args.captures
+    img_paths = collect_images(eval_dir)
+    if args.limit and args.limit > 0:
+        img_paths = img_paths[: args.limit]
+    if not img_paths:
+        print(f"[INT8] No images found under: {eval_dir}")
+        return 2
+
+    results: Dict[str, Dict] = {}
+    for precision in ("fp32", "int8"):
+        r = evaluate_precision(precision, img_paths, args.batch_size)
+        if r is not None and r["times"]:
+            results[precision] = r
+
+    if not results:
+        print("[INT8] Nothing to compare.")
+        return 2
+
+    lines = format_report(results, eval_dir)
+    print("\n" + "\n".join(lines))
+
+    report_path = args.report or os.path.join(config.MODEL_PATH, "int8_report.txt")
+    with open(report_path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    print(f"\n[INT8] Report saved to {report_path}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -10,6 +10,11 @@ Adjust these parameters to tune system performance
 # Model path (NCNN format)
 MODEL_PATH = "model/best_ncnn_model"  # Folder containing .param and .bin files
 
+# Model precision
+# 'fp32' = model.ncnn.param / model.ncnn.bin
+# 'int8' = model-int8.ncnn.param / model-int8.ncnn.bin (build with calibrate_int8.py)
+MODEL_PRECISION = 'fp32'
+
 # Detection confidence threshold (0.0 - 1.0)
 # Lower = more detections (may include false positives)
 # Higher = fewer detections (may miss some objects)
@@ -20,6 +25,30 @@ CONFIDENCE_THRESHOLD = 0.5
 # Higher = keep more overlapping boxes (loose)
 NMS_THRESHOLD = 0.45
 
+# Per-class NMS: boxes only suppress boxes of the same class
+# (False = class-agnostic, a 'cap' box can remove an overlapping 'Cap-Defect')
+NMS_CLASS_AWARE = True
+
+# Keep only the best K candidates before NMS (bounds NMS cost on bad frames)
+NMS_TOP_K = 300
+
+# Maximum detections kept after NMS
+MAX_DETECTIONS = 50
+
+# Preprocessing
+# False = stretch frame to the model input (640x480 -> 640x640)
+# True  = letterbox: keep aspect ratio, pad with gray to the model input
+LETTERBOX = False
+
+# Model input size: None = size the model was exported with (metadata.yaml imgsz)
+# int (e.g. 320, 416, 480) or (width, height) (e.g. (640, 480)) for a model
+# re-exported at that size: yolo export model=best.pt format=ncnn imgsz=320
+# Must be a multiple of the stride. Compare sizes with sweep_input_size.py
+INPUT_SIZE = None
+
+# Model stride, used when metadata.yaml doesn't provide one
+MODEL_STRIDE = 32
+
 # Class names (must match model training)
 CLASS_NAMES = [
     'Cap-Defect',      # 0
@@ -42,15 +71,117 @@ REQUIRED_COMPONENTS = {
     'label': 7
 }
 
+# ============================================================================
+# INFERENCE RUNTIME
+# ============================================================================
+
+# Inference backend (compare them on this board with benchmark_backends.py)
+# 'ncnn'        = MODEL_PATH .param/.bin (fp32 or int8)
+# 'onnxruntime' = ONNX_MODEL_FILE with ONNX Runtime CPU (pip install onnxruntime)
+# 'opencv'      = ONNX_MODEL_FILE with the OpenCV DNN module (no extra package)
+# Falls back to another installed backend if this one is missing
+INFERENCE_BACKEND = "ncnn"
+
+# ONNX export inside MODEL_PATH for the onnxruntime / opencv backends
+# (yolo export model=best.pt format=onnx imgsz=640; fp32 only)
+ONNX_MODEL_FILE = "model.onnx"
+
+# Without a loaded model every bottle is rejected (NG). True = random
+# OK/NG results instead, for testing the UI and hardware without a model
+DUMMY_PREDICTIONS = False
+
+# Number of inference workers (each loads its own copy of the model)
+# 1 = single net, bottles are inspected one at a time
+INFERENCE_WORKERS = 1
+
+# Run the model in a separate process (own GIL: Tk, serial and camera
+# threads no longer stall during inference). Frames are passed through a
+# shared-memory ring; a crashed or hung process is restarted
+INFERENCE_PROCESS = False
+INFERENCE_PROCESS_SLOTS = 4  # Frames in flight (ring size)
+INFERENCE_PROCESS_TIMEOUT = 2.0  # Seconds before a job counts as hung
+INFERENCE_PROCESS_RESTART_DELAY = 1.0  # Seconds between crash and restart
+
+# CPU threads used by each NCNN net (and by the other backends)
+# Keep INFERENCE_WORKERS * NCNN_THREADS <= number of CPU cores
+NCNN_THREADS = 4
+
+# NCNN light mode (free intermediate blobs early, lower memory)
+NCNN_LIGHT_MODE = True
+
+# NCNN packed memory layout (faster on ARM NEON / x86 SIMD)
+NCNN_PACKING_LAYOUT = True
+
+# Tuned ncnn.Option profile inside MODEL_PATH, written by tune_ncnn_options.py
+# (overrides NCNN_THREADS / NCNN_PACKING_LAYOUT when present; None = ignore)
+NCNN_PROFILE_FILE = "ncnn_profile.json"
+
+# Warm-up inferences on synthetic frames right after the model loads
+# (the first real bottle then doesn't pay the cold-start penalty)
+WARMUP_ITERATIONS = 3
+
+# Motion gate for continuous inference (live test tools): frames that did
+# not change since the last inferred one reuse its result
+MOTION_GATE = True
+MOTION_THRESHOLD = 3.0     # Mean gray-level difference on a 32x24 thumbnail
+MOTION_MAX_AGE = 2.0       # Re-infer at least this often (seconds)
+
+# Two-stage inference: a cheap locator finds the bottle band by comparing
+# the frame with an empty-belt reference, then the detector only sees that
+# crop (letterboxed). Boxes are mapped back to full-frame coordinates.
+# Works best with a model exported at a smaller size (see sweep_input_size.py)
+BOTTLE_LOCATOR = False
+LOCATOR_BACKGROUND_FILE = "database/empty_belt.png"
+LOCATOR_CAPTURE_ON_START = True   # Take a new reference when START is pressed (belt empty)
+LOCATOR_SCALE = 0.25              # Locator works on a downscaled frame
+LOCATOR_DIFF_THRESHOLD = 25       # Color change (0-255, any channel) that counts as "not belt"
+LOCATOR_MIN_FILL = 0.1            # Fraction of changed pixels for a column/row to count
+LOCATOR_MARGIN = 0.15             # Extra margin around the bottle (fraction of its size)
+LOCATOR_MIN_WIDTH = 40            # Smaller bands are ignored (px, full frame)
+
+# Model hot-swap: AIEngine.reload_model() loads and warms a new model in the
+# background, checks it on golden images, then swaps it in between bottles
+GOLDEN_IMAGES_DIR = "golden"      # Golden images in golden/ok and golden/ng
+GOLDEN_MIN_ACCURACY = 0.95        # Reject the new model below this accuracy
+MODEL_WATCH_INTERVAL = 0          # Seconds between model file checks (0 = no watch)
+
 # ============================================================================
 # SORTING LOGIC
 # ============================================================================
 
 # Require specific components for OK classification
+# (used to build the rules when SORTING_RULES is None)
 REQUIRE_CAP = True
 REQUIRE_FILLED = True
 REQUIRE_LABEL = True
 
+# Sorting rules per product (SKU), checked in order - the first rule that
+# fires decides, no rule firing means OK. Classes by name or index.
+#   'reject_any': fires if any of the classes is detected
+#   'require':    fires if any of the classes is missing
+# Optional keys: 'result' ('NG'), 'reason' (text before the class names),
+# 'min_confidence' (a class counts only from this score on)
+# None = a single 'default' SKU built from DEFECT_CLASSES / REQUIRED_COMPONENTS
+# and REQUIRE_* above. Example with a second product without label:
+# SORTING_RULES = {
+#     'default': [
+#         {'type': 'reject_any', 'classes': ['Cap-Defect', 'Filling-Defect', 'Label-Defect', 'Wrong-Product'],
+#          'reason': 'Defect'},
+#         {'type': 'require', 'classes': ['cap', 'filled', 'label'], 'reason': 'Missing'},
+#     ],
+#     'coca_nolabel': [
+#         {'type': 'reject_any', 'classes': ['Cap-Defect', 'Filling-Defect', 'Wrong-Product']},
+#         {'type': 'require', 'classes': ['cap', 'filled']},
+#     ],
+# }
+SORTING_RULES = None
+ACTIVE_SKU = 'default'  # Key of SORTING_RULES in use (ai.set_sku() at runtime)
+
+# Decide OK/NG from the decoded candidates before NMS and send it right away
+# (only when NMS cannot change which classes are present, otherwise the
+# decision waits for the full post-processing - the result is identical)
+EARLY_DECISION = True
+
 # ============================================================================
 # CAMERA CONFIGURATION
 # ============================================================================
@@ -68,6 +199,19 @@ CAMERA_EXPOSURE = -4  # Adjust based on lighting conditions
 # Auto-exposure (set to False for manual exposure)
 CAMERA_AUTO_EXPOSURE = False
 
+# Frames kept in memory with their capture time. On a trigger the frame
+# taken closest to the moment sensor 1 fired is inspected, not whatever
+# frame is current when the worker thread runs. Must cover the
+# trigger-to-capture delay: 16 frames = ~0.5s at 30 FPS.
+# 0 = latest frame only; frames are then decoded only when read
+# (less CPU, but a trigger gets the next frame instead of its own)
+FRAME_RING_SIZE = 16
+
+# Shift of the inspected frame relative to the trigger (ms). Positive =
+# a later frame (bottle moved further into view, or camera delivers
+# frames late); tune until the bottle is centered in saved images
+TRIGGER_FRAME_OFFSET_MS = 0
+
 # ============================================================================
 # CAMERA ROI (CROP) - reduce 4 sides (left/right/top/bottom)
 # ============================================================================
@@ -98,11 +242,21 @@ TRAVEL_TIME_MS = 4500
 # ============================================================================
 
 # Number of frames to capture per bottle (for voting/averaging)
-NUM_CAPTURE_FRAMES = 1  # In continuous mode, we capture quickly (no time for multiple frames)
+NUM_CAPTURE_FRAMES = 1  # 1 = single snapshot; >1 = distinct frames fused by voting
 
 # Frame delay between captures (seconds)
 FRAME_DELAY = 0.05  # 50ms between frames if capturing multiple
 
+# How per-frame results are fused (NUM_CAPTURE_FRAMES > 1)
+# "any_defect" = NG if any frame is NG (strictest)
+# "majority"   = most frames win, a tie is NG
+# "confidence" = votes weighted by mean detection confidence (blurred frames count less)
+VOTING_MODE = "any_defect"
+
+# Time budget from trigger to decision (ms). Fewer frames are captured and
+# inferred when the budget would be exceeded (Arduino IR1 lockout is 800ms)
+DECISION_BUDGET_MS = 500
+
 # ============================================================================
 # DUMMY MODE (For testing without hardware)
 # ============================================================================
@@ -117,8 +271,19 @@ USE_DUMMY_HARDWARE = False  # True = simulate Arduino communication
 DEBUG_MODE = True  # Print detailed debug information
 SAVE_DEBUG_IMAGES = True  # Save annotated images to captures/debug/
 
-# Log file path
+# Log file path (rotated, written by a background thread - see core/log.py)
 LOG_FILE = "system.log"
+LOG_MAX_BYTES = 5 * 1024 * 1024  # Rotate at 5 MB
+LOG_BACKUP_COUNT = 3  # Keep system.log.1 .. system.log.3
+
+# Log level (None = DEBUG when DEBUG_MODE, else INFO). Disabled levels cost
+# one check per call, so "INFO" silences per-inference messages for free
+LOG_LEVEL = None
+
+# Each message may repeat at most LOG_RATE_LIMIT times per second (after a
+# burst of LOG_RATE_BURST); dropped repeats are counted in the next one
+LOG_RATE_LIMIT = 5.0
+LOG_RATE_BURST = 10
 
 # ============================================================================
 # UI CONFIGURATION
@@ -147,6 +312,12 @@ MAX_PROCESSING_TIME = 1.0  # Warn if AI takes longer than this
 # Serial response timeout (seconds)
 SERIAL_RESPONSE_TIMEOUT = 0.05  # How long to wait before sending decision
 
+# Per-stage latency of every bottle (trigger, frame, preprocess, inference,
+# decode, NMS, decision sent, annotated, saved, persisted). Cheap enough to
+# leave on; p50/p95/p99 via ai.latency.get_stats(), printed on STOP
+LATENCY_TRACKING = True
+LATENCY_WINDOW = 1000  # Bottles kept per stage (ring buffer)
+
 # ============================================================================
 # CALIBRATION
 # ============================================================================
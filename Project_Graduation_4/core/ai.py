@@ -1,41 +1,155 @@
 """
 AI Engine for Coca-Cola Sorting System (CONTINUOUS MODE)
-Uses NCNN for fast inference with proper NMS to handle overlapping boxes
+Uses NCNN (or another backend, see core/backends.py) for fast inference
+with proper NMS to handle overlapping boxes
 """
 
 import cv2
 import numpy as np
 import time
 import os
+import json
+import threading
+from contextlib import contextmanager
 from pathlib import Path
 
-try:
-    import ncnn
-    NCNN_AVAILABLE = True
-except ImportError:
-    NCNN_AVAILABLE = False
-    print("[WARNING] NCNN not available. Install with: pip install ncnn")
+from core.backends import OutputLayout, create_backend
+from core.latency import LatencyTracker
+from core.locator import BottleLocator
+from core.log import get_logger
+from core.motion import FrameChangeDetector
+from core.results import Detections, InspectionResult
+from core.rules import class_confidence, compile_rule_sets
+
+# Per-inference messages (hot path) go through the queued logger
+log = get_logger("AI")
+
+
+def _yaml_scalar(value):
+    """Convert a plain YAML scalar string to int/float/bool/str"""
+    value = value.strip().strip("'\"")
+    for cast in (int, float):
+        try:
+            return cast(value)
+        except ValueError:
+            pass
+    if value.lower() in ('true', 'false'):
+        return value.lower() == 'true'
+    return value
+
+
+def load_model_metadata(model_path):
+    """
+    Read the Ultralytics metadata.yaml exported next to the NCNN model
+    
+    Uses PyYAML when installed, otherwise a minimal parser for the flat
+    Ultralytics layout (top-level keys, '- item' lists, indented maps).
+    
+    Args:
+        model_path: Path to NCNN model folder
+        
+    Returns:
+        dict (empty if the file is missing or unreadable)
+    """
+    path = os.path.join(model_path, "metadata.yaml")
+    if not os.path.exists(path):
+        return {}
+    
+    try:
+        import yaml
+        with open(path) as f:
+            return yaml.safe_load(f) or {}
+    except ImportError:
+        pass
+    except Exception as e:
+        print(f"[WARNING] Failed to read {path}: {e}")
+        return {}
+    
+    metadata = {}
+    key = None
+    with open(path) as f:
+        for raw in f:
+            line = raw.rstrip()
+            if not line or line.lstrip().startswith('#'):
+                continue
+            if line.startswith('-') and key:
+                if not isinstance(metadata[key], list):
+                    metadata[key] = []
+                metadata[key].append(_yaml_scalar(line[1:]))
+            elif not line.startswith(' '):
+                key, _, value = line.partition(':')
+                key = key.strip()
+                metadata[key] = _yaml_scalar(value) if value.strip() else None
+            elif key:
+                sub_key, _, value = line.strip().partition(':')
+                if not isinstance(metadata[key], dict):
+                    metadata[key] = {}
+                metadata[key][_yaml_scalar(sub_key)] = _yaml_scalar(value)
+    return metadata
 
 
 class AIEngine:
     """
     AI Engine using NCNN model for bottle inspection
-    Implements proper NMS using cv2.dnn.NMSBoxes
+    Implements vectorized decoding and class-aware NMS
     """
     
-    def __init__(self, model_path="model/best_ncnn_model", config=None):
+    # Model file names inside the model folder, per precision
+    MODEL_FILES = {
+        'fp32': ("model.ncnn.param", "model.ncnn.bin"),
+        'int8': ("model-int8.ncnn.param", "model-int8.ncnn.bin"),
+    }
+    
+    # ncnn.Option flags that tune_ncnn_options.py benchmarks and the
+    # options profile may set
+    TUNABLE_OPTIONS = (
+        'use_fp16_storage',
+        'use_fp16_arithmetic',
+        'use_winograd_convolution',
+        'use_sgemm_convolution',
+        'use_packing_layout',
+    )
+    
+    # Everything that belongs to one loaded model (swapped together on reload)
+    MODEL_STATE = (
+        'model_path', 'net', 'pool', 'model_loaded', 'metadata', 'stride',
+        'input_w', 'input_h', 'output_layout', 'ncnn_options', 'ncnn_threads',
+        'frame_time_estimate', 'server',
+    )
+    
+    def __init__(self, model_path="model/best_ncnn_model", config=None, load_async=False,
+                 precision=None):
         """
         Initialize AI Engine
         
         Args:
             model_path: Path to NCNN model folder
             config: Configuration module (optional)
+            load_async: Load and warm up the model in a background thread
+                (check is_ready() / wait_ready() before inspecting)
+            precision: 'fp32' or 'int8' (default: config MODEL_PRECISION)
         """
         print("[AI] Initializing AI Engine...")
         
         self.model_path = model_path
         self.net = None
         self.model_loaded = False
+        self.last_batch_stats = None
+        self.pool = None
+        self.server = None
+        
+        # Readiness (model loaded and warmed up)
+        self.ready_event = threading.Event()
+        self.time_to_ready = None
+        
+        # Hot-swap: predictions in progress, previous model for rollback
+        self.model_cond = threading.Condition()
+        self.active_predictions = 0
+        self.swapping = False
+        self.previous_model = None
+        self.reload_thread = None
+        self.watch_thread = None
+        self.last_swap = None
         
         # Load configuration
         if config is None:
@@ -51,6 +165,9 @@ class AIEngine:
         # Get configuration values
         self.confidence_threshold = getattr(self.config, 'CONFIDENCE_THRESHOLD', 0.5)
         self.nms_threshold = getattr(self.config, 'NMS_THRESHOLD', 0.45)
+        self.nms_class_aware = getattr(self.config, 'NMS_CLASS_AWARE', True)
+        self.nms_top_k = getattr(self.config, 'NMS_TOP_K', 300)
+        self.max_detections = getattr(self.config, 'MAX_DETECTIONS', 50)
         self.class_names = getattr(self.config, 'CLASS_NAMES', [
             'Cap-Defect', 'Filling-Defect', 'Label-Defect', 'Wrong-Product',
             'cap', 'coca', 'filled', 'label'
@@ -59,375 +176,1241 @@ class AIEngine:
         self.required_components = getattr(self.config, 'REQUIRED_COMPONENTS', {
             'cap': 4, 'filled': 6, 'label': 7
         })
-        self.require_cap = getattr(self.config, 'REQUIRE_CAP', True)
-        self.require_filled = getattr(self.config, 'REQUIRE_FILLED', True)
-        self.require_label = getattr(self.config, 'REQUIRE_LABEL', True)
+        
+        # Sorting rules per SKU (compiled once, see core/rules.py)
+        self.rule_sets = compile_rule_sets(self.config, self.class_names)
+        self.sku = None
+        self.rules = None
+        self.set_sku(getattr(self.config, 'ACTIVE_SKU', 'default'))
+        self.early_decision = getattr(self.config, 'EARLY_DECISION', True)
+        
+        # Multi-frame voting
+        self.num_capture_frames = max(1, int(getattr(self.config, 'NUM_CAPTURE_FRAMES', 1)))
+        self.frame_delay = getattr(self.config, 'FRAME_DELAY', 0.05)
+        self.voting_mode = getattr(self.config, 'VOTING_MODE', 'any_defect')
+        if self.voting_mode not in ('any_defect', 'majority', 'confidence'):
+            print(f"[WARNING] Unknown VOTING_MODE '{self.voting_mode}', using any_defect")
+            self.voting_mode = 'any_defect'
+        self.decision_budget = getattr(self.config, 'DECISION_BUDGET_MS', 500) / 1000.0
+        self.frame_time_estimate = None  # Running average of one frame's inference (seconds)
+        
+        # Motion gate for continuous inference (see predict_gated)
+        self.motion_gate = FrameChangeDetector(self.config) if getattr(self.config, 'MOTION_GATE', True) else None
+        self.last_gated_result = None
+        
+        # Per-stage latency of every bottle (traces are started by the caller)
+        self.latency = LatencyTracker(self.config)
+        
+        # Model hot-swap
+        self.golden_images_dir = getattr(self.config, 'GOLDEN_IMAGES_DIR', "golden")
+        self.golden_min_accuracy = getattr(self.config, 'GOLDEN_MIN_ACCURACY', 0.95)
+        self.model_watch_interval = getattr(self.config, 'MODEL_WATCH_INTERVAL', 0)
         self.debug_mode = getattr(self.config, 'DEBUG_MODE', True)
         self.save_debug_images = getattr(self.config, 'SAVE_DEBUG_IMAGES', True)
         
-        # Model parameters
-        self.input_size = 640
+        # Model parameters (input size and stride come from the export metadata)
+        self.metadata = load_model_metadata(self.model_path)
+        self.stride = int(self.metadata.get('stride') or getattr(self.config, 'MODEL_STRIDE', 32))
+        self.input_w, self.input_h = self._resolve_input_size(getattr(self.config, 'INPUT_SIZE', None))
+        self.letterbox = getattr(self.config, 'LETTERBOX', False)
+        self.letterbox_value = 114 / 255.0  # Ultralytics gray padding, normalized
+        
+        # YOLOv8 NCNN default; replaced by the backend's probe in _load_model
+        self.output_layout = OutputLayout(True, 4 + len(self.class_names), None, (1.0, 1.0))
+        
+        # Two-stage mode: detector only sees the located bottle
+        self.locator = BottleLocator(self.config) if getattr(self.config, 'BOTTLE_LOCATOR', False) else None
+        self.mean_vals = []
+        self.norm_vals = [1/255.0, 1/255.0, 1/255.0]
+        
+        # NCNN runtime options (NCNN_THREADS is used by every backend)
+        self.ncnn_threads = getattr(self.config, 'NCNN_THREADS', 4)
+        self.ncnn_light_mode = getattr(self.config, 'NCNN_LIGHT_MODE', True)
+        self.ncnn_packing_layout = getattr(self.config, 'NCNN_PACKING_LAYOUT', True)
+        self.inference_workers = getattr(self.config, 'INFERENCE_WORKERS', 1)
+        self.inference_process = getattr(self.config, 'INFERENCE_PROCESS', False)
+        self.precision = precision or getattr(self.config, 'MODEL_PRECISION', 'fp32')
+        if self.precision not in self.MODEL_FILES:
+            print(f"[WARNING] Unknown MODEL_PRECISION '{self.precision}', using fp32")
+            self.precision = 'fp32'
+        
+        # Inference runtime (ncnn, onnxruntime or opencv)
+        self.onnx_model_file = getattr(self.config, 'ONNX_MODEL_FILE', "model.onnx")
+        self.dummy_predictions = getattr(self.config, 'DUMMY_PREDICTIONS', False)
+        self.backend = create_backend(getattr(self.config, 'INFERENCE_BACKEND', 'ncnn'), self)
+        if self.backend and self.backend.name != 'ncnn' and self.precision != 'fp32':
+            print(f"[WARNING] MODEL_PRECISION '{self.precision}' needs the ncnn backend, "
+                  f"using fp32 with {self.backend.name}")
+            self.precision = 'fp32'
+        self.warmup_iterations = getattr(self.config, 'WARMUP_ITERATIONS', 3)
+        self.warmup_size = (getattr(self.config, 'CAMERA_WIDTH', 640),
+                            getattr(self.config, 'CAMERA_HEIGHT', 480))
+        
+        # Per-board tuned options (written by tune_ncnn_options.py)
+        self.ncnn_profile_file = getattr(self.config, 'NCNN_PROFILE_FILE', "ncnn_profile.json")
+        self.ncnn_options = self._load_options_profile() if self.backend and self.backend.name == 'ncnn' else {}
         
         # Load model
-        if NCNN_AVAILABLE:
-            self._load_ncnn_model()
+        if load_async:
+            threading.Thread(target=self._initialize, name="ai-loader", daemon=True).start()
+            print("[AI] Loading model in background...")
         else:
-            print("[WARNING] NCNN not available, using dummy predictions")
+            self._initialize()
     
-    def _load_ncnn_model(self):
-        """Load NCNN model from .param and .bin files"""
-        try:
-            param_path = os.path.join(self.model_path, "model.ncnn.param")
-            bin_path = os.path.join(self.model_path, "model.ncnn.bin")
-            
-            if not os.path.exists(param_path) or not os.path.exists(bin_path):
-                print(f"[ERROR] Model files not found at {self.model_path}")
-                print(f"  Expected: {param_path}")
-                print(f"  Expected: {bin_path}")
-                return
+    def _resolve_input_size(self, configured):
+        """
+        Work out the model input size (width, height)
+        
+        The exported NCNN graph has a fixed anchor grid, so the size the
+        model was exported with (metadata imgsz) always wins; a different
+        INPUT_SIZE needs a model re-exported at that size.
+        
+        Args:
+            configured: INPUT_SIZE from config (int, (width, height) or None)
             
-            self.net = ncnn.Net()
-            self.net.load_param(param_path)
-            self.net.load_model(bin_path)
+        Returns:
+            Tuple (width, height)
+        """
+        exported = self.metadata.get('imgsz')
+        if isinstance(exported, (list, tuple)) and len(exported) == 2:
+            exported = (int(exported[1]), int(exported[0]))  # Ultralytics order is [h, w]
+        elif isinstance(exported, int):
+            exported = (exported, exported)
+        else:
+            exported = None
+        
+        if configured is None:
+            size = exported or (640, 640)
+        else:
+            size = (configured, configured) if isinstance(configured, int) else tuple(map(int, configured))
+            if exported and size != exported:
+                print(f"[WARNING] INPUT_SIZE {size[0]}x{size[1]} does not match the exported model "
+                      f"({exported[0]}x{exported[1]}), using {exported[0]}x{exported[1]}. "
+                      f"Re-export with imgsz=[{size[1]},{size[0]}] to use it")
+                size = exported
+        
+        if size[0] % self.stride or size[1] % self.stride:
+            print(f"[WARNING] Input size {size[0]}x{size[1]} is not a multiple of stride {self.stride}")
+        
+        return size
+    
+    def _initialize(self):
+        """Load model, start workers and warm up (may run in background)"""
+        start_time = time.time()
+        
+        try:
+            if self.backend and self.inference_process:
+                self._start_server()
+            elif self.backend:
+                self._load_model()
+                if self.model_loaded and self.inference_workers > 1:
+                    self._start_pool()
+                if self.model_loaded and self.warmup_iterations > 0:
+                    self._warm_up(self.warmup_iterations)
+            else:
+                print("[ERROR] No inference backend installed (pip install ncnn), every bottle is rejected")
+        except Exception as e:
+            # Never leave the UI waiting for a loader that died: reject every bottle instead
+            print(f"[ERROR] AI engine initialization failed: {e}, every bottle is rejected")
+            self.model_loaded = False
+            self.shutdown()
+        finally:
+            self.time_to_ready = time.time() - start_time
+            self.ready_event.set()
+        
+        print(f"[AI] Engine ready in {self.time_to_ready:.2f}s")
+    
+    def _warm_up(self, iterations):
+        """
+        Run inferences on synthetic frames so the first real bottle does
+        not pay for the first extractor and memory pool growth
+        
+        Args:
+            iterations: Number of warm-up inferences (per worker with a pool)
+        """
+        start_time = time.time()
+        width, height = self.warmup_size
+        rng = np.random.default_rng(0)
+        frame = rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+        
+        debug_mode = self.debug_mode
+        self.debug_mode = False
+        try:
+            if self.pool:
+                futures = [self.pool.submit(frame)
+                           for _ in range(iterations * self.pool.num_workers)]
+                for future in futures:
+                    future.result()
+            else:
+                for _ in range(iterations):
+                    self._predict_frame(frame)
+        except Exception as e:
+            print(f"[WARNING] Warm-up failed: {e}")
+        finally:
+            self.debug_mode = debug_mode
+        
+        print(f"[AI] Warm-up: {iterations} inference(s) in {(time.time() - start_time)*1000:.0f}ms")
+    
+    def is_ready(self):
+        """Check if the model is loaded and warmed up"""
+        return self.ready_event.is_set()
+    
+    def wait_ready(self, timeout=None):
+        """
+        Block until the engine is ready
+        
+        Args:
+            timeout: Max seconds to wait (None = no limit)
             
-            self.model_loaded = True
-            print(f"[AI] NCNN model loaded successfully from {self.model_path}")
+        Returns:
+            bool: True if ready
+        """
+        return self.ready_event.wait(timeout)
+    
+    def _load_model(self):
+        """Load the model files with the inference backend"""
+        if not self._check_class_names():
+            self.model_loaded = False
+            return
+        
+        self.net = self._create_net(self.ncnn_threads)
+        if self.net is not None:
+            layout = self.backend.describe_layout(self.net)
+            if layout is None:
+                self.net = None
+            else:
+                self.output_layout = layout
+        self.model_loaded = self.net is not None
+        
+        if self.model_loaded:
+            layout = self.output_layout
+            print(f"[AI] Model loaded successfully from {self.model_path} ({self.backend.describe()})")
+            print(f"[AI] Output layout: {'channels-first' if layout.channels_first else 'channels-last'}, "
+                  f"{layout.num_channels - 4} classes, {layout.num_anchors} anchors, "
+                  f"{'normalized' if layout.coord_scale != (1.0, 1.0) else 'pixel'} coordinates")
             print(f"[AI] Confidence threshold: {self.confidence_threshold}")
             print(f"[AI] NMS threshold: {self.nms_threshold}")
-            
+            print(f"[AI] Input size: {self.input_w}x{self.input_h}")
+            print(f"[AI] Inference threads: {self.ncnn_threads}")
+    
+    def _check_class_names(self):
+        """
+        Check CLASS_NAMES against the names in the model's metadata.yaml
+        
+        The sorting rules work on class ids, so a model trained with a
+        different class order would silently sort wrong.
+        
+        Returns:
+            bool: True if they match (or the metadata has no names)
+        """
+        names = self.metadata.get('names')
+        if isinstance(names, dict):
+            names = [names[key] for key in sorted(names, key=int)]
+        if not names:
+            return True
+        
+        names = [str(name) for name in names]
+        if names != list(self.class_names):
+            print(f"[ERROR] CLASS_NAMES do not match the model in {self.model_path}")
+            print(f"  config: {list(self.class_names)}")
+            print(f"  model:  {names}")
+            print("  Fix CLASS_NAMES (and DEFECT_CLASSES / REQUIRED_COMPONENTS) in config.py")
+            return False
+        return True
+    
+    def _load_options_profile(self):
+        """
+        Load the tuned ncnn.Option profile from the model folder
+        
+        The profile's num_threads replaces NCNN_THREADS. A profile tuned
+        for a different precision is ignored.
+        
+        Returns:
+            dict of ncnn.Option flag overrides (empty if no profile)
+        """
+        if not self.ncnn_profile_file:
+            return {}
+        
+        path = os.path.join(self.model_path, self.ncnn_profile_file)
+        if not os.path.exists(path):
+            return {}
+        
+        try:
+            with open(path) as f:
+                profile = json.load(f)
         except Exception as e:
-            print(f"[ERROR] Failed to load NCNN model: {e}")
-            self.model_loaded = False
+            print(f"[WARNING] Failed to read NCNN options profile {path}: {e}")
+            return {}
+        
+        if profile.get('precision', 'fp32') != self.precision:
+            print(f"[WARNING] NCNN options profile {path} was tuned for "
+                  f"{profile.get('precision')}, ignoring it for {self.precision}")
+            return {}
+        
+        options = {key: bool(profile[key]) for key in self.TUNABLE_OPTIONS if key in profile}
+        if 'num_threads' in profile:
+            self.ncnn_threads = int(profile['num_threads'])
+        
+        print(f"[AI] Loaded NCNN options profile {path}: threads={self.ncnn_threads}, {options}")
+        return options
     
-    def predict(self, frame):
+    def _create_net(self, num_threads, options=None):
         """
-        Run inference on a single frame (FAST - for continuous mode)
+        Create and load an independent model handle (one per worker)
         
         Args:
-            frame: BGR image from camera
+            num_threads: Number of CPU threads this net may use
+            options: ncnn.Option flag overrides (default: tuned profile)
+            
+        Returns:
+            Backend model handle (ncnn.Net, ...) or None on failure
+        """
+        return self.backend.create_net(num_threads, options)
+    
+    def _start_pool(self):
+        """Start the inference worker pool (INFERENCE_WORKERS > 1)"""
+        from core.inference_pool import InferencePool
+        
+        pool = InferencePool(self, self.inference_workers, self.ncnn_threads)
+        if pool.start():
+            self.pool = pool
+        else:
+            print("[WARNING] Inference pool failed to start, using single net")
+    
+    def _start_server(self):
+        """Run the model in a supervised child process (INFERENCE_PROCESS)"""
+        from core.inference_server import InferenceServer
+        
+        server = InferenceServer(
+            self,
+            (self.warmup_size[1], self.warmup_size[0], 3),
+            num_slots=getattr(self.config, 'INFERENCE_PROCESS_SLOTS', 4),
+            timeout=getattr(self.config, 'INFERENCE_PROCESS_TIMEOUT', 2.0),
+            restart_delay=getattr(self.config, 'INFERENCE_PROCESS_RESTART_DELAY', 1.0)
+        )
+        self.model_loaded = server.start(timeout=getattr(self.config, 'INFERENCE_PROCESS_START_TIMEOUT', 120))
+        if self.model_loaded:
+            self.server = server
+            print(f"[AI] Model runs in inference process from {self.model_path} ({self.backend.describe()})")
+        else:
+            server.stop()
+            print("[ERROR] Inference process failed to load the model")
+    
+    def shutdown(self):
+        """Stop background workers"""
+        self.model_watch_interval = 0
+        if self.pool:
+            self.pool.stop()
+            self.pool = None
+        if self.server:
+            self.server.stop()
+            self.server = None
+        if self.previous_model:
+            self._stop_model_state(self.previous_model)
+            self.previous_model = None
+    
+    @staticmethod
+    def _stop_model_state(state):
+        """Stop the workers of a swapped-out model"""
+        if state['pool']:
+            state['pool'].stop()
+        if state['server']:
+            state['server'].stop()
+    
+    @contextmanager
+    def _model_in_use(self):
+        """Hold the current model for one prediction (a swap waits for it)"""
+        with self.model_cond:
+            self.model_cond.wait_for(lambda: not self.swapping)
+            self.active_predictions += 1
+        try:
+            yield
+        finally:
+            with self.model_cond:
+                self.active_predictions -= 1
+                self.model_cond.notify_all()
+    
+    def reload_model(self, model_path=None):
+        """
+        Load, warm up and validate a model in the background, then swap it in
+        
+        The line keeps running on the current model meanwhile. The swap
+        happens between bottles and the current model is kept for
+        rollback().
+        
+        Args:
+            model_path: New NCNN model folder (default: reload the current one)
             
         Returns:
-            dict with keys:
-                - result: 'OK' or 'NG'
-                - reason: Explanation string
-                - detections: List of detected objects
-                - annotated_image: Frame with bounding boxes
-                - processing_time: Time in seconds
+            bool: True if a reload was started (False if one is running)
         """
+        if self.reload_thread and self.reload_thread.is_alive():
+            print("[AI] Model reload already in progress")
+            return False
+        
+        model_path = model_path or self.model_path
+        self.reload_thread = threading.Thread(target=self._reload_worker, args=(model_path,),
+                                              name="ai-reload", daemon=True)
+        self.reload_thread.start()
+        return True
+    
+    def _reload_worker(self, model_path):
+        """Build and validate the candidate model (runs in separate thread)"""
+        print(f"[AI] Reloading model from {model_path}...")
         start_time = time.time()
         
-        if not self.model_loaded or not NCNN_AVAILABLE:
-            return self._dummy_prediction(frame)
+        candidate = AIEngine(model_path=model_path, config=self.config, precision=self.precision)
+        candidate.debug_mode = False
+        if not candidate.model_loaded:
+            print(f"[ERROR] Model reload failed: could not load {model_path}")
+            return
+        
+        if not self._validate_golden(candidate):
+            candidate.shutdown()
+            print(f"[ERROR] Model reload rejected: {model_path} failed golden image validation")
+            return
+        
+        # Candidate workers post-process through this engine from now on
+        if candidate.pool:
+            candidate.pool.ai = self
+        if candidate.server:
+            candidate.server.ai = self
+        
+        print(f"[AI] New model ready in {time.time() - start_time:.2f}s, swapping...")
+        discarded = self.previous_model
+        self.previous_model = self._swap_model_state(vars(candidate))
+        
+        # Only one model is kept for rollback
+        if discarded:
+            self._stop_model_state(discarded)
+    
+    def _validate_golden(self, candidate):
+        """
+        Check a candidate model on the golden image set
+        
+        Images live in GOLDEN_IMAGES_DIR/ok and GOLDEN_IMAGES_DIR/ng.
         
+        Args:
+            candidate: Loaded AIEngine to check
+            
+        Returns:
+            bool: True if accuracy >= GOLDEN_MIN_ACCURACY
+        """
+        samples = []
+        for label in ('ok', 'ng'):
+            folder = Path(self.golden_images_dir) / label
+            if folder.is_dir():
+                samples += [(p, label.upper()) for p in sorted(folder.iterdir())
+                            if p.suffix.lower() in ('.jpg', '.jpeg', '.png', '.bmp')]
+        
+        if not samples:
+            print(f"[WARNING] No golden images in {self.golden_images_dir}/ok|ng, skipping validation")
+            return True
+        
+        frames, expected = [], []
+        for path, label in samples:
+            image = cv2.imread(str(path))
+            if image is not None:
+                frames.append(image)
+                expected.append(label)
+        
+        results = candidate.predict_batch(frames)
+        correct = sum(1 for r, label in zip(results, expected) if r.result == label)
+        accuracy = correct / len(expected) if expected else 0.0
+        
+        print(f"[AI] Golden images: {correct}/{len(expected)} correct ({accuracy*100:.1f}%)")
+        return accuracy >= self.golden_min_accuracy
+    
+    def _swap_model_state(self, state):
+        """
+        Swap in a model state between bottles
+        
+        Args:
+            state: dict with the MODEL_STATE attributes to install
+            
+        Returns:
+            dict with the replaced MODEL_STATE attributes
+        """
+        wait_start = time.time()
+        with self.model_cond:
+            in_flight = self.active_predictions
+            self.swapping = True
+            self.model_cond.wait_for(lambda: self.active_predictions == 0)
+            
+            old_state = {key: getattr(self, key) for key in self.MODEL_STATE}
+            for key in self.MODEL_STATE:
+                setattr(self, key, state[key])
+            
+            self.swapping = False
+            self.model_cond.notify_all()
+        
+        swap_time = time.time() - wait_start
+        self.last_swap = {
+            'model_path': self.model_path,
+            'previous_path': old_state['model_path'],
+            'swap_time': swap_time,
+            'in_flight': in_flight,
+            'time': time.time()
+        }
+        print(f"[AI] Model swapped: {old_state['model_path']} -> {self.model_path} "
+              f"in {swap_time*1000:.1f}ms ({in_flight} bottle(s) in flight finished on the old model)")
+        return old_state
+    
+    def rollback(self):
+        """
+        Switch back to the model that was active before the last swap
+        
+        Returns:
+            bool: True if rolled back
+        """
+        if not self.previous_model:
+            print("[AI] No previous model to roll back to")
+            return False
+        
+        print("[AI] Rolling back model...")
+        self.previous_model = self._swap_model_state(self.previous_model)
+        return True
+    
+    def start_model_watch(self):
+        """
+        Reload automatically when the model files change (MODEL_WATCH_INTERVAL > 0)
+        """
+        if self.model_watch_interval <= 0 or self.watch_thread or not self.backend:
+            return
+        
+        self.watch_thread = threading.Thread(target=self._watch_loop, name="ai-model-watch", daemon=True)
+        self.watch_thread.start()
+        print(f"[AI] Watching {self.model_path} for new models (every {self.model_watch_interval}s)")
+    
+    def _model_files_mtime(self):
+        """Latest modification time of the current model files (None if missing)"""
         try:
-            # Preprocess
-            img_h, img_w = frame.shape[:2]
-            preprocessed = self._preprocess(frame)
+            return max(os.path.getmtime(path) for path in self.backend.model_files())
+        except OSError:
+            return None
+    
+    def _watch_loop(self):
+        """Model file watch loop (runs in separate thread)"""
+        last_seen = self._model_files_mtime()
+        pending = None
+        
+        while self.model_watch_interval > 0:
+            time.sleep(self.model_watch_interval)
+            mtime = self._model_files_mtime()
             
-            # Run inference
-            detections = self._run_ncnn_inference(preprocessed, img_w, img_h)
+            if mtime is None or mtime == last_seen:
+                pending = None
+                continue
             
-            # Apply NMS using cv2.dnn.NMSBoxes
-            detections = self._apply_nms(detections)
+            # Wait one more interval so a copy in progress is not loaded
+            if mtime != pending:
+                pending = mtime
+                continue
             
-            # Apply sorting logic
-            result_dict = self._apply_sorting_logic(detections)
+            last_seen = mtime
+            pending = None
+            print("[AI] Model files changed")
+            self.reload_model()
+    
+    def predict(self, frame, on_decision=None, trace=None, display=None):
+        """
+        Run inference on a single frame (FAST - for continuous mode)
+        
+        Args:
+            frame: BGR image from camera
+            on_decision: Optional callback(decision) called exactly once with
+                'OK' or 'NG' as soon as the decision is known - before NMS
+                when EARLY_DECISION allows it. May run on an inference
+                worker thread, so it must not block.
+            trace: Optional LatencyTrace; preprocess, inference, decode and
+                nms are marked on it
+            display: camera.geometry when frame is a raw ROI crop
+                (camera.capture_snapshot(raw=True)); boxes and roi are then
+                reported in display coordinates (see _to_display)
             
-            # Draw bounding boxes
-            annotated_image = self._draw_boxes(frame.copy(), detections)
+        Returns:
+            InspectionResult (result, reason, detections, frame reference,
+            processing_time, ...). Bounding boxes are not drawn here; call
+            annotate(result) once the decision has been sent.
+        """
+        start_time = time.time()
+        
+        # Deliver the decision once, whichever path produces it first
+        delivered = []
+        def notify(decision):
+            if not delivered:
+                delivered.append(decision)
+                if on_decision:
+                    on_decision(decision)
+        
+        if not self.model_loaded:
+            result = self._to_display(self._dummy_prediction(frame), display)
+            notify(result.result)
+            return result
+        
+        try:
+            with self._model_in_use():
+                if self.server:
+                    result = self.server.predict(frame, on_decision=notify, trace=trace)
+                elif self.pool:
+                    result = self.pool.predict(frame, on_decision=notify, trace=trace)
+                else:
+                    result = self._predict_frame(frame, on_decision=notify, trace=trace)
             
             # Add metadata
             processing_time = time.time() - start_time
-            result_dict['annotated_image'] = annotated_image
-            result_dict['processing_time'] = processing_time
+            result.processing_time = processing_time
             
             if self.debug_mode:
-                print(f"[AI] Prediction: {result_dict['result']} | "
-                      f"Reason: {result_dict['reason']} | "
-                      f"Time: {processing_time*1000:.1f}ms")
-            
-            return result_dict
+                log.debug("Prediction: %s%s | Reason: %s | Time: %.1fms",
+                          result.result, " (early)" if result.early_decision else "",
+                          result.reason, processing_time * 1000)
             
         except Exception as e:
-            print(f"[ERROR] Prediction failed: {e}")
-            import traceback
-            traceback.print_exc()
-            return self._dummy_prediction(frame)
+            log.exception("Prediction failed: %s", e)
+            result = self._dummy_prediction(frame)
+        
+        notify(result.result)
+        return self._to_display(result, display)
     
-    def _preprocess(self, frame):
+    def predict_gated(self, frame, frame_seq=None):
         """
-        Preprocess frame for NCNN inference
+        Continuous inference that skips unchanged frames (MOTION_GATE)
         
         Args:
             frame: BGR image
+            frame_seq: Camera frame sequence number (optional)
+            
+        Returns:
+            Tuple (InspectionResult, inferred). When the frame did not change
+            the previous result is returned again and inferred is False.
+        """
+        changed = self.motion_gate.changed(frame, frame_seq) if self.motion_gate else True
+        if changed or self.last_gated_result is None:
+            self.last_gated_result = self.predict(frame)
+            return self.last_gated_result, True
+        
+        return self.last_gated_result, False
+    
+    def get_motion_stats(self):
+        """
+        Get motion gate statistics
+        
+        Returns:
+            dict with checked, skipped and skip_ratio (None if the gate is off)
+        """
+        return self.motion_gate.get_stats() if self.motion_gate else None
+    
+    def predict_batch(self, frames, trace=None, display=None):
+        """
+        Run inference on several frames (offline evaluation, multi-frame voting)
+        
+        With an inference pool or process the frames are queued to its
+        workers (each has its own net). Otherwise one pair of pooled ncnn
+        blob/workspace allocators serves the whole batch, so the input Mat
+        and every intermediate blob reuse memory from the first frame
+        instead of allocating and freeing it per call.
+        
+        Args:
+            frames: Sequence of BGR images
+            trace: Optional LatencyTrace (stages are marked once per frame)
+            display: camera.geometry for raw ROI crops, see predict()
+            
+        Returns:
+            List of InspectionResult (same as predict), in input order.
+            Aggregate throughput is stored in self.last_batch_stats.
+        """
+        batch_start = time.time()
+        results = []
+        
+        if not self.model_loaded:
+            results = [self._dummy_prediction(frame) for frame in frames]
+        elif self.server or self.pool:
+            # One net per worker: frames run in parallel, never on a shared net
+            executor = self.server or self.pool
+            timeout = self.server.timeout * 2 if self.server else None
+            with self._model_in_use():
+                futures = [executor.submit(frame, trace=trace) for frame in frames]
+                for frame, future in zip(frames, futures):
+                    try:
+                        results.append(future.result(timeout))
+                    except Exception as e:
+                        log.error("Batch prediction failed: %s", e)
+                        results.append(self._dummy_prediction(frame))
+        else:
+            allocators = self.backend.new_allocators()
+            
+            try:
+                with self._model_in_use():
+                    for frame in frames:
+                        start_time = time.time()
+                        try:
+                            result = self._predict_frame(frame, allocators, trace=trace)
+                            result.processing_time = time.time() - start_time
+                        except Exception as e:
+                            log.error("Batch prediction failed: %s", e)
+                            result = self._dummy_prediction(frame)
+                        results.append(result)
+            finally:
+                if allocators:
+                    self.backend.release_allocators(allocators)
+        
+        total_time = time.time() - batch_start
+        num_frames = len(results)
+        self.last_batch_stats = {
+            'frames': num_frames,
+            'total_time': total_time,
+            'fps': num_frames / total_time if total_time > 0 else 0.0,
+            'mean_ms': total_time * 1000 / num_frames if num_frames else 0.0
+        }
+        
+        if self.debug_mode:
+            log.debug("Batch: %d frames in %.1fms (%.1f FPS)",
+                      num_frames, total_time * 1000, self.last_batch_stats['fps'])
+        
+        return [self._to_display(result, display) for result in results]
+    
+    def predict_multi(self, frames, on_decision=None, trace=None, display=None):
+        """
+        Inspect one bottle from several frames (batched, then voted)
+        
+        Args:
+            frames: BGR images of the same bottle
+            on_decision: Optional callback(decision), called once with the
+                fused decision
+            trace: Optional LatencyTrace, see predict_batch()
+            display: camera.geometry for raw ROI crops, see predict()
+            
+        Returns:
+            Fused InspectionResult (see fuse_results)
+        """
+        start_time = time.time()
+        result = self.fuse_results(self.predict_batch(frames, trace, display))
+        result.processing_time = time.time() - start_time
+        
+        if self.debug_mode:
+            log.debug("Voting (%s): %s | OK/NG votes: %d/%d | Time: %.1fms",
+                      self.voting_mode, result.result, result.votes[0], result.votes[1],
+                      result.processing_time * 1000)
+        
+        if on_decision:
+            on_decision(result.result)
+        return result
+    
+    def fuse_results(self, results):
+        """
+        Fuse per-frame results into one decision (VOTING_MODE)
+        
+        Args:
+            results: List of InspectionResult for the same bottle
+            
+        Returns:
+            The result of the most confident frame that agrees with the
+            fused decision, with votes set and the reason annotated
+        """
+        if len(results) == 1:
+            result = results[0]
+            result.votes = (1, 0) if result.result == 'OK' else (0, 1)
+            return result
+        
+        # Frame weight = mean detection confidence (blurred frames score low)
+        weights = [float(r.detections.scores.mean()) if len(r.detections) else 0.0
+                   for r in results]
+        ok_votes = sum(1 for r in results if r.result == 'OK')
+        ng_votes = len(results) - ok_votes
+        
+        if self.voting_mode == 'majority':
+            decision = 'OK' if ok_votes > ng_votes else 'NG'
+        elif self.voting_mode == 'confidence':
+            ok_weight = sum(w for r, w in zip(results, weights) if r.result == 'OK')
+            ng_weight = sum(w for r, w in zip(results, weights) if r.result == 'NG')
+            if ok_weight == 0.0 and ng_weight == 0.0:
+                # No detections to weigh (e.g. rules that pass empty frames): count votes
+                decision = 'OK' if ok_votes > ng_votes else 'NG'
+            else:
+                decision = 'OK' if ok_weight > ng_weight else 'NG'
+        else:
+            decision = 'NG' if ng_votes else 'OK'
+        
+        best = max((i for i, r in enumerate(results) if r.result == decision), key=lambda i: weights[i])
+        fused = results[best]
+        fused.votes = (ok_votes, ng_votes)
+        agree = ok_votes if decision == 'OK' else ng_votes
+        fused.reason = f"{fused.reason} ({agree}/{len(results)} frames)"
+        return fused
+    
+    def frames_within_budget(self, elapsed, num_frames):
+        """
+        Check if one more frame still fits in DECISION_BUDGET_MS
+        
+        Args:
+            elapsed: Seconds since the trigger
+            num_frames: Frames captured so far
+            
+        Returns:
+            bool: True if capturing and inferring another frame would
+            still finish before the deadline
+        """
+        per_frame = self.frame_time_estimate or 0.0
+        projected = elapsed + self.frame_delay + (num_frames + 1) * per_frame
+        return projected <= self.decision_budget
+    
+    def _predict_frame(self, frame, allocators=None, net=None, on_decision=None, trace=None,
+                       roi=None):
+        """
+        Preprocess, infer and post-process one frame
+        
+        Args:
+            frame: BGR image
+            allocators: Backend allocators to reuse (optional, ncnn only)
+            net: Model handle to run on (default: self.net)
+            on_decision: Optional callback(decision), called once: before NMS
+                when the early decision is certain, otherwise after sorting logic
+            trace: Optional LatencyTrace to mark the stages on
+            roi: Bottle box already located by the caller (default: run
+                the locator in two-stage mode)
+            
+        Returns:
+            InspectionResult without processing_time. early_decision holds
+            the pre-NMS decision ('OK'/'NG') or None if it was not certain.
+        """
+        start_time = time.time()
+        
+        # Preprocess (crop to the located bottle in two-stage mode)
+        img_h, img_w = frame.shape[:2]
+        if roi is None and self.locator:
+            roi = self.locator.locate(frame)
+        preprocessed, transform = self._preprocess(frame, allocators[0] if allocators else None, roi)
+        if trace:
+            trace.mark('preprocess')
+        
+        # Run inference
+        boxes, scores, class_ids = self._run_inference(preprocessed, img_w, img_h,
+                                                       transform, allocators, net, trace)
+        if trace:
+            trace.mark('decode')
+        
+        # Early decision straight from the candidates (hardware needs nothing else)
+        early = self._early_decision(scores, class_ids) if self.early_decision else None
+        if early and on_decision:
+            on_decision(early)
+        
+        # Apply NMS
+        boxes, scores, class_ids = self._apply_nms(boxes, scores, class_ids)
+        detections = self._to_detections(boxes, scores, class_ids)
+        if trace:
+            trace.mark('nms')
+        
+        # Apply sorting logic
+        result = self._apply_sorting_logic(detections)
+        
+        # Keep a reference for deferred annotation
+        result.frame = frame
+        result.early_decision = early
+        result.roi = roi
+        
+        if early and early != result.result:
+            log.error("Early decision %s differs from full result %s", early, result.result)
+        if on_decision and not early:
+            on_decision(result.result)
+        
+        self._update_frame_time(time.time() - start_time)
+        return result
+    
+    def _update_frame_time(self, elapsed):
+        """Per-frame time estimate for the latency budget guard (running average)"""
+        estimate = self.frame_time_estimate
+        self.frame_time_estimate = elapsed if estimate is None else 0.8 * estimate + 0.2 * elapsed
+    
+    def _to_display(self, result, display):
+        """
+        Map a result on a raw ROI crop to display coordinates
+        
+        The crop went through a single resample (into the model input);
+        boxes come back in crop pixels and are scaled here, so callers see
+        the same coordinates as on the display-size frame.
+        
+        Args:
+            result: InspectionResult whose frame is a raw crop
+            display: RoiGeometry of the crop (None = frame is already the
+                display image)
             
         Returns:
-            ncnn.Mat object
+            The same result
+        """
+        if display is None or result.display is not None:
+            return result
+        detections = result.detections
+        detections.boxes = display.boxes_to_display(detections.boxes)
+        if result.roi is not None:
+            roi = display.boxes_to_display(np.array([result.roi], dtype=np.int32))
+            result.roi = tuple(roi[0].tolist())
+        if result.annotated_image is not None:
+            # Fallback results come annotated on the crop
+            result.annotated_image = display.to_display(result.annotated_image)
+        result.display = display
+        return result
+    
+    def annotate(self, result):
         """
-        # Resize to model input size
-        resized = cv2.resize(frame, (self.input_size, self.input_size))
+        Get the annotated image for a result (drawn on first call, then cached)
         
-        # Convert BGR to RGB
-        rgb = cv2.cvtColor(resized, cv2.COLOR_BGR2RGB)
+        Drawing is kept off the decision path: the UI and the image saver
+        call this after the OK/NG command has gone to the Arduino.
         
-        # Create NCNN Mat
-        mat = ncnn.Mat.from_pixels(rgb, ncnn.Mat.PixelType.PIXEL_RGB, 
-                                    self.input_size, self.input_size)
+        Args:
+            result: InspectionResult from predict / predict_batch
+            
+        Returns:
+            Annotated BGR image at display size, or None if the result has
+            no frame
+        """
+        if result.annotated_image is None:
+            if result.frame is None:
+                return None
+            if result.display is not None:
+                image = result.display.to_display(result.frame)
+            else:
+                image = result.frame.copy()
+            result.annotated_image = self._draw_boxes(image, result.detections)
+        return result.annotated_image
+    
+    def _preprocess(self, frame, allocator=None, roi=None):
+        """
+        Preprocess frame for inference (see InferenceBackend.preprocess)
         
-        # Normalize (0-1)
-        mean_vals = []
-        norm_vals = [1/255.0, 1/255.0, 1/255.0]
-        mat.substract_mean_normalize(mean_vals, norm_vals)
+        With LETTERBOX enabled the aspect ratio is kept and the image is
+        centered on a gray canvas of the model input size.
         
-        return mat
+        Args:
+            frame: BGR image
+            allocator: Backend allocator for the input blob (optional)
+            roi: (x1, y1, x2, y2) to crop before resizing (optional); the
+                crop is always letterboxed so a narrow bottle is not stretched
+            
+        Returns:
+            Tuple (blob, transform) where transform is
+            (gain_x, gain_y, pad_x, pad_y) mapping model coordinates back to
+            full frame coordinates: frame = (model - pad) * gain
+        """
+        return self.backend.preprocess(frame, allocator, roi)
     
-    def _run_ncnn_inference(self, mat, img_w, img_h):
+    def _run_inference(self, blob, img_w, img_h, transform=None, allocators=None, net=None,
+                       trace=None):
         """
-        Run NCNN inference
+        Run the backend and decode its output
         
         Args:
-            mat: Preprocessed ncnn.Mat
+            blob: Preprocessed input from _preprocess
             img_w: Original image width
             img_h: Original image height
+            transform: (gain_x, gain_y, pad_x, pad_y) from _preprocess
+            allocators: Backend allocators to reuse (optional, ncnn only)
+            net: Model handle to run on (default: self.net)
+            trace: Optional LatencyTrace ('inference' is marked after the run)
             
         Returns:
-            List of detections (before NMS)
+            Tuple (boxes, scores, class_ids) of candidate arrays (before NMS)
         """
-        # Create extractor
-        ex = self.net.create_extractor()
-        ex.input("in0", mat)
-        
-        # Extract output
-        ret, out = ex.extract("out0")
+        out = self.backend.infer(net if net is not None else self.net, blob, allocators)
+        if trace:
+            trace.mark('inference')
         
-        if ret != 0:
-            print(f"[ERROR] NCNN extraction failed with code {ret}")
-            return []
+        if out is None:
+            return self._empty_candidates()
         
         # Parse output
-        detections = self._parse_ncnn_output(out, img_w, img_h)
+        return self._parse_ncnn_output(out, img_w, img_h, transform)
+    
+    @staticmethod
+    def _empty_candidates():
+        """Empty (boxes, scores, class_ids) triple"""
+        return (np.empty((0, 4), dtype=np.int32),
+                np.empty((0,), dtype=np.float32),
+                np.empty((0,), dtype=np.int32))
+    
+    def _output_view(self, output):
+        """
+        Channels-first view on a raw output tensor (see output_layout)
         
-        return detections
+        Args:
+            output: Raw output (ncnn.Mat or ndarray)
+            
+        Returns:
+            ndarray (4+classes, anchors): box rows first, then class scores
+        """
+        layout = self.output_layout
+        output_np = np.asarray(output)
+        if layout.channels_first:
+            return output_np.reshape(layout.num_channels, -1)
+        return output_np.reshape(-1, layout.num_channels).T
     
-    def _parse_ncnn_output(self, output, img_w, img_h):
+    def _parse_ncnn_output(self, output, img_w, img_h, transform=None):
         """
-        Parse NCNN output tensor into detections
+        Parse the raw output tensor into detections (vectorized)
+        
+        Threshold mask, argmax, box conversion, clamping and validity
+        filtering are all done as array operations over every anchor.
+        The tensor layout was probed at load (output_layout), so the
+        output is only viewed in place - never inspected or copied.
         
         Args:
-            output: ncnn.Mat output
+            output: Raw output (ncnn.Mat or ndarray)
             img_w: Original image width
             img_h: Original image height
+            transform: (gain_x, gain_y, pad_x, pad_y) from _preprocess;
+                defaults to a plain stretch of the frame to the input size
             
         Returns:
-            List of detection dicts
+            Tuple (boxes, scores, class_ids):
+                - boxes: int32 array (N, 4) as [x1, y1, x2, y2] in image pixels
+                - scores: float32 array (N,)
+                - class_ids: int32 array (N,)
         """
-        detections = []
-        
         try:
-            # Convert ncnn.Mat to numpy array
-            output_np = np.array(output)
+            output_np = self._output_view(output)
             
-            if self.debug_mode:
-                print(f"[AI] NCNN output shape: {output_np.shape}")
-            
-            # Handle batch dimension
-            if len(output_np.shape) == 3:
-                output_np = output_np[0]
-            
-            # YOLOv8 NCNN format: (num_classes+4, num_boxes) -> Transpose to (num_boxes, num_classes+4)
-            # If shape[0] < shape[1], it means we need to transpose
-            if output_np.shape[0] < output_np.shape[1]:
-                output_np = output_np.T
-                if self.debug_mode:
-                    print(f"[AI] Transposed to: {output_np.shape}")
-            
-            num_detections = output_np.shape[0]
-            num_classes = len(self.class_names)
-            
-            # Scale factors
-            scale_x = img_w / self.input_size
-            scale_y = img_h / self.input_size
-            
-            # Limit number of detections to process
-            max_process = min(num_detections, 8400)
-            
-            for i in range(max_process):
-                detection = output_np[i]
-                
-                # Check if detection has enough values
-                if len(detection) < 4 + num_classes:
-                    continue
-                
-                # YOLOv8 format: [x_center, y_center, width, height, class1_score, class2_score, ...]
-                # Coordinates are in input_size scale (0-640), not normalized (0-1)
-                x_center = detection[0] * scale_x
-                y_center = detection[1] * scale_y
-                width = detection[2] * scale_x
-                height = detection[3] * scale_y
-                
-                # Extract class scores
-                class_scores = detection[4:4+num_classes]
-                
-                # Get best class
-                class_id = np.argmax(class_scores)
-                confidence = float(class_scores[class_id])
-                
-                # Filter by confidence
-                if confidence > self.confidence_threshold:
-                    # Convert to corner format
-                    x1 = int(x_center - width / 2)
-                    y1 = int(y_center - height / 2)
-                    x2 = int(x_center + width / 2)
-                    y2 = int(y_center + height / 2)
-                    
-                    # Clamp to image bounds
-                    x1 = max(0, min(x1, img_w))
-                    y1 = max(0, min(y1, img_h))
-                    x2 = max(0, min(x2, img_w))
-                    y2 = max(0, min(y2, img_h))
-                    
-                    # Only add if box is valid
-                    if x2 > x1 and y2 > y1:
-                        detections.append({
-                            'class_id': int(class_id),
-                            'class_name': self.class_names[class_id],
-                            'confidence': confidence,
-                            'bbox': [x1, y1, x2, y2]
-                        })
-                        
-                        # Debug first detection
-                        if self.debug_mode and len(detections) == 1:
-                            print(f"[AI] First detection: {self.class_names[class_id]} "
-                                  f"at ({x1},{y1})-({x2},{y2}), conf={confidence:.2f}")
+            # Best class score per anchor, then keep anchors above threshold
+            class_scores = output_np[4:]
+            best_scores = class_scores.max(axis=0)
+            keep = np.flatnonzero(best_scores > self.confidence_threshold)
+            if keep.size == 0:
+                return self._empty_candidates()
+            
+            scores = best_scores[keep].astype(np.float32)
+            class_ids = class_scores[:, keep].argmax(axis=0).astype(np.int32)
+            
+            # Coordinates are in model input pixels, not normalized (0-1).
+            # Undo letterbox padding and scaling to get frame coordinates.
+            if transform is None:
+                transform = (img_w / self.input_w, img_h / self.input_h, 0, 0)
+            gain_x, gain_y, pad_x, pad_y = transform
+            
+            # Normalized outputs: fold the input size into the transform
+            scale_x, scale_y = self.output_layout.coord_scale
+            if scale_x != 1.0 or scale_y != 1.0:
+                gain_x, gain_y, pad_x, pad_y = (gain_x * scale_x, gain_y * scale_y,
+                                                pad_x / scale_x, pad_y / scale_y)
+            
+            x_center = (output_np[0, keep] - pad_x) * gain_x
+            y_center = (output_np[1, keep] - pad_y) * gain_y
+            half_w = output_np[2, keep] * gain_x / 2
+            half_h = output_np[3, keep] * gain_y / 2
+            
+            # Corner format (truncate like int()), clamped to image bounds
+            boxes = np.empty((keep.size, 4), dtype=np.int32)
+            boxes[:, 0] = np.clip((x_center - half_w).astype(np.int32), 0, img_w)
+            boxes[:, 1] = np.clip((y_center - half_h).astype(np.int32), 0, img_h)
+            boxes[:, 2] = np.clip((x_center + half_w).astype(np.int32), 0, img_w)
+            boxes[:, 3] = np.clip((y_center + half_h).astype(np.int32), 0, img_h)
+            
+            # Only keep valid boxes
+            valid = (boxes[:, 2] > boxes[:, 0]) & (boxes[:, 3] > boxes[:, 1])
+            if not valid.all():
+                boxes, scores, class_ids = boxes[valid], scores[valid], class_ids[valid]
+            
+            if self.debug_mode and len(scores) > 0:
+                x1, y1, x2, y2 = boxes[0]
+                log.debug("First detection: %s at (%d,%d)-(%d,%d), conf=%.2f",
+                          self.class_names[class_ids[0]], x1, y1, x2, y2, scores[0])
+            
+            return boxes, scores, class_ids
         
         except Exception as e:
-            print(f"[ERROR] Parse NCNN output failed: {e}")
-            if self.debug_mode:
-                import traceback
-                traceback.print_exc()
+            log.error("Parse NCNN output failed: %s", e, exc_info=self.debug_mode)
+            return self._empty_candidates()
+    
+    def _apply_nms(self, boxes, scores, class_ids):
+        """
+        Apply Non-Maximum Suppression directly on the decoder arrays
         
-        return detections
+        Candidates are sorted by score and truncated to NMS_TOP_K before
+        suppression, and at most MAX_DETECTIONS boxes are kept, so the cost
+        stays bounded on bad frames. With NMS_CLASS_AWARE each class is
+        suppressed separately (a 'cap' box never removes a 'Cap-Defect' box).
+        
+        Args:
+            boxes: int32 array (N, 4) as [x1, y1, x2, y2]
+            scores: float32 array (N,)
+            class_ids: int32 array (N,)
+            
+        Returns:
+            Filtered (boxes, scores, class_ids), sorted by score
+        """
+        num_candidates = len(scores)
+        if num_candidates == 0:
+            return boxes, scores, class_ids
+        
+        # Highest score first, then top-k pre-truncation
+        order = np.argsort(-scores, kind='stable')
+        if self.nms_top_k and num_candidates > self.nms_top_k:
+            order = order[:self.nms_top_k]
+        
+        nms_boxes = boxes[order].astype(np.float32)
+        if self.nms_class_aware:
+            # Batched NMS: shift each class to its own coordinate range so
+            # boxes of different classes can never overlap
+            offset = class_ids[order].astype(np.float32) * (float(nms_boxes.max()) + 1.0)
+            nms_boxes += offset[:, None]
+        
+        keep = self._nms_keep(nms_boxes, self.nms_threshold, self.max_detections)
+        indices = order[keep]
+        
+        if self.debug_mode and len(indices) != num_candidates:
+            log.debug("NMS: %d -> %d detections", num_candidates, len(indices))
+        
+        return boxes[indices], scores[indices], class_ids[indices]
     
-    def _apply_nms(self, detections):
+    @staticmethod
+    def _nms_keep(boxes, iou_threshold, max_keep=0):
         """
-        Apply Non-Maximum Suppression using cv2.dnn.NMSBoxes
+        Greedy NMS over score-sorted boxes
         
         Args:
-            detections: List of detection dicts
+            boxes: float32 array (N, 4) as [x1, y1, x2, y2], sorted by score
+            iou_threshold: Suppress boxes with IoU above this
+            max_keep: Stop after this many boxes (0 = no limit)
             
         Returns:
-            Filtered list of detections
+            int array of kept row indices
         """
-        if len(detections) == 0:
-            return []
+        x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+        areas = (x2 - x1) * (y2 - y1)
+        suppressed = np.zeros(len(boxes), dtype=bool)
+        keep = []
         
-        # Prepare data for NMS
-        boxes = []
-        confidences = []
-        class_ids = []
+        for i in range(len(boxes)):
+            if suppressed[i]:
+                continue
+            keep.append(i)
+            if max_keep and len(keep) >= max_keep:
+                break
+            
+            # IoU of box i against all lower-scored boxes
+            inter_w = np.minimum(x2[i], x2[i + 1:]) - np.maximum(x1[i], x1[i + 1:])
+            inter_h = np.minimum(y2[i], y2[i + 1:]) - np.maximum(y1[i], y1[i + 1:])
+            inter = np.clip(inter_w, 0, None) * np.clip(inter_h, 0, None)
+            iou = inter / (areas[i] + areas[i + 1:] - inter)
+            suppressed[i + 1:] |= iou > iou_threshold
         
-        for det in detections:
-            x1, y1, x2, y2 = det['bbox']
-            # cv2.dnn.NMSBoxes expects [x, y, width, height]
-            boxes.append([x1, y1, x2 - x1, y2 - y1])
-            confidences.append(float(det['confidence']))
-            class_ids.append(det['class_id'])
+        return np.asarray(keep, dtype=np.int64)
+    
+    def _to_detections(self, boxes, scores, class_ids):
+        """
+        Wrap detection arrays in a columnar Detections container (no copy)
         
-        # Apply NMS
-        indices = cv2.dnn.NMSBoxes(
-            boxes,
-            confidences,
-            self.confidence_threshold,
-            self.nms_threshold
-        )
+        Args:
+            boxes: int32 array (N, 4)
+            scores: float32 array (N,)
+            class_ids: int32 array (N,)
+            
+        Returns:
+            Detections
+        """
+        return Detections(boxes, scores, class_ids, self.class_names)
+    
+    def set_sku(self, sku):
+        """
+        Switch the sorting rules to another product
         
-        # Filter detections
-        if len(indices) > 0:
-            # indices is a list of lists in OpenCV 4.x
-            if isinstance(indices, tuple):
-                indices = indices[0] if len(indices) > 0 else []
+        Args:
+            sku: Key of SORTING_RULES
             
-            # Flatten if needed
-            if len(indices) > 0 and isinstance(indices[0], (list, np.ndarray)):
-                indices = [i[0] if isinstance(i, (list, np.ndarray)) else i for i in indices]
+        Returns:
+            bool: True if the SKU exists
+        """
+        if sku not in self.rule_sets:
+            fallback = next(iter(self.rule_sets))
+            print(f"[WARNING] Unknown SKU '{sku}', using '{self.sku or fallback}' rules")
+            if self.rules is None:
+                self.sku, self.rules = fallback, self.rule_sets[fallback]
+            return False
+        
+        self.sku = sku
+        self.rules = self.rule_sets[sku]
+        return True
+    
+    def _early_decision(self, scores, class_ids):
+        """
+        Decide OK/NG from decoded candidates, before NMS
+        
+        The sorting rules only depend on which classes are present. With
+        class-aware NMS the best candidate of each class is never suppressed
+        (boxes of other classes cannot overlap it), so a class is present
+        after NMS exactly when its best candidate is ranked inside
+        NMS_TOP_K, unless MAX_DETECTIONS could stop NMS before reaching it.
+        In that case (and for class-agnostic NMS) None is returned and the
+        decision waits for the full path.
+        
+        Args:
+            scores: float32 array (N,) from _parse_ncnn_output
+            class_ids: int32 array (N,) from _parse_ncnn_output
             
-            filtered_detections = [detections[i] for i in indices]
-        else:
-            filtered_detections = []
+        Returns:
+            'OK', 'NG', or None if NMS could change the outcome
+        """
+        if not self.nms_class_aware:
+            return None
         
-        if self.debug_mode and len(detections) != len(filtered_detections):
-            print(f"[AI] NMS: {len(detections)} -> {len(filtered_detections)} detections")
+        # Same stable order as _apply_nms; rank of each class's best candidate
+        order = np.argsort(-scores, kind='stable')
+        classes, first_rank = np.unique(class_ids[order], return_index=True)
         
-        return filtered_detections
+        if self.nms_top_k:
+            kept = first_rank < self.nms_top_k  # others are cut by top-k before NMS
+            classes, first_rank = classes[kept], first_rank[kept]
+        if self.max_detections and (first_rank >= self.max_detections).any():
+            return None  # may or may not be reached before NMS stops
+        
+        # The best candidate of each class survives NMS, so its score is the
+        # class confidence after NMS too
+        confidence = np.zeros(len(self.class_names), dtype=np.float32)
+        confidence[classes] = scores[order[first_rank]]
+        return self.rules.decide(confidence)
     
     def _apply_sorting_logic(self, detections):
         """
         Apply sorting logic based on detections
         
         Args:
-            detections: List of detection dicts
+            detections: Detections container
             
         Returns:
-            dict with result and reason
+            InspectionResult with result and reason
         """
-        # Check for defects
-        defects_found = []
-        for det in detections:
-            if det['class_id'] in self.defect_classes:
-                defects_found.append(det['class_name'])
+        rules = self.rules
+        confidence = class_confidence(detections.scores, detections.class_ids, len(self.class_names))
+        fired, hits = rules.evaluate(confidence)
         
-        # Check for required components
-        has_cap = any(det['class_id'] == self.required_components['cap'] for det in detections)
-        has_filled = any(det['class_id'] == self.required_components['filled'] for det in detections)
-        has_label = any(det['class_id'] == self.required_components['label'] for det in detections)
+        # Component flags for the UI and database
+        has_cap = bool(confidence[self.required_components['cap']] > 0)
+        has_filled = bool(confidence[self.required_components['filled']] > 0)
+        has_label = bool(confidence[self.required_components['label']] > 0)
         
         if self.debug_mode:
-            print(f"[AI] Components: cap={has_cap}, filled={has_filled}, label={has_label}")
-            if defects_found:
-                print(f"[AI] Defects: {defects_found}")
-        
-        # RULE 1: Any defect -> NG
-        if defects_found:
-            return {
-                'result': 'NG',
-                'reason': f'Defect: {", ".join(defects_found)}',
-                'detections': detections,
-                'has_cap': has_cap,
-                'has_filled': has_filled,
-                'has_label': has_label,
-                'defects_found': defects_found
-            }
-        
-        # RULE 2: Missing required components -> NG
-        missing = []
-        if self.require_cap and not has_cap:
-            missing.append('cap')
-        if self.require_filled and not has_filled:
-            missing.append('filled')
-        if self.require_label and not has_label:
-            missing.append('label')
-        
-        if missing:
-            return {
-                'result': 'NG',
-                'reason': f'Missing: {", ".join(missing)}',
-                'detections': detections,
-                'has_cap': has_cap,
-                'has_filled': has_filled,
-                'has_label': has_label,
-                'defects_found': []
-            }
-        
-        # RULE 3: All good -> OK
-        return {
-            'result': 'OK',
-            'reason': 'All components present, no defects',
-            'detections': detections,
-            'has_cap': has_cap,
-            'has_filled': has_filled,
-            'has_label': has_label,
-            'defects_found': []
-        }
+            log.debug("Components: cap=%s, filled=%s, label=%s", has_cap, has_filled, has_label)
+        
+        # No rule fired -> OK
+        if fired < 0:
+            return InspectionResult('OK', 'All components present, no defects', detections,
+                                    has_cap, has_filled, has_label)
+        
+        if rules.is_require[fired]:
+            # Missing components, in class order
+            names = [self.class_names[class_id] for class_id in np.flatnonzero(hits).tolist()]
+            defects_found = []
+        else:
+            # Defect names in detection order (for the reason text)
+            thresholds = rules.thresholds[fired]
+            names = [self.class_names[class_id]
+                     for class_id, score in zip(detections.class_ids.tolist(), detections.scores.tolist())
+                     if hits[class_id] and score >= thresholds[class_id]]
+            defects_found = names
+            if self.debug_mode:
+                log.debug("Defects: %s", defects_found)
+        
+        return InspectionResult(rules.results[fired], f'{rules.reasons[fired]}: {", ".join(names)}',
+                                detections, has_cap, has_filled, has_label, defects_found)
     
     def _draw_boxes(self, image, detections):
         """
@@ -435,18 +1418,18 @@ class AIEngine:
         
         Args:
             image: BGR image
-            detections: List of detection dicts
+            detections: Detections container
             
         Returns:
             Annotated image
         """
         for det in detections:
-            x1, y1, x2, y2 = det['bbox']
-            class_name = det['class_name']
-            confidence = det['confidence']
+            x1, y1, x2, y2 = det.bbox
+            class_name = det.class_name
+            confidence = det.confidence
             
             # Color: Red for defects, Green for components
-            if det['class_id'] in self.defect_classes:
+            if det.class_id in self.defect_classes:
                 color = (0, 0, 255)  # Red
             else:
                 color = (0, 255, 0)  # Green
@@ -472,32 +1455,33 @@ class AIEngine:
     
     def _dummy_prediction(self, frame):
         """
-        Dummy prediction for testing without NCNN
+        Fallback result when no model is loaded or a prediction failed
+        
+        The bottle is rejected (fail safe). With DUMMY_PREDICTIONS the
+        result is random instead, for testing the UI and hardware without
+        a model.
         
         Args:
             frame: BGR image
             
         Returns:
-            Dummy result dict
+            InspectionResult
         """
-        import random
-        
-        result = 'OK' if random.random() > 0.3 else 'NG'
-        reason = 'Dummy prediction (NCNN not available)'
+        if self.dummy_predictions:
+            import random
+            result = 'OK' if random.random() > 0.3 else 'NG'
+            reason = 'Dummy prediction (DUMMY_PREDICTIONS)'
+        else:
+            result = 'NG'
+            reason = 'No model loaded' if not self.model_loaded else 'Prediction failed'
         
         # Draw text on frame
         annotated = frame.copy()
         cv2.putText(annotated, f"DUMMY MODE: {result}", (10, 30),
                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
         
-        return {
-            'result': result,
-            'reason': reason,
-            'detections': [],
-            'annotated_image': annotated,
-            'processing_time': 0.05,
-            'has_cap': True,
-            'has_filled': True,
-            'has_label': True,
-            'defects_found': []
-        }
+        dummy = InspectionResult(result, reason, Detections.empty(self.class_names),
+                                 has_cap=False, has_filled=False, has_label=False, frame=frame)
+        dummy.annotated_image = annotated
+        dummy.processing_time = 0.05
+        return dummy
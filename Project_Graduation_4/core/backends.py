@@ -0,0 +1,401 @@
+"""
+Inference Backends for Coca-Cola Sorting System
+ncnn, OpenCV DNN and ONNX Runtime behind one small interface
+"""
+
+import os
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+from core.log import get_logger
+
+try:
+    import ncnn
+    NCNN_AVAILABLE = True
+except ImportError:
+    NCNN_AVAILABLE = False
+
+try:
+    import onnxruntime
+    ONNXRUNTIME_AVAILABLE = True
+except ImportError:
+    ONNXRUNTIME_AVAILABLE = False
+
+log = get_logger("AI")
+
+
+# Output tensor layout, probed once when the model is loaded:
+#   channels_first: (4+classes, anchors) instead of (anchors, 4+classes)
+#   num_channels:   4 box values + one score per class
+#   num_anchors:    number of candidate boxes
+#   coord_scale:    (sx, sy) to convert box values to input pixels
+#                   (1, 1) for pixel outputs, input size for normalized ones
+OutputLayout = namedtuple('OutputLayout', 'channels_first num_channels num_anchors coord_scale')
+
+
+class InferenceBackend:
+    """
+    Backend interface
+
+    A backend loads independent model handles ("nets", one per inference
+    worker), turns a frame into its input blob and returns the raw output
+    tensor. Decoding, NMS and the sorting rules stay in AIEngine, which
+    probes the output layout once through infer().
+    """
+
+    name = None
+
+    def __init__(self, ai):
+        """
+        Args:
+            ai: AIEngine (model path, precision, input size, letterbox)
+        """
+        self.ai = ai
+
+    @classmethod
+    def available(cls):
+        """Check if the runtime package is installed"""
+        return False
+
+    def model_files(self):
+        """
+        Files this backend loads from the model folder
+
+        Returns:
+            List of paths
+        """
+        raise NotImplementedError
+
+    def create_net(self, num_threads, options=None):
+        """
+        Load an independent model handle
+
+        Args:
+            num_threads: CPU threads this handle may use
+            options: Backend-specific option overrides (optional)
+
+        Returns:
+            Model handle or None on failure
+        """
+        raise NotImplementedError
+
+    def preprocess(self, frame, allocator=None, roi=None):
+        """
+        Turn a BGR frame into the model input
+
+        Args:
+            frame: BGR image
+            allocator: Allocator from new_allocators() (optional)
+            roi: (x1, y1, x2, y2) to crop first (optional, always letterboxed)
+
+        Returns:
+            Tuple (blob, transform) where transform is (gain_x, gain_y,
+            pad_x, pad_y): frame = (model - pad) * gain
+        """
+        raise NotImplementedError
+
+    def infer(self, net, blob, allocators=None):
+        """
+        Run the model
+
+        Args:
+            net: Handle from create_net()
+            blob: Input from preprocess()
+            allocators: From new_allocators() (optional)
+
+        Returns:
+            Raw output tensor (anything np.asarray accepts) or None on failure
+        """
+        raise NotImplementedError
+
+    def describe_layout(self, net):
+        """
+        Run one blank (letterbox gray) frame to find the output tensor layout
+
+        Args:
+            net: Handle from create_net()
+
+        Returns:
+            OutputLayout, or None if the output does not fit CLASS_NAMES
+        """
+        ai = self.ai
+        frame = np.full((ai.input_h, ai.input_w, 3), 114, dtype=np.uint8)
+        blob, _ = self.preprocess(frame)
+        out = self.infer(net, blob)
+        if out is None:
+            print(f"[ERROR] {self.name} inference failed while probing the model")
+            return None
+
+        output_np = np.array(out)
+        dims = [d for d in output_np.shape if d != 1]  # Drop the batch dimension
+        expected = 4 + len(ai.class_names)
+        if len(dims) != 2 or expected not in dims:
+            print(f"[ERROR] Model output shape {output_np.shape} does not fit "
+                  f"{len(ai.class_names)} classes (expected 4+{len(ai.class_names)} channels)")
+            return None
+
+        channels_first = dims[0] == expected
+        output_np = output_np.reshape(dims) if channels_first else output_np.reshape(dims).T
+
+        # Box centers come from the anchor grid, so pixel outputs reach far
+        # beyond 1 even for a blank input (all zeros: assume pixels)
+        center_max = float(np.abs(output_np[:2]).max())
+        normalized = 0.0 < center_max <= 2.0
+        coord_scale = (float(ai.input_w), float(ai.input_h)) if normalized else (1.0, 1.0)
+
+        return OutputLayout(channels_first, expected, output_np.shape[1], coord_scale)
+
+    def new_allocators(self):
+        """Reusable memory for a batch of inferences (None if not supported)"""
+        return None
+
+    def release_allocators(self, allocators):
+        """Free memory from new_allocators()"""
+
+    def describe(self):
+        """One-line description for logs"""
+        return self.name
+
+    def _letterbox_geometry(self, img_w, img_h):
+        """Resized size and centered padding for LETTERBOX / ROI crops"""
+        ai = self.ai
+        ratio = min(ai.input_w / img_w, ai.input_h / img_h)
+        new_w = max(1, min(ai.input_w, int(round(img_w * ratio))))
+        new_h = max(1, min(ai.input_h, int(round(img_h * ratio))))
+        pad_w, pad_h = ai.input_w - new_w, ai.input_h - new_h
+        return new_w, new_h, pad_w, pad_h, pad_w // 2, pad_h // 2
+
+
+class NcnnBackend(InferenceBackend):
+    """Tencent ncnn (.param/.bin, fp32 or int8)"""
+
+    name = 'ncnn'
+
+    @classmethod
+    def available(cls):
+        return NCNN_AVAILABLE
+
+    def model_files(self):
+        return [os.path.join(self.ai.model_path, f) for f in self.ai.MODEL_FILES[self.ai.precision]]
+
+    def create_net(self, num_threads, options=None):
+        ai = self.ai
+        try:
+            param_path, bin_path = self.model_files()
+
+            if not os.path.exists(param_path) or not os.path.exists(bin_path):
+                print(f"[ERROR] Model files not found at {ai.model_path}")
+                print(f"  Expected: {param_path}")
+                print(f"  Expected: {bin_path}")
+                return None
+
+            # Options must be set before loading the model
+            net = ncnn.Net()
+            net.opt.num_threads = num_threads
+            net.opt.lightmode = ai.ncnn_light_mode
+            net.opt.use_packing_layout = ai.ncnn_packing_layout
+            net.opt.use_int8_inference = ai.precision == 'int8'
+
+            for key, value in (ai.ncnn_options if options is None else options).items():
+                setattr(net.opt, key, value)
+
+            net.load_param(param_path)
+            net.load_model(bin_path)
+            return net
+
+        except Exception as e:
+            print(f"[ERROR] Failed to load NCNN model: {e}")
+            return None
+
+    def preprocess(self, frame, allocator=None, roi=None):
+        """
+        Resize, BGR->RGB swap and pixel packing happen in one native
+        ncnn.Mat.from_pixels_resize call, followed by in-place 0-1
+        normalization and (letterbox) a constant border.
+        """
+        ai = self.ai
+        offset_x = offset_y = 0
+        if roi is not None:
+            offset_x, offset_y, x2, y2 = roi
+            frame = frame[offset_y:y2, offset_x:x2]
+
+        img_h, img_w = frame.shape[:2]
+        if not frame.flags['C_CONTIGUOUS']:
+            frame = np.ascontiguousarray(frame)
+
+        if not ai.letterbox and roi is None:
+            # Stretch to model input size
+            mat = ncnn.Mat.from_pixels_resize(frame, ncnn.Mat.PixelType.PIXEL_BGR2RGB,
+                                              img_w, img_h,
+                                              ai.input_w, ai.input_h, allocator)
+            mat.substract_mean_normalize(ai.mean_vals, ai.norm_vals)
+            return mat, (img_w / ai.input_w, img_h / ai.input_h, 0, 0)
+
+        # Letterbox: scale to fit, keep aspect ratio
+        new_w, new_h, pad_w, pad_h, left, top = self._letterbox_geometry(img_w, img_h)
+
+        mat = ncnn.Mat.from_pixels_resize(frame, ncnn.Mat.PixelType.PIXEL_BGR2RGB,
+                                          img_w, img_h, new_w, new_h, allocator)
+        mat.substract_mean_normalize(ai.mean_vals, ai.norm_vals)
+
+        # Pad to the (stride-aligned) model input size, centered
+        if pad_w or pad_h:
+            mat = ncnn.copy_make_border(mat, top, pad_h - top, left, pad_w - left,
+                                        ncnn.BorderType.BORDER_CONSTANT, ai.letterbox_value)
+
+        # Fold the crop offset into the padding: (m - pad) * g + off = (m - (pad - off / g)) * g
+        gain_x, gain_y = img_w / new_w, img_h / new_h
+        return mat, (gain_x, gain_y, left - offset_x / gain_x, top - offset_y / gain_y)
+
+    def infer(self, net, blob, allocators=None):
+        ex = net.create_extractor()
+        if allocators:
+            ex.set_blob_allocator(allocators[0])
+            ex.set_workspace_allocator(allocators[1])
+        ex.input("in0", blob)
+
+        ret, out = ex.extract("out0")
+        if ret != 0:
+            log.error("NCNN extraction failed with code %d", ret)
+            return None
+        return out
+
+    def new_allocators(self):
+        """(blob, workspace) pool allocators shared by a batch"""
+        return (ncnn.UnlockedPoolAllocator(), ncnn.PoolAllocator())
+
+    def release_allocators(self, allocators):
+        for allocator in allocators:
+            allocator.clear()
+
+    def describe(self):
+        return f"ncnn {self.ai.precision}"
+
+
+class _OnnxBackend(InferenceBackend):
+    """Common part of the backends that run the ONNX export (NCHW float blob)"""
+
+    def model_files(self):
+        return [os.path.join(self.ai.model_path, self.ai.onnx_model_file)]
+
+    def preprocess(self, frame, allocator=None, roi=None):
+        ai = self.ai
+        offset_x = offset_y = 0
+        if roi is not None:
+            offset_x, offset_y, x2, y2 = roi
+            frame = frame[offset_y:y2, offset_x:x2]
+
+        img_h, img_w = frame.shape[:2]
+
+        if not ai.letterbox and roi is None:
+            # Stretch to model input size (resize, BGR->RGB, 0-1, NCHW in one call)
+            blob = cv2.dnn.blobFromImage(frame, 1 / 255.0, (ai.input_w, ai.input_h), swapRB=True)
+            return blob, (img_w / ai.input_w, img_h / ai.input_h, 0, 0)
+
+        # Letterbox on a gray canvas of the model input size
+        new_w, new_h, pad_w, pad_h, left, top = self._letterbox_geometry(img_w, img_h)
+        resized = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+        canvas = cv2.copyMakeBorder(resized, top, pad_h - top, left, pad_w - left,
+                                    cv2.BORDER_CONSTANT, value=(114, 114, 114))
+        blob = cv2.dnn.blobFromImage(canvas, 1 / 255.0, swapRB=True)
+
+        gain_x, gain_y = img_w / new_w, img_h / new_h
+        return blob, (gain_x, gain_y, left - offset_x / gain_x, top - offset_y / gain_y)
+
+    def _onnx_path(self):
+        """Path of the ONNX file, or None (with an error) if it is missing"""
+        path = self.model_files()[0]
+        if not os.path.exists(path):
+            print(f"[ERROR] ONNX model not found: {path}")
+            print("  Export it with: yolo export model=best.pt format=onnx "
+                  f"imgsz={self.ai.input_h},{self.ai.input_w}")
+            return None
+        return path
+
+
+class OpenCvDnnBackend(_OnnxBackend):
+    """OpenCV DNN module on the CPU (no extra package)"""
+
+    name = 'opencv'
+
+    @classmethod
+    def available(cls):
+        return hasattr(cv2, 'dnn')
+
+    def create_net(self, num_threads, options=None):
+        path = self._onnx_path()
+        if path is None:
+            return None
+        try:
+            net = cv2.dnn.readNetFromONNX(path)  # Default: OpenCV's own CPU implementation
+            cv2.setNumThreads(num_threads)  # Process-wide in OpenCV
+            return net
+        except Exception as e:
+            print(f"[ERROR] Failed to load ONNX model with OpenCV DNN: {e}")
+            return None
+
+    def infer(self, net, blob, allocators=None):
+        net.setInput(blob)
+        return net.forward()
+
+
+class OnnxRuntimeBackend(_OnnxBackend):
+    """ONNX Runtime CPU execution provider"""
+
+    name = 'onnxruntime'
+
+    @classmethod
+    def available(cls):
+        return ONNXRUNTIME_AVAILABLE
+
+    def create_net(self, num_threads, options=None):
+        path = self._onnx_path()
+        if path is None:
+            return None
+        try:
+            session_options = onnxruntime.SessionOptions()
+            session_options.intra_op_num_threads = num_threads
+            session_options.inter_op_num_threads = 1
+            session_options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+            session = onnxruntime.InferenceSession(path, session_options,
+                                                   providers=['CPUExecutionProvider'])
+            return session, session.get_inputs()[0].name
+        except Exception as e:
+            print(f"[ERROR] Failed to load ONNX model with ONNX Runtime: {e}")
+            return None
+
+    def infer(self, net, blob, allocators=None):
+        session, input_name = net
+        return session.run(None, {input_name: blob})[0]
+
+
+# Search order when the configured backend is not installed
+BACKENDS = {backend.name: backend for backend in (NcnnBackend, OnnxRuntimeBackend, OpenCvDnnBackend)}
+
+
+def create_backend(name, ai):
+    """
+    Create the configured backend, or the first installed one
+
+    Args:
+        name: 'ncnn', 'onnxruntime' or 'opencv'
+        ai: AIEngine
+
+    Returns:
+        InferenceBackend, or None if no runtime is installed
+    """
+    backend_class = BACKENDS.get(name)
+    if backend_class is None:
+        print(f"[ERROR] Unknown INFERENCE_BACKEND '{name}' (expected one of {list(BACKENDS)})")
+    elif backend_class.available():
+        return backend_class(ai)
+    else:
+        print(f"[ERROR] Inference backend '{name}' is not installed")
+
+    for fallback in BACKENDS.values():
+        if fallback.available():
+            print(f"[WARNING] Using the '{fallback.name}' backend instead")
+            return fallback(ai)
+    return None
@@ -7,8 +7,245 @@ import cv2
 import numpy as np
 import threading
 import time
+from collections import namedtuple
+from contextlib import contextmanager
 from datetime import datetime
 import config
+from core.log import get_logger
+
+log = get_logger("Camera")
+
+
+class RoiGeometry(namedtuple('RoiGeometry', 'x1 y1 x2 y2 display_w display_h')):
+    """
+    ROI crop of a camera frame and the size it is displayed at
+    
+    Computed once from config (ENABLE_ROI_CROP, ROI_CROP_*_PX) and the
+    frame size, so the hot path does no config lookups. Inspection works
+    on the raw crop (the model input resize is its only resample); the
+    display image and detection boxes are mapped to display_w x display_h.
+    """
+    __slots__ = ()
+    
+    @classmethod
+    def from_config(cls, cfg, frame_w, frame_h, display_w, display_h):
+        """
+        Args:
+            cfg: Config module
+            frame_w, frame_h: Camera frame size
+            display_w, display_h: Size the cropped frame is shown at
+        
+        Returns:
+            RoiGeometry (whole frame at its own size if cropping is off)
+        """
+        if getattr(cfg, 'ENABLE_ROI_CROP', False):
+            left = max(0, int(getattr(cfg, 'ROI_CROP_LEFT_PX', 0) or 0))
+            right = max(0, int(getattr(cfg, 'ROI_CROP_RIGHT_PX', 0) or 0))
+            top = max(0, int(getattr(cfg, 'ROI_CROP_TOP_PX', 0) or 0))
+            bottom = max(0, int(getattr(cfg, 'ROI_CROP_BOTTOM_PX', 0) or 0))
+            if (left + right) < (frame_w - 1) and (top + bottom) < (frame_h - 1):
+                return cls(left, top, frame_w - right, frame_h - bottom, display_w, display_h)
+        return cls(0, 0, frame_w, frame_h, frame_w, frame_h)
+    
+    @property
+    def crop_size(self):
+        """(width, height) of the crop"""
+        return self.x2 - self.x1, self.y2 - self.y1
+    
+    @property
+    def scale(self):
+        """(x, y) factors from crop to display coordinates"""
+        crop_w, crop_h = self.crop_size
+        return self.display_w / crop_w, self.display_h / crop_h
+    
+    def crop(self, frame):
+        """ROI of a full frame as a view (no copy)"""
+        return frame[self.y1:self.y2, self.x1:self.x2]
+    
+    def to_display(self, crop, dst=None):
+        """
+        Resample a crop to the display size
+        
+        Args:
+            crop: Crop from crop() (or a copy of it)
+            dst: Optional preallocated display-size output
+        
+        Returns:
+            New display image (or dst), never the input itself
+        """
+        size = (self.display_w, self.display_h)
+        if (crop.shape[1], crop.shape[0]) == size:
+            if dst is None:
+                return crop.copy()
+            np.copyto(dst, crop)
+            return dst
+        return cv2.resize(crop, size, dst=dst)
+    
+    def boxes_to_display(self, boxes):
+        """
+        Map (N, 4) x1,y1,x2,y2 boxes from crop to display coordinates
+        
+        Returns:
+            int32 array (the input itself if no scaling is needed)
+        """
+        sx, sy = self.scale
+        if sx == 1.0 and sy == 1.0:
+            return boxes
+        out = np.empty(boxes.shape, dtype=np.int32)
+        out[:, 0::2] = np.clip(boxes[:, 0::2] * sx, 0, self.display_w - 1)
+        out[:, 1::2] = np.clip(boxes[:, 1::2] * sy, 0, self.display_h - 1)
+        return out
+
+
+class FrameRing:
+    """
+    Preallocated ring of the last N frames
+    
+    Every slot holds a frame with its capture time (time.monotonic()) and
+    sequence number, so a trigger can be matched to the frame taken when
+    it fired instead of whatever frame is current when a worker thread
+    gets scheduled.
+    
+    The capture thread decodes straight into the slots (no per-frame
+    allocation). Readers either copy a frame out or pin a slot for a
+    read-only view; the writer skips pinned slots until they are released.
+    """
+    
+    def __init__(self, size, shape):
+        """
+        Args:
+            size: Number of frames kept
+            shape: Frame shape (height, width, 3)
+        """
+        self.size = size
+        self.frames = np.empty((size,) + tuple(shape), dtype=np.uint8)
+        self.times = np.full(size, np.nan)
+        self.seqs = np.full(size, -1, dtype=np.int64)
+        self.pins = np.zeros(size, dtype=np.int32)
+        self.latest = -1  # Slot of the newest frame
+        self.latest_time = None
+        self.written = 0
+        self.cond = threading.Condition()
+    
+    def begin_write(self):
+        """
+        Claim the oldest unpinned slot for the next frame
+        
+        Returns:
+            Slot index, or None if every slot is pinned (frame is dropped)
+        """
+        with self.cond:
+            for step in range(self.size):
+                index = (self.written + step) % self.size
+                if not self.pins[index]:
+                    self.seqs[index] = -1  # Hidden from readers while written
+                    self.written += step + 1
+                    return index
+            return None
+    
+    def commit(self, index, timestamp, seq):
+        """Publish a slot filled after begin_write()"""
+        with self.cond:
+            self.times[index] = timestamp
+            self.seqs[index] = seq
+            self.latest = index
+            self.latest_time = timestamp
+            self.cond.notify_all()
+    
+    def put(self, frame, timestamp, seq):
+        """Copy a frame into the oldest unpinned slot"""
+        index = self.begin_write()
+        if index is not None:
+            np.copyto(self.frames[index], frame)
+            self.commit(index, timestamp, seq)
+    
+    def latest_seq(self):
+        """Sequence number of the newest frame (-1 if empty)"""
+        with self.cond:
+            return int(self.seqs[self.latest]) if self.latest >= 0 else -1
+    
+    def wait_for(self, seq, timeout):
+        """Wait until a frame with at least this sequence number is in the ring"""
+        with self.cond:
+            self.cond.wait_for(lambda: self.latest >= 0 and self.seqs[self.latest] >= seq, timeout)
+    
+    def pin_latest(self):
+        """
+        Pin the newest slot (see view())
+        
+        Returns:
+            Slot index or None if empty
+        """
+        with self.cond:
+            if self.latest < 0 or self.seqs[self.latest] < 0:
+                return None
+            self.pins[self.latest] += 1
+            return self.latest
+    
+    def unpin(self, index):
+        """Release a slot pinned by pin_latest()"""
+        with self.cond:
+            self.pins[index] -= 1
+    
+    def view(self, index):
+        """Read-only view on a pinned slot (valid until unpin)"""
+        frame = self.frames[index].view()
+        frame.flags.writeable = False
+        return frame
+    
+    def nearest(self, target, timeout=0.0, after_seq=-1, convert=np.copy):
+        """
+        Get the frame captured closest to a time
+        
+        Waits (up to timeout) for a frame at or after target first, since
+        a frame still to come may be closer than the newest one.
+        
+        Args:
+            target: time.monotonic() timestamp
+            timeout: Max seconds to wait for a later frame
+            after_seq: Only consider frames newer than this sequence number
+            convert: Makes the returned frame from the slot (must copy),
+                e.g. crop + resize without an intermediate full-frame copy
+            
+        Returns:
+            Tuple (converted frame, capture time, sequence number) or None
+        """
+        deadline = time.monotonic() + timeout
+        with self.cond:
+            while self.latest_time is None or self.latest_time < target or self.seqs.max() <= after_seq:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.cond.wait(remaining)
+            
+            candidates = self.seqs > after_seq
+            if not candidates.any():
+                return None
+            index = int(np.argmin(np.where(candidates, np.abs(self.times - target), np.inf)))
+            return convert(self.frames[index]), float(self.times[index]), int(self.seqs[index])
+    
+    def between(self, start, end, convert=np.copy):
+        """
+        Get every frame captured in a time window (oldest first)
+        
+        Args:
+            start: time.monotonic() timestamp
+            end: time.monotonic() timestamp
+            convert: Makes each returned frame from its slot (see nearest)
+            
+        Returns:
+            List of (converted frame, capture time, sequence number)
+        """
+        with self.cond:
+            indices = np.flatnonzero((self.seqs >= 0) & (self.times >= start) & (self.times <= end))
+            indices = indices[np.argsort(self.seqs[indices])]
+            return [(convert(self.frames[i]), float(self.times[i]), int(self.seqs[i])) for i in indices]
+    
+    def oldest_time(self):
+        """Capture time of the oldest frame kept (None if empty)"""
+        with self.cond:
+            valid = self.seqs >= 0
+            return float(self.times[valid].min()) if valid.any() else None
 
 
 class Camera:
@@ -40,14 +277,31 @@ class Camera:
         self.auto_exposure = auto_exposure
         
         self.cap = None
-        self.frame = None
         self.running = False
         self.thread = None
         self.lock = threading.Lock()
         
         self.frame_count = 0
+        self.frame_seq = 0  # Sequence number of the newest decoded frame (never reset)
+        self.grab_seq = 0  # Frames grabbed from the driver (decoded or not)
         self.last_fps_time = time.time()
         self.current_fps = 0
+        
+        # Frame buffers, created on the first frame: the last FRAME_RING_SIZE
+        # frames for trigger-aligned capture, at least 3 (triple buffering)
+        self.ring = None
+        self.ring_size = getattr(config, 'FRAME_RING_SIZE', 16)
+        self.trigger_offset = getattr(config, 'TRIGGER_FRAME_OFFSET_MS', 0) / 1000.0
+        
+        # Without a ring only frames someone asked for are decoded
+        self.decode_all = self.ring_size > 0
+        self.decode_requested = threading.Event()
+        
+        # Frame buffer allocations (see get_capture_stats)
+        self.stats = {'grabbed': 0, 'decoded': 0, 'reallocated': 0, 'dropped': 0, 'copies': 0}
+        
+        # ROI crop, recomputed for the actual frame size in start()
+        self.geometry = RoiGeometry.from_config(config, width, height, width, height)
     
     def start(self):
         """
@@ -95,7 +349,10 @@ class Camera:
                 print("[ERROR] Failed to read first frame")
                 return False
             
-            self.frame = frame
+            self.geometry = RoiGeometry.from_config(config, frame.shape[1], frame.shape[0],
+                                                    self.width, self.height)
+            self.ring = FrameRing(max(self.ring_size, 3), frame.shape)
+            self.ring.put(frame, time.monotonic(), self.frame_seq)
             
             # Start capture thread
             self.running = True
@@ -123,80 +380,301 @@ class Camera:
         print("[Camera] Camera stopped")
     
     def _capture_loop(self):
-        """Main capture loop (runs in separate thread)"""
+        """
+        Main capture loop (runs in separate thread)
+        
+        grab() takes every frame off the driver and timestamps it; retrieve()
+        decodes it in place into a ring slot. Without a ring (FRAME_RING_SIZE
+        = 0) only frames a reader asked for are decoded.
+        """
         print("[Camera] Capture thread started")
         
         while self.running:
             try:
-                ret, frame = self.cap.read()
-                
-                if ret:
-                    with self.lock:
-                        self.frame = frame
-                        self.frame_count += 1
-                    
-                    # Calculate FPS
-                    current_time = time.time()
-                    if current_time - self.last_fps_time >= 1.0:
-                        self.current_fps = self.frame_count / (current_time - self.last_fps_time)
-                        self.frame_count = 0
-                        self.last_fps_time = current_time
-                else:
-                    print("[WARNING] Failed to read frame")
+                if not self.cap.grab():
+                    log.warning("Failed to read frame")
                     time.sleep(0.1)
+                    continue
+                
+                capture_time = time.monotonic()
+                with self.lock:
+                    self.grab_seq += 1
+                    self.frame_count += 1
+                    seq = self.grab_seq
+                self.stats['grabbed'] += 1
+                
+                if self.decode_all or self.decode_requested.is_set():
+                    self.decode_requested.clear()
+                    self._retrieve(capture_time, seq)
+                
+                # Calculate FPS
+                current_time = time.time()
+                if current_time - self.last_fps_time >= 1.0:
+                    self.current_fps = self.frame_count / (current_time - self.last_fps_time)
+                    self.frame_count = 0
+                    self.last_fps_time = current_time
                 
             except Exception as e:
-                print(f"[ERROR] Capture loop error: {e}")
+                log.error("Capture loop error: %s", e)
                 time.sleep(0.1)
         
         print("[Camera] Capture thread stopped")
     
-    def read_frame(self):
+    def _retrieve(self, capture_time, seq):
+        """Decode the grabbed frame into a free ring slot"""
+        index = self.ring.begin_write()
+        if index is None:
+            self.stats['dropped'] += 1
+            return
+        
+        slot = self.ring.frames[index]
+        ret, frame = self.cap.retrieve(slot)
+        if not ret:
+            log.warning("Failed to decode frame")
+            return
+        
+        # The driver returned a frame of another size/type: copy it in
+        if frame is not slot and not np.shares_memory(frame, slot):
+            self.stats['reallocated'] += 1
+            np.copyto(slot, frame)
+        
+        self.ring.commit(index, capture_time, seq)
+        self.stats['decoded'] += 1
+        with self.lock:
+            self.frame_seq = seq
+    
+    @contextmanager
+    def frame_view(self):
+        """
+        Borrow the latest frame without copying it
+        
+        The frame is a read-only view on a ring slot, already cropped to
+        the ROI (not resized). The slot is not overwritten until the block
+        exits, so keep the block short and copy anything kept longer:
+        
+            with camera.frame_view() as frame:
+                if frame is not None:
+                    cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=buffer)
+        
+        Yields:
+            numpy.ndarray (read-only) or None
+        """
+        index = self._pin_latest()
+        try:
+            yield self._roi_view(self.ring.view(index)) if index is not None else None
+        finally:
+            if index is not None:
+                self.ring.unpin(index)
+    
+    def _pin_latest(self):
+        """Pin the newest frame, decoding one first if frames were skipped"""
+        if self.ring is None:
+            return None
+        if not self.decode_all:
+            self.decode_requested.set()
+            with self.lock:
+                stale = self.frame_seq < self.grab_seq
+                wanted = self.grab_seq + 1
+            if stale:
+                self.ring.wait_for(wanted, 2.0 / max(self.fps, 1))
+        return self.ring.pin_latest()
+    
+    def get_capture_stats(self):
+        """
+        Get frame buffer statistics
+        
+        Returns:
+            dict with frames grabbed / decoded, decodes that needed a new
+            buffer, frames dropped (all slots pinned) and frame copies
+            handed out
+        """
+        return dict(self.stats)
+    
+    def read_frame(self, raw=False):
         """
         Get latest frame (thread-safe)
         
+        Args:
+            raw: Return the ROI crop at camera resolution instead of the
+                display-size frame (see _convert)
+        
         Returns:
             numpy.ndarray: BGR frame or None
         """
-        with self.lock:
-            if self.frame is None:
+        with self.frame_view() as view:
+            if view is None:
                 return None
-            frame = self.frame.copy()
-
-        # Apply ROI crop (left/right/top/bottom) then resize back to original size.
-        # This reduces visible area without changing output resolution.
-        try:
-            if getattr(config, "ENABLE_ROI_CROP", False):
-                left = int(getattr(config, "ROI_CROP_LEFT_PX", 0) or 0)
-                right = int(getattr(config, "ROI_CROP_RIGHT_PX", 0) or 0)
-                top = int(getattr(config, "ROI_CROP_TOP_PX", 0) or 0)
-                bottom = int(getattr(config, "ROI_CROP_BOTTOM_PX", 0) or 0)
-
-                left = max(0, left)
-                right = max(0, right)
-                top = max(0, top)
-                bottom = max(0, bottom)
-
-                h, w = frame.shape[:2]
-                # Ensure we keep at least 1x1 pixels
-                if (left + right) < (w - 1) and (top + bottom) < (h - 1):
-                    cropped = frame[top:h - bottom, left:w - right]
-                    if cropped is not None and cropped.shape[0] > 0 and cropped.shape[1] > 0:
-                        frame = cv2.resize(cropped, (self.width, self.height))
-        except Exception:
-            # Never let ROI/crop break the main loop
-            pass
-
+            frame = self.geometry.to_display(view) if not raw else view.copy()
+        
+        self.stats['copies'] += 1
         return frame
     
-    def capture_snapshot(self):
+    def _roi_view(self, frame):
+        """ROI crop as a view (no resize), the whole frame if cropping is off"""
+        return self.geometry.crop(frame)
+    
+    def _apply_roi_crop(self, frame):
+        """Crop the configured ROI and resize it to the display size (new array)"""
+        return self.geometry.to_display(self.geometry.crop(frame))
+    
+    def _convert(self, raw):
+        """
+        Ring slot -> owned frame, in a single copy or resample
+        
+        Raw frames are the ROI crop at camera resolution: the inspection
+        path hands them to the AI, which resamples them once into the model
+        input, and maps detections back with display=camera.geometry.
+        """
+        if raw:
+            return lambda frame: self.geometry.crop(frame).copy()
+        return self._apply_roi_crop
+    
+    def read_new_frame(self, last_seq=None):
+        """
+        Get the latest frame only if it is newer than last_seq
+        
+        Polling loops (live display, continuous inference) run faster than
+        the camera; this skips the copy and ROI resize of a frame that was
+        already returned.
+        
+        Args:
+            last_seq: Sequence number returned by the previous call
+            
+        Returns:
+            Tuple (frame or None, frame sequence number)
+        """
+        with self.lock:
+            seq = self.frame_seq
+        if seq == last_seq:
+            self.decode_requested.set()
+            return None, seq
+        return self.read_frame(), seq
+    
+    def frame_at(self, trigger_time, after_seq=-1, raw=False):
         """
-        Capture a snapshot (same as read_frame for continuous mode)
+        Get the frame captured closest to a trigger (+ TRIGGER_FRAME_OFFSET_MS)
+        
+        Args:
+            trigger_time: time.monotonic() timestamp of the trigger
+            after_seq: Only consider frames newer than this sequence number
+            raw: Return the ROI crop at camera resolution (see read_frame)
+            
+        Returns:
+            Tuple (BGR frame or None, capture time, sequence number)
+        """
+        if self.ring is None or not self.decode_all:
+            with self.lock:
+                seq = self.frame_seq
+            return self.read_frame(raw), None, seq
+        
+        target = trigger_time + self.trigger_offset
+        oldest = self.ring.oldest_time()
+        if oldest is not None and target < oldest:
+            log.warning("Trigger is %.0fms older than the frame ring, increase FRAME_RING_SIZE",
+                        (oldest - target) * 1000)
+        
+        # Wait at most two frame periods past the target for a closer frame
+        timeout = max(0.0, target - time.monotonic()) + 2.0 / max(self.fps, 1)
+        found = self.ring.nearest(target, timeout, after_seq, convert=self._convert(raw))
+        if found is None:
+            return None, None, after_seq
+        
+        frame, capture_time, seq = found
+        log.debug("Frame %d is %+.1fms from the trigger", seq, (capture_time - target) * 1000)
+        return frame, capture_time, seq
+    
+    def frames_between(self, start, end, raw=False):
+        """
+        Get every buffered frame captured in a time window
+        
+        Args:
+            start: time.monotonic() timestamp
+            end: time.monotonic() timestamp
+            raw: Return ROI crops at camera resolution (see read_frame)
+            
+        Returns:
+            List of (BGR frame, capture time, sequence number), oldest first
+        """
+        if self.ring is None or not self.decode_all:
+            return []
+        return self.ring.between(start, end, convert=self._convert(raw))
+    
+    def capture_snapshot(self, trigger_time=None, raw=False):
+        """
+        Capture a snapshot
+        
+        Args:
+            trigger_time: time.monotonic() timestamp of the trigger; None =
+                latest frame (same as read_frame for continuous mode)
+            raw: Return the ROI crop at camera resolution (see read_frame)
         
         Returns:
             numpy.ndarray: BGR frame or None
         """
-        return self.read_frame()
+        if trigger_time is None:
+            return self.read_frame(raw)
+        return self.frame_at(trigger_time, raw=raw)[0]
+    
+    def capture_frames(self, count, delay, keep_going=None, timeout=1.0, trigger_time=None, raw=False):
+        """
+        Capture several distinct frames (multi-frame voting)
+        
+        Args:
+            count: Number of frames wanted
+            delay: Minimum time between frames (seconds)
+            keep_going: Optional callback(num_captured) -> bool, asked before
+                each additional frame (latency budget guard)
+            timeout: Give up waiting for a new frame after this (seconds)
+            trigger_time: time.monotonic() timestamp of the trigger; frames
+                are then taken from the ring at trigger, trigger + delay, ...
+            raw: Return ROI crops at camera resolution (see read_frame)
+            
+        Returns:
+            List of BGR frames (at least one unless the camera has none)
+        """
+        if trigger_time is not None and self.ring is not None and self.decode_all:
+            return self._capture_frames_at(count, delay, keep_going, trigger_time, raw)
+        
+        frames = []
+        last_seq = None
+        next_time = time.time()
+        
+        while len(frames) < count:
+            if frames and keep_going and not keep_going(len(frames)):
+                break
+            
+            # Wait for the delay and for a frame we have not used yet
+            wait_start = time.time()
+            self.decode_requested.set()
+            while time.time() < next_time or self.frame_seq == last_seq:
+                if time.time() - wait_start > timeout:
+                    return frames
+                time.sleep(0.002)
+            
+            with self.lock:
+                last_seq = self.frame_seq
+            frame = self.read_frame(raw)
+            if frame is None:
+                break
+            frames.append(frame)
+            next_time = time.time() + delay
+        
+        return frames
+    
+    def _capture_frames_at(self, count, delay, keep_going, trigger_time, raw):
+        """Distinct ring frames closest to trigger_time + i * delay"""
+        frames = []
+        last_seq = -1
+        
+        for i in range(count):
+            if frames and keep_going and not keep_going(len(frames)):
+                break
+            frame, _, last_seq = self.frame_at(trigger_time + i * delay, last_seq, raw)
+            if frame is None:
+                break
+            frames.append(frame)
+        
+        return frames
     
     def save_image(self, image, directory, prefix="capture"):
         """
@@ -248,6 +726,7 @@ class DummyCamera:
         self.height = height
         self.running = False
         self.frame_count = 0
+        self.geometry = RoiGeometry(0, 0, width, height, width, height)  # No crop
     
     def start(self):
         """Start dummy camera"""
@@ -260,7 +739,7 @@ class DummyCamera:
         self.running = False
         print("[Camera] DUMMY camera stopped")
     
-    def read_frame(self):
+    def read_frame(self, raw=False):
         """Generate dummy frame"""
         if not self.running:
             return None
@@ -281,10 +760,47 @@ class DummyCamera:
         
         return frame
     
-    def capture_snapshot(self):
+    @contextmanager
+    def frame_view(self):
+        """Generate a dummy frame (see Camera.frame_view)"""
+        yield self.read_frame()
+    
+    def get_capture_stats(self):
+        """Dummy camera has no frame buffers"""
+        return {}
+    
+    def read_new_frame(self, last_seq=None):
+        """Generate a new dummy frame (every call is a new frame)"""
+        frame = self.read_frame()
+        return frame, self.frame_count
+    
+    def frame_at(self, trigger_time, after_seq=-1, raw=False):
+        """Generate a dummy frame (see Camera.frame_at)"""
+        frame = self.read_frame()
+        return frame, time.monotonic(), self.frame_count
+    
+    def frames_between(self, start, end, raw=False):
+        """Dummy camera keeps no frames"""
+        return []
+    
+    def capture_snapshot(self, trigger_time=None, raw=False):
         """Capture dummy snapshot"""
         return self.read_frame()
     
+    def capture_frames(self, count, delay, keep_going=None, timeout=1.0, trigger_time=None, raw=False):
+        """Capture several dummy frames (see Camera.capture_frames)"""
+        frames = []
+        while len(frames) < count:
+            if frames:
+                if keep_going and not keep_going(len(frames)):
+                    break
+                time.sleep(delay)
+            frame = self.read_frame()
+            if frame is None:
+                break
+            frames.append(frame)
+        return frames
+    
     def save_image(self, image, directory, prefix="capture"):
         """Save dummy image"""
         import os
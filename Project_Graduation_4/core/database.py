@@ -8,6 +8,10 @@ import threading
 from datetime import datetime
 from pathlib import Path
 
+from core.log import get_logger
+
+log = get_logger("Database")
+
 
 class Database:
     """
@@ -113,12 +117,12 @@ class Database:
         ensure_column("statistics", "ok_count", "INTEGER DEFAULT 0")
         ensure_column("statistics", "ng_count", "INTEGER DEFAULT 0")
     
-    def add_inspection(self, result_dict):
+    def add_inspection(self, result):
         """
         Add inspection result to database
         
         Args:
-            result_dict: Dictionary with inspection results
+            result: InspectionResult (core.results) with
                 - result: 'OK' or 'NG'
                 - reason: Explanation string
                 - has_cap: Boolean
@@ -127,7 +131,7 @@ class Database:
                 - defects_found: List of defect names
                 - image_path: Path to saved image
                 - processing_time: Time in seconds
-                - detections: List of detections
+                - detections: Detections container
         """
         with self.lock:
             try:
@@ -136,15 +140,15 @@ class Database:
 
                     # Extract data
                     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
-                    result = result_dict.get('result', 'UNKNOWN')
-                    reason = result_dict.get('reason', '')
-                    has_cap = 1 if result_dict.get('has_cap', False) else 0
-                    has_filled = 1 if result_dict.get('has_filled', False) else 0
-                    has_label = 1 if result_dict.get('has_label', False) else 0
-                    defects = ', '.join(result_dict.get('defects_found', []))
-                    image_path = result_dict.get('image_path', '')
-                    processing_time = result_dict.get('processing_time', 0.0)
-                    num_detections = len(result_dict.get('detections', []))
+                    decision = result.result
+                    reason = result.reason
+                    has_cap = 1 if result.has_cap else 0
+                    has_filled = 1 if result.has_filled else 0
+                    has_label = 1 if result.has_label else 0
+                    defects = ', '.join(result.defects_found)
+                    image_path = result.image_path
+                    processing_time = result.processing_time
+                    num_detections = len(result.detections)
 
                     # Insert inspection
                     cursor.execute('''
@@ -152,7 +156,7 @@ class Database:
                         (timestamp, result, reason, has_cap, has_filled, has_label,
                          defects, image_path, processing_time, num_detections)
                         VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (timestamp, result, reason, has_cap, has_filled, has_label,
+                    ''', (timestamp, decision, reason, has_cap, has_filled, has_label,
                           defects, image_path, processing_time, num_detections))
 
                     # Update statistics
@@ -162,7 +166,7 @@ class Database:
                     row = cursor.fetchone()
 
                     if row:
-                        if result == 'OK':
+                        if decision == 'OK':
                             cursor.execute('''
                                 UPDATE statistics 
                                 SET total_count = total_count + 1,
@@ -177,7 +181,7 @@ class Database:
                                 WHERE date = ?
                             ''', (date,))
                     else:
-                        if result == 'OK':
+                        if decision == 'OK':
                             cursor.execute('''
                                 INSERT INTO statistics (date, total_count, ok_count, ng_count)
                                 VALUES (?, 1, 1, 0)
@@ -188,7 +192,7 @@ class Database:
                                 VALUES (?, 1, 0, 1)
                             ''', (date,))
             except Exception as e:
-                print(f"[ERROR] Failed to add inspection to database: {e}")
+                log.error("Failed to add inspection to database: %s", e)
     
     def get_recent_inspections(self, limit=100):
         """
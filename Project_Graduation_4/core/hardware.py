@@ -6,6 +6,48 @@ Fast serial communication with Arduino for real-time control
 import serial
 import time
 import threading
+from collections import deque
+
+from core.log import get_logger
+
+log = get_logger("Hardware")
+arduino_log = get_logger("Arduino")
+
+
+class TriggerClock:
+    """
+    Maps Arduino millis() timestamps to time.monotonic()
+    
+    The clock offset is the smallest (receive time - millis) seen over the
+    last triggers: serial transfer and polling only ever add delay, so the
+    lower envelope gives the time the sensor fired without that jitter.
+    """
+    
+    def __init__(self, window=64, reset_threshold=1.0):
+        """
+        Args:
+            window: Number of recent triggers the offset is taken from
+                (short enough to follow the drift of the Arduino crystal)
+            reset_threshold: Offset jump (seconds) treated as an Arduino
+                reset or millis() rollover
+        """
+        self.offsets = deque(maxlen=window)
+        self.reset_threshold = reset_threshold
+    
+    def to_host(self, millis, received):
+        """
+        Args:
+            millis: Arduino millis() when the sensor fired
+            received: time.monotonic() when the line was read
+            
+        Returns:
+            float: time.monotonic() when the sensor fired
+        """
+        offset = received - millis / 1000.0
+        if self.offsets and abs(offset - min(self.offsets)) > self.reset_threshold:
+            self.offsets.clear()
+        self.offsets.append(offset)
+        return millis / 1000.0 + min(self.offsets)
 
 
 class HardwareController:
@@ -34,6 +76,7 @@ class HardwareController:
         self.detection_callback = None
         self.listener_thread = None
         self.listening = False
+        self.trigger_clock = TriggerClock()
         
         print(f"[Hardware] Initializing on {port} @ {baudrate} baud")
     
@@ -105,7 +148,7 @@ class HardwareController:
             return True
             
         except Exception as e:
-            print(f"[ERROR] Failed to send command '{command}': {e}")
+            log.error("Failed to send command '%s': %s", command, e)
             return False
     
     def send_ok(self):
@@ -131,7 +174,9 @@ class HardwareController:
         Start listening for detection signals from Arduino
         
         Args:
-            detection_callback: Function to call when 'D' is received
+            detection_callback: Function(timestamp, trigger_time) to call when
+                'D' is received; timestamp is the Arduino millis() (or None),
+                trigger_time the matching time.monotonic()
         """
         if self.listening:
             print("[WARNING] Already listening")
@@ -175,6 +220,7 @@ class HardwareController:
                 if self.serial.in_waiting > 0:
                     # Read available data
                     data = self.serial.read(self.serial.in_waiting).decode('utf-8', errors='ignore')
+                    received = time.monotonic()
                     buffer += data
                     
                     # Process complete lines
@@ -183,24 +229,28 @@ class HardwareController:
                         line = line.strip()
                         
                         if line:
-                            self._process_line(line)
+                            self._process_line(line, received)
                 else:
                     # No data available, small sleep to prevent CPU overload
                     time.sleep(0.01)
                     
             except Exception as e:
-                print(f"[ERROR] Listener error: {e}")
+                log.error("Listener error: %s", e)
                 time.sleep(0.1)
         
         print("[Hardware] Listener thread stopped")
     
-    def _process_line(self, line):
+    def _process_line(self, line, received=None):
         """
         Process a line received from Arduino
         
         Args:
             line: String line from serial
+            received: time.monotonic() when the line was read (default: now)
         """
+        if received is None:
+            received = time.monotonic()
+        
         # Check for detection signal
         if line.startswith('D'):
             # Detection signal received
@@ -209,18 +259,24 @@ class HardwareController:
                 parts = line.split(',')
                 timestamp = int(parts[1]) if len(parts) > 1 else None
                 
+                # When the sensor fired on our clock (frame selection)
+                if timestamp is not None:
+                    trigger_time = self.trigger_clock.to_host(timestamp, received)
+                else:
+                    trigger_time = received
+                
                 # Call callback
-                self.detection_callback(timestamp)
+                self.detection_callback(timestamp, trigger_time)
             else:
-                print("[WARNING] Detection received but no callback set")
+                log.warning("Detection received but no callback set")
         
         # Print other messages (debug, statistics, etc.)
         elif line.startswith('[') or line.startswith('-'):
             # Arduino debug/status messages
-            print(f"[Arduino] {line}")
+            arduino_log.debug("%s", line)
         elif "detected" in line.lower() or "decision" in line.lower():
             # Important messages
-            print(f"[Arduino] {line}")
+            arduino_log.info("%s", line)
     
     def is_connected(self):
         """Check if connected to Arduino"""
@@ -261,7 +317,7 @@ class DummyHardwareController:
     
     def send_command(self, command):
         """Simulate sending command"""
-        print(f"[Hardware] DUMMY send: {command}")
+        log.info("DUMMY send: %s", command)
         return True
     
     def send_ok(self):
@@ -311,7 +367,7 @@ class DummyHardwareController:
             
             if self.listening and self.detection_callback:
                 print("[Hardware] DUMMY detection simulated")
-                self.detection_callback(None)
+                self.detection_callback(None, time.monotonic())
         
         print("[Hardware] DUMMY simulator thread stopped")
     
@@ -0,0 +1,168 @@
+"""
+Inference Worker Pool for Coca-Cola Sorting System
+Independent NCNN nets per worker, fed through a job queue
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class InferencePool:
+    """
+    Pool of inference worker threads
+    Each worker owns its own ncnn.Net with a pinned thread count, so
+    concurrent bottles never share a net, extractor or blob pool
+    """
+
+    def __init__(self, ai, num_workers=2, num_threads=2):
+        """
+        Initialize inference pool
+
+        Args:
+            ai: AIEngine providing model loading and post-processing
+            num_workers: Number of worker threads (one ncnn.Net each)
+            num_threads: NCNN threads per worker
+        """
+        self.ai = ai
+        self.num_workers = num_workers
+        self.num_threads = num_threads
+
+        self.jobs = queue.Queue()
+        self.workers = []
+        self.running = False
+        self.lock = threading.Lock()
+
+        # Statistics
+        self.start_time = None
+        self.busy_time = [0.0] * num_workers
+        self.jobs_done = [0] * num_workers
+        self.total_wait = 0.0
+        self.max_queue_depth = 0
+
+    def start(self):
+        """
+        Load one net per worker and start the worker threads
+
+        Returns:
+            bool: True if all workers started
+        """
+        nets = []
+        for _ in range(self.num_workers):
+            net = self.ai._create_net(self.num_threads)
+            if net is None:
+                return False
+            nets.append(net)
+
+        self.running = True
+        self.start_time = time.time()
+
+        for index, net in enumerate(nets):
+            thread = threading.Thread(
+                target=self._worker_loop,
+                args=(index, net),
+                name=f"inference-{index}",
+                daemon=True
+            )
+            thread.start()
+            self.workers.append(thread)
+
+        print(f"[AI] Inference pool started: {self.num_workers} workers x "
+              f"{self.num_threads} threads")
+        return True
+
+    def stop(self):
+        """Stop all workers (pending jobs are still finished)"""
+        self.running = False
+
+        for _ in self.workers:
+            self.jobs.put(None)
+        for thread in self.workers:
+            thread.join(timeout=2.0)
+
+        self.workers = []
+        print("[AI] Inference pool stopped")
+
+    def submit(self, frame, on_decision=None, trace=None):
+        """
+        Queue a frame for inference
+
+        Args:
+            frame: BGR image
+            on_decision: Optional callback(decision), called on the worker
+                thread as soon as the OK/NG decision is known
+            trace: Optional LatencyTrace to mark the stages on
+
+        Returns:
+            concurrent.futures.Future resolving to an InspectionResult
+        """
+        future = Future()
+        self.jobs.put((frame, on_decision, trace, future, time.time()))
+
+        depth = self.jobs.qsize()
+        with self.lock:
+            if depth > self.max_queue_depth:
+                self.max_queue_depth = depth
+
+        return future
+
+    def predict(self, frame, timeout=None, on_decision=None, trace=None):
+        """
+        Run inference on a worker and wait for the result
+
+        Args:
+            frame: BGR image
+            timeout: Max seconds to wait (None = no limit)
+            on_decision: Optional callback(decision), see submit()
+            trace: Optional LatencyTrace, see submit()
+
+        Returns:
+            InspectionResult (same as AIEngine.predict)
+        """
+        return self.submit(frame, on_decision, trace).result(timeout)
+
+    def _worker_loop(self, index, net):
+        """Worker loop (runs in separate thread)"""
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                break
+
+            frame, on_decision, trace, future, submitted = job
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            start = time.time()
+            try:
+                result = self.ai._predict_frame(frame, net=net, on_decision=on_decision, trace=trace)
+                result.processing_time = time.time() - start
+                future.set_result(result)
+            except Exception as e:
+                future.set_exception(e)
+            finally:
+                with self.lock:
+                    self.busy_time[index] += time.time() - start
+                    self.jobs_done[index] += 1
+                    self.total_wait += start - submitted
+
+    def get_stats(self):
+        """
+        Get pool statistics
+
+        Returns:
+            dict with queue depth, job counts, average queue wait and
+            per-worker utilization (busy time / uptime)
+        """
+        with self.lock:
+            uptime = time.time() - self.start_time if self.start_time else 0.0
+            done = sum(self.jobs_done)
+            return {
+                'workers': self.num_workers,
+                'threads_per_worker': self.num_threads,
+                'queue_depth': self.jobs.qsize(),
+                'max_queue_depth': self.max_queue_depth,
+                'jobs_done': done,
+                'avg_wait_ms': self.total_wait * 1000 / done if done else 0.0,
+                'utilization': [busy / uptime if uptime > 0 else 0.0 for busy in self.busy_time]
+            }
@@ -0,0 +1,415 @@
+"""
+Inference Server for Coca-Cola Sorting System
+Runs the model in a child process, fed through a shared-memory frame ring
+"""
+
+import itertools
+import multiprocessing as mp
+import pickle
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from core.latency import LatencyTrace
+from core.log import get_logger
+from core.results import InspectionResult
+
+log = get_logger("AI")
+
+
+def config_snapshot(cfg):
+    """
+    Upper-case settings of a config object that can be sent to the child
+
+    Args:
+        cfg: Configuration module or object of the parent AIEngine
+
+    Returns:
+        dict {name: value} (unpicklable values are left out)
+    """
+    settings = {}
+    for name in dir(cfg):
+        if not name.isupper():
+            continue
+        value = getattr(cfg, name)
+        try:
+            pickle.dumps(value)
+        except Exception:
+            continue
+        settings[name] = value
+    return settings
+
+
+def _server_main(model_path, precision, settings, shm_name, slot_bytes, requests, responses):
+    """
+    Child process: load the model, then answer jobs until None arrives
+
+    The child imports config.py from disk, then applies the parent's
+    settings (config_snapshot) so thresholds, classes, backend and rules
+    match the engine that rebuilds the results.
+
+    Frames are read in place from the shared-memory slot named in the job;
+    only small messages travel through the queues. A ('ring', name,
+    slot_bytes) message switches to a reallocated ring.
+    """
+    import config
+    from core.ai import AIEngine
+
+    for name, value in settings.items():
+        setattr(config, name, value)
+
+    # The child is a plain single-net engine; ROI and gating stay in the parent
+    config.INFERENCE_PROCESS = False
+    config.INFERENCE_WORKERS = 1
+    config.BOTTLE_LOCATOR = False
+    config.MOTION_GATE = False
+    config.MODEL_WATCH_INTERVAL = 0
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        ai = AIEngine(model_path=model_path, config=config, precision=precision)
+        responses.put(('ready', None, {'model_loaded': ai.model_loaded,
+                                       'time_to_ready': ai.time_to_ready}))
+
+        while True:
+            job = requests.get()
+            if job is None:
+                break
+            if job[0] == 'ring':
+                # The parent grew the ring for larger frames
+                _, shm_name, slot_bytes = job
+                shm.close()
+                shm = shared_memory.SharedMemory(name=shm_name)
+                continue
+
+            job_id, slot, shape, roi, traced, sku = job
+            if sku != ai.sku:
+                ai.set_sku(sku)
+            frame = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf, offset=slot * slot_bytes)
+            trace = LatencyTrace() if traced else None
+            result = None
+
+            def on_decision(decision, job_id=job_id):
+                responses.put(('decision', job_id, decision))
+
+            start = time.time()
+            try:
+                result = ai._predict_frame(frame, on_decision=on_decision, trace=trace, roi=roi)
+                result.processing_time = time.time() - start
+                responses.put(('result', job_id, (result.to_message(), trace.marks if trace else None)))
+            except Exception as e:
+                responses.put(('error', job_id, f"{type(e).__name__}: {e}"))
+            finally:
+                frame = result = None  # Release the shared buffer before the slot is reused
+
+        ai.shutdown()
+    finally:
+        shm.close()
+
+
+class InferenceServer:
+    """
+    Supervised inference child process
+
+    The parent copies each frame into a free slot of a shared-memory ring
+    and queues (job id, slot, shape, ...). The child answers with the early
+    decision and a compact result (detection arrays, no images); the parent
+    rebuilds the InspectionResult around its own frame. If the child dies
+    or hangs, pending jobs fail and a new child is started.
+
+    The child runs with the parent's config as it was when the server was
+    created (see config_snapshot); changes made after that are not seen.
+    """
+
+    def __init__(self, ai, frame_shape, num_slots=4, timeout=2.0, restart_delay=1.0):
+        """
+        Initialize server (call start() to launch the child)
+
+        Args:
+            ai: Parent AIEngine (model path, precision, class names, locator)
+            frame_shape: Expected frame (height, width, 3); the ring grows
+                if larger frames arrive (see _grow_ring)
+            num_slots: Frames that can be in flight at once
+            timeout: Seconds a job may take before the child counts as hung
+            restart_delay: Seconds between a crash and the restart
+        """
+        self.ai = ai
+        self.slot_bytes = int(np.prod(frame_shape))
+
+        # Settings as the parent sees them now (later config changes need a new server)
+        self.settings = config_snapshot(ai.config)
+        if ai.backend:
+            self.settings['INFERENCE_BACKEND'] = ai.backend.name
+        self.num_slots = num_slots
+        self.timeout = timeout
+        self.restart_delay = restart_delay
+
+        self.ctx = mp.get_context('spawn')
+        self.shm = None
+        self.process = None
+        self.requests = None
+        self.responses = None
+
+        self.free_slots = queue.Queue()
+        self.pending = {}  # job id -> [future, slot, on_decision, trace, submitted, frame]
+        self.job_ids = itertools.count()
+        self.lock = threading.Lock()
+        self.ring_lock = threading.Lock()
+
+        self.running = False
+        self.ready_event = threading.Event()
+        self.model_loaded = False
+        self.generation = 0
+        self.supervisor_thread = None
+
+        # Statistics
+        self.restarts = 0
+        self.jobs_done = 0
+
+    def start(self, timeout=None):
+        """
+        Create the frame ring and launch the child
+
+        Args:
+            timeout: Max seconds to wait for the model to load (None = no limit)
+
+        Returns:
+            bool: True if the child is ready and its model loaded
+        """
+        self.shm = shared_memory.SharedMemory(create=True, size=self.slot_bytes * self.num_slots)
+        for slot in range(self.num_slots):
+            self.free_slots.put(slot)
+
+        self.running = True
+        self._launch()
+        self.supervisor_thread = threading.Thread(target=self._supervise, name="inference-supervisor",
+                                                  daemon=True)
+        self.supervisor_thread.start()
+
+        self.ready_event.wait(timeout)
+        if self.model_loaded:
+            log.info("Inference process started (pid %d, %d frame slots)",
+                     self.process.pid, self.num_slots)
+        return self.model_loaded
+
+    def stop(self):
+        """Stop the child and free the frame ring"""
+        self.running = False
+        process = self.process
+        if process is not None and process.is_alive():
+            self.requests.put(None)
+            process.join(timeout=2.0)
+            if process.is_alive():
+                process.terminate()
+        self._fail_pending("Inference process stopped")
+
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+        log.info("Inference process stopped")
+
+    def submit(self, frame, on_decision=None, trace=None):
+        """
+        Queue a frame for the child
+
+        Args:
+            frame: BGR uint8 image (copied into the ring)
+            on_decision: Optional callback(decision), called on the receiver
+                thread as soon as the child knows OK/NG
+            trace: Optional LatencyTrace; the child's stage marks are added
+
+        Returns:
+            concurrent.futures.Future resolving to an InspectionResult
+        """
+        if not self.ready_event.is_set():
+            raise RuntimeError("Inference process not ready")
+        if frame.dtype != np.uint8:
+            raise ValueError(f"Frame {frame.shape} {frame.dtype} is not a uint8 image")
+        if frame.nbytes > self.slot_bytes:
+            self._grow_ring(frame.nbytes)
+
+        slot = self.free_slots.get(timeout=self.timeout)
+        view = np.ndarray(frame.shape, dtype=np.uint8, buffer=self.shm.buf,
+                          offset=slot * self.slot_bytes)
+        np.copyto(view, frame)
+        del view
+
+        roi = self.ai.locator.locate(frame) if self.ai.locator else None
+
+        future = Future()
+        job_id = next(self.job_ids)
+        with self.lock:
+            self.pending[job_id] = [future, slot, on_decision, trace, time.time(), frame]
+            requests = self.requests
+        requests.put((job_id, slot, frame.shape, roi, trace is not None, self.ai.sku))
+        return future
+
+    def _grow_ring(self, slot_bytes):
+        """
+        Reallocate the frame ring for larger frames
+
+        Cameras may ignore the requested resolution, so the ring sized from
+        CAMERA_WIDTH x CAMERA_HEIGHT can be too small. Waits until no frame
+        is in flight, then moves the child to the new ring (the model is not
+        reloaded).
+
+        Args:
+            slot_bytes: Size of the frame that did not fit
+        """
+        with self.ring_lock:
+            if slot_bytes <= self.slot_bytes:
+                return  # Grown by another thread meanwhile
+
+            slots = []
+            try:
+                for _ in range(self.num_slots):
+                    slots.append(self.free_slots.get(timeout=self.timeout * 2))
+
+                old = self.shm
+                self.shm = shared_memory.SharedMemory(create=True, size=slot_bytes * self.num_slots)
+                self.slot_bytes = slot_bytes
+                with self.lock:
+                    requests = self.requests
+                requests.put(('ring', self.shm.name, slot_bytes))
+                old.close()
+                old.unlink()
+                log.warning("Frame ring grown to %d bytes per slot (camera frames larger than configured)",
+                            slot_bytes)
+            finally:
+                for slot in slots:
+                    self.free_slots.put(slot)
+
+    def predict(self, frame, on_decision=None, trace=None):
+        """
+        Run inference in the child and wait for the result
+
+        Args:
+            frame: BGR uint8 image
+            on_decision: Optional callback(decision), see submit()
+            trace: Optional LatencyTrace, see submit()
+
+        Returns:
+            InspectionResult (frame refers to the caller's array)
+        """
+        return self.submit(frame, on_decision, trace).result(self.timeout * 2)
+
+    def get_stats(self):
+        """
+        Get server statistics
+
+        Returns:
+            dict with pid, ready flag, restarts, jobs done and in flight
+        """
+        with self.lock:
+            return {
+                'pid': self.process.pid if self.process else None,
+                'ready': self.ready_event.is_set(),
+                'restarts': self.restarts,
+                'jobs_done': self.jobs_done,
+                'in_flight': len(self.pending)
+            }
+
+    def _launch(self):
+        """Start a child with fresh queues (a dead child may leave a queue locked)"""
+        self.ready_event.clear()
+        self.requests = self.ctx.Queue()
+        self.responses = self.ctx.Queue()
+        self.generation += 1
+
+        self.process = self.ctx.Process(
+            target=_server_main,
+            args=(self.ai.model_path, self.ai.precision, self.settings, self.shm.name, self.slot_bytes,
+                  self.requests, self.responses),
+            name="inference-server",
+            daemon=True
+        )
+        self.process.start()
+        threading.Thread(target=self._receive_loop, args=(self.responses, self.generation),
+                         name="inference-receiver", daemon=True).start()
+
+    def _receive_loop(self, responses, generation):
+        """Dispatch child messages (one thread per child generation)"""
+        while self.running and generation == self.generation:
+            try:
+                kind, job_id, payload = responses.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                break
+
+            if kind == 'ready':
+                self.model_loaded = payload['model_loaded']
+                self.ready_event.set()
+                continue
+
+            with self.lock:
+                job = self.pending.get(job_id) if kind == 'decision' else self.pending.pop(job_id, None)
+                if job and kind != 'decision':
+                    self.jobs_done += 1
+            if job is None:
+                continue
+
+            future, slot, on_decision, trace, submitted, frame = job
+            if kind == 'decision':
+                if on_decision:
+                    on_decision(payload)
+                continue
+
+            self.free_slots.put(slot)
+            if kind == 'error':
+                future.set_exception(RuntimeError(payload))
+                continue
+
+            # The decision message (early or final) always comes first
+            message, marks = payload
+            if trace and marks:
+                trace.marks.extend(marks)
+            result = InspectionResult.from_message(message, self.ai.class_names, frame)
+            self.ai._update_frame_time(time.time() - submitted)
+            future.set_result(result)
+
+    def _supervise(self):
+        """Restart the child when it dies or a job hangs"""
+        while self.running:
+            time.sleep(0.2)
+            process = self.process
+
+            with self.lock:
+                oldest = min((job[4] for job in self.pending.values()), default=None)
+            hung = oldest is not None and time.time() - oldest > self.timeout
+
+            if process.is_alive() and not hung:
+                continue
+            if not self.running:
+                break
+
+            if hung:
+                log.error("Inference process hung (job waiting %.1fs), restarting",
+                          time.time() - oldest)
+                process.terminate()
+                process.join(timeout=2.0)
+            else:
+                log.error("Inference process died (exit code %s), restarting", process.exitcode)
+
+            self.ready_event.clear()
+            self._fail_pending("Inference process restarted")
+            with self.lock:
+                self.restarts += 1
+            time.sleep(self.restart_delay)
+            if self.running:
+                self._launch()
+
+    def _fail_pending(self, reason):
+        """Fail every job in flight and give their slots back"""
+        with self.lock:
+            jobs = list(self.pending.values())
+            self.pending.clear()
+        for future, slot, *_ in jobs:
+            self.free_slots.put(slot)
+            if not future.done():
+                future.set_exception(RuntimeError(reason))
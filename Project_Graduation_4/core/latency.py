@@ -0,0 +1,159 @@
+"""
+Latency Tracker for Coca-Cola Sorting System
+Per-stage timing of every bottle in fixed-size ring buffers
+"""
+
+import threading
+import time
+
+import numpy as np
+
+
+class LatencyTrace:
+    """
+    Timestamps of one bottle
+
+    Created when the trigger arrives; every mark() records the end of a
+    stage. Marks may come from several threads (inference workers, the
+    decision sender), list.append keeps them in time order.
+    """
+
+    __slots__ = ('start', 'marks')
+
+    def __init__(self, start=None):
+        self.start = time.perf_counter() if start is None else start
+        self.marks = []
+
+    def mark(self, stage):
+        """
+        Record the end of a stage
+
+        Args:
+            stage: Stage name (see LatencyTracker.STAGES)
+        """
+        self.marks.append((stage, time.perf_counter()))
+
+
+class LatencyTracker:
+    """
+    Ring buffers of per-stage durations with live percentiles
+
+    A stage's duration is the time since the previous mark (or the
+    trigger). Stages marked more than once per bottle (one per frame when
+    voting) are summed. Two end-to-end values are kept as well: 'decision'
+    (trigger -> decision sent) and 'total' (trigger -> last mark).
+    """
+
+    # Pipeline order, trigger_received is the trace start
+    STAGES = (
+        'frame_selected', 'preprocess', 'inference', 'decode', 'nms',
+        'decision_sent', 'annotated', 'saved', 'persisted',
+    )
+    TOTALS = ('decision', 'total')
+
+    def __init__(self, config=None):
+        """
+        Initialize tracker
+
+        Args:
+            config: Configuration module (optional)
+        """
+        self.enabled = getattr(config, 'LATENCY_TRACKING', True)
+        self.window = max(1, int(getattr(config, 'LATENCY_WINDOW', 1000)))
+
+        # One preallocated buffer per stage (milliseconds)
+        self.buffers = {name: np.zeros(self.window) for name in self.STAGES + self.TOTALS}
+        self.counts = dict.fromkeys(self.buffers, 0)
+        self.lock = threading.Lock()
+
+    def begin(self, start=None):
+        """
+        Start a trace at the trigger
+
+        Args:
+            start: time.perf_counter() value of the trigger (default: now)
+
+        Returns:
+            LatencyTrace, or None when tracking is off (callers skip marks)
+        """
+        return LatencyTrace(start) if self.enabled else None
+
+    def commit(self, trace):
+        """
+        Store a finished trace in the ring buffers
+
+        Args:
+            trace: LatencyTrace from begin() (None is ignored)
+        """
+        if trace is None or not trace.marks:
+            return
+
+        durations = {}
+        previous = trace.start
+        for stage, timestamp in list(trace.marks):
+            durations[stage] = durations.get(stage, 0.0) + (timestamp - previous) * 1000.0
+            previous = timestamp
+            if stage == 'decision_sent' and 'decision' not in durations:
+                durations['decision'] = (timestamp - trace.start) * 1000.0
+        durations['total'] = (previous - trace.start) * 1000.0
+
+        with self.lock:
+            for name, value in durations.items():
+                buffer = self.buffers.get(name)
+                if buffer is None:
+                    continue
+                buffer[self.counts[name] % self.window] = value
+                self.counts[name] += 1
+
+    def percentiles(self, stage, quantiles=(50, 95, 99)):
+        """
+        Percentiles of one stage over the window
+
+        Args:
+            stage: Stage name, 'decision' or 'total'
+            quantiles: Percentiles to compute
+
+        Returns:
+            dict {'count', 'p50', 'p95', 'p99', ...} in milliseconds
+            (None when the stage has no samples yet)
+        """
+        with self.lock:
+            count = self.counts[stage]
+            values = self.buffers[stage][:min(count, self.window)].copy()
+        if count == 0:
+            return None
+
+        stats = {'count': count}
+        for q, value in zip(quantiles, np.percentile(values, quantiles)):
+            stats[f"p{q}"] = float(value)
+        return stats
+
+    def get_stats(self):
+        """
+        Percentiles of every stage that has samples
+
+        Returns:
+            dict {stage: percentiles(stage)} in pipeline order
+        """
+        stats = {}
+        for name in self.STAGES + self.TOTALS:
+            stage_stats = self.percentiles(name)
+            if stage_stats:
+                stats[name] = stage_stats
+        return stats
+
+    def format_stats(self):
+        """
+        Percentile table for the console
+
+        Returns:
+            List of lines (empty when nothing was recorded)
+        """
+        stats = self.get_stats()
+        if not stats:
+            return []
+
+        lines = [f"{'stage':16}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"]
+        for name, s in stats.items():
+            lines.append(f"{name:16}{s['count']:8d}{s['p50']:10.1f}{s['p95']:10.1f}{s['p99']:10.1f}")
+        return lines
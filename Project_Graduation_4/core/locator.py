@@ -0,0 +1,137 @@
+"""
+Bottle Locator for Coca-Cola Sorting System
+Cheap background-subtraction locator for two-stage (crop) inference
+"""
+
+import os
+import threading
+
+import cv2
+import numpy as np
+
+
+class BottleLocator:
+    """
+    Find the bottle band by comparing the frame with an empty-belt reference
+
+    Works on a small blurred copy of the frame (a few milliseconds at
+    most). The detector then only has to look at the returned box.
+    """
+
+    def __init__(self, config=None):
+        """
+        Initialize locator
+
+        Args:
+            config: Configuration module (optional)
+        """
+        self.scale = getattr(config, 'LOCATOR_SCALE', 0.25)
+        self.diff_threshold = getattr(config, 'LOCATOR_DIFF_THRESHOLD', 25)
+        self.min_fill = getattr(config, 'LOCATOR_MIN_FILL', 0.1)
+        self.margin = getattr(config, 'LOCATOR_MARGIN', 0.15)
+        self.min_width = getattr(config, 'LOCATOR_MIN_WIDTH', 40)
+        self.background_file = getattr(config, 'LOCATOR_BACKGROUND_FILE', "")
+        self.capture_on_start = getattr(config, 'LOCATOR_CAPTURE_ON_START', True)
+
+        self.background = None
+        self.frame_size = None
+        self.lock = threading.Lock()
+
+        if self.background_file and os.path.exists(self.background_file):
+            image = cv2.imread(self.background_file)
+            if image is not None:
+                self.set_background(image, save=False)
+                print(f"[Locator] Empty-belt reference loaded from {self.background_file}")
+
+    def has_background(self):
+        """Check if an empty-belt reference is available"""
+        return self.background is not None
+
+    def set_background(self, frame, save=True):
+        """
+        Use a frame of the empty belt as reference
+
+        Args:
+            frame: BGR image (no bottle in view)
+            save: Also write it to LOCATOR_BACKGROUND_FILE
+        """
+        reference = self._prepare(frame)
+        with self.lock:
+            self.background = reference
+            self.frame_size = frame.shape[:2]
+
+        if save and self.background_file:
+            os.makedirs(os.path.dirname(self.background_file) or ".", exist_ok=True)
+            cv2.imwrite(self.background_file, frame)
+            print(f"[Locator] Empty-belt reference saved to {self.background_file}")
+
+    def locate(self, frame):
+        """
+        Find the bottle in a frame
+
+        Args:
+            frame: BGR image (same size as the reference)
+
+        Returns:
+            Box (x1, y1, x2, y2) in frame pixels, or None if no bottle
+            was found (caller should fall back to the full frame)
+        """
+        with self.lock:
+            background = self.background
+            frame_size = self.frame_size
+        if background is None or frame.shape[:2] != frame_size:
+            return None
+
+        # Largest change over the color channels (red label vs. gray belt
+        # can have almost the same brightness)
+        diff = cv2.absdiff(self._prepare(frame), background).max(axis=2)
+        mask = diff > self.diff_threshold
+
+        # The bottle is the widest run of columns that changed
+        x_range = self._longest_run(mask.mean(axis=0) > self.min_fill)
+        if x_range is None:
+            return None
+        y_range = self._longest_run(mask[:, x_range[0]:x_range[1]].mean(axis=1) > self.min_fill)
+        if y_range is None:
+            return None
+
+        # Back to frame pixels, with a margin so caps/labels at the edge stay in
+        img_h, img_w = frame_size
+        fx = img_w / mask.shape[1]
+        fy = img_h / mask.shape[0]
+        x1, x2 = x_range[0] * fx, x_range[1] * fx
+        y1, y2 = y_range[0] * fy, y_range[1] * fy
+
+        if x2 - x1 < self.min_width:
+            return None
+
+        pad_x = (x2 - x1) * self.margin
+        pad_y = (y2 - y1) * self.margin
+        return (max(0, int(x1 - pad_x)), max(0, int(y1 - pad_y)),
+                min(img_w, int(x2 + pad_x)), min(img_h, int(y2 + pad_y)))
+
+    def _prepare(self, frame):
+        """Downscaled, blurred copy"""
+        small = cv2.resize(frame, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        return cv2.GaussianBlur(small, (5, 5), 0)
+
+    @staticmethod
+    def _longest_run(active):
+        """
+        Longest run of True values
+
+        Args:
+            active: 1-D bool array
+
+        Returns:
+            (start, end) with end exclusive, or None
+        """
+        if not active.any():
+            return None
+
+        # Run boundaries from the padded 0/1 signal
+        edges = np.diff(np.concatenate(([0], active.astype(np.int8), [0])))
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1)
+        longest = int(np.argmax(ends - starts))
+        return int(starts[longest]), int(ends[longest])
@@ -0,0 +1,188 @@
+"""
+Logging for Coca-Cola Sorting System
+Queue-backed, rate-limited logging so the inspection path never waits on
+the console or the log file
+"""
+
+import atexit
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+
+# Parent of every component logger ('app.AI', 'app.UI', ...)
+ROOT_NAME = "app"
+
+_listener = None
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Token bucket per message template
+
+    Messages are keyed by logger and format string (not the formatted
+    text), so use %-style arguments: log.debug("took %.1fms", ms).
+    Dropped repeats are counted and reported with the next one let through.
+    """
+
+    def __init__(self, rate=5.0, burst=10):
+        """
+        Args:
+            rate: Messages per second allowed per template (0 = no limit)
+            burst: Messages allowed at once before the rate applies
+        """
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {}  # key -> [tokens, last_time, suppressed]
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        if self.rate <= 0:
+            return True
+
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                bucket = self.buckets[key] = [self.burst, now, 0]
+            else:
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+
+            if bucket[0] < 1.0:
+                bucket[2] += 1
+                return False
+
+            bucket[0] -= 1.0
+            record.suppressed = bucket[2]
+            bucket[2] = 0
+        return True
+
+
+class ConsoleFormatter(logging.Formatter):
+    """
+    Same look as the rest of the console output:
+    '[AI] message' for info/debug, '[ERROR] message' for warnings and errors
+    """
+
+    def __init__(self, timestamps=False):
+        super().__init__()
+        self.timestamps = timestamps
+
+    def format(self, record):
+        if record.levelno >= logging.WARNING:
+            tag = record.levelname
+        else:
+            tag = record.name.rsplit('.', 1)[-1]
+
+        text = f"[{tag}] {record.getMessage()}"
+        suppressed = getattr(record, 'suppressed', 0)
+        if suppressed:
+            text += f" (+{suppressed} similar suppressed)"
+        if record.exc_info:
+            text += "\n" + self.formatException(record.exc_info)
+        if self.timestamps:
+            text = f"{self.formatTime(record)} {text}"
+        return text
+
+
+def get_logger(name):
+    """
+    Get a component logger
+
+    Args:
+        name: Component tag shown in the output ('AI', 'UI', ...)
+
+    Returns:
+        logging.Logger
+    """
+    return logging.getLogger(f"{ROOT_NAME}.{name}")
+
+
+def _set_handlers(handlers):
+    """Replace the handlers of the parent logger"""
+    root = logging.getLogger(ROOT_NAME)
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    for handler in handlers:
+        root.addHandler(handler)
+
+
+def setup_logging(config=None):
+    """
+    Send all component logs through a background thread
+
+    The inspection threads only put records on a queue; the console and
+    the rotating LOG_FILE are written by a QueueListener thread. Levels
+    below LOG_LEVEL are dropped at the call site (one level check).
+
+    Args:
+        config: Configuration module (optional)
+    """
+    global _listener
+
+    level_name = getattr(config, 'LOG_LEVEL', None)
+    if level_name is None:
+        level_name = 'DEBUG' if getattr(config, 'DEBUG_MODE', True) else 'INFO'
+    level = getattr(logging, str(level_name).upper(), logging.INFO)
+
+    handlers = []
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(ConsoleFormatter())
+    handlers.append(console)
+
+    log_file = getattr(config, 'LOG_FILE', "")
+    if log_file:
+        try:
+            file_handler = logging.handlers.RotatingFileHandler(
+                log_file,
+                maxBytes=getattr(config, 'LOG_MAX_BYTES', 5 * 1024 * 1024),
+                backupCount=getattr(config, 'LOG_BACKUP_COUNT', 3),
+                encoding='utf-8'
+            )
+            file_handler.setFormatter(ConsoleFormatter(timestamps=True))
+            handlers.append(file_handler)
+        except OSError as e:
+            print(f"[WARNING] Cannot open log file {log_file}: {e}")
+
+    stop_logging()
+
+    queue_handler = logging.handlers.QueueHandler(queue.SimpleQueue())
+    queue_handler.addFilter(RateLimitFilter(getattr(config, 'LOG_RATE_LIMIT', 5.0),
+                                            getattr(config, 'LOG_RATE_BURST', 10)))
+    _listener = logging.handlers.QueueListener(queue_handler.queue, *handlers)
+    _listener.start()
+
+    _set_handlers([queue_handler])
+    logging.getLogger(ROOT_NAME).setLevel(level)
+
+    if log_file:
+        print(f"[System] Logging to {log_file} ({logging.getLevelName(level)})")
+
+
+def stop_logging():
+    """Flush queued records and stop the background thread"""
+    global _listener
+
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
+
+
+# Default until setup_logging(): direct console output, all levels
+# (scripts keep printing exactly as before)
+_default_handler = logging.StreamHandler(sys.stdout)
+_default_handler.setFormatter(ConsoleFormatter())
+_default_handler.addFilter(RateLimitFilter())
+_root = logging.getLogger(ROOT_NAME)
+_root.setLevel(logging.DEBUG)
+_root.propagate = False
+_set_handlers([_default_handler])
@@ -0,0 +1,100 @@
+"""
+Frame Change Detector for Coca-Cola Sorting System
+Skips inference on unchanged frames (idle belt) in continuous inference
+"""
+
+import threading
+import time
+
+import cv2
+
+
+class FrameChangeDetector:
+    """
+    Cheap frame-change check on a tiny grayscale thumbnail
+
+    A frame counts as changed when its mean absolute difference from the
+    last accepted frame exceeds MOTION_THRESHOLD. The reference is only
+    replaced on a change, so slow drift still adds up to a change.
+    """
+
+    def __init__(self, config=None):
+        """
+        Initialize detector
+
+        Args:
+            config: Configuration module (optional)
+        """
+        self.thumb_size = tuple(getattr(config, 'MOTION_THUMB_SIZE', (32, 24)))
+        self.threshold = getattr(config, 'MOTION_THRESHOLD', 3.0)
+        self.max_age = getattr(config, 'MOTION_MAX_AGE', 2.0)
+
+        self.reference = None
+        self.reference_seq = None
+        self.reference_time = 0.0
+        self.lock = threading.Lock()
+
+        # Statistics
+        self.checked = 0
+        self.skipped = 0
+        self.last_score = 0.0
+
+    def changed(self, frame, frame_seq=None):
+        """
+        Check if a frame differs from the last accepted one
+
+        Args:
+            frame: BGR image
+            frame_seq: Camera frame sequence number (optional); the same
+                number means the same buffer, so nothing is computed
+
+        Returns:
+            bool: True if the frame should be inferred
+        """
+        with self.lock:
+            self.checked += 1
+
+            if frame_seq is not None and frame_seq == self.reference_seq:
+                self.skipped += 1
+                return False
+
+            thumb = self._thumbnail(frame)
+            now = time.time()
+
+            if self.reference is not None and now - self.reference_time < self.max_age:
+                self.last_score = float(cv2.absdiff(thumb, self.reference).mean())
+                if self.last_score <= self.threshold:
+                    self.skipped += 1
+                    return False
+
+            self.reference = thumb
+            self.reference_seq = frame_seq
+            self.reference_time = now
+            return True
+
+    def reset(self):
+        """Forget the reference (next frame is always inferred)"""
+        with self.lock:
+            self.reference = None
+            self.reference_seq = None
+
+    def get_stats(self):
+        """
+        Get gate statistics
+
+        Returns:
+            dict with checked/skipped frame counts and skip_ratio
+        """
+        with self.lock:
+            return {
+                'checked': self.checked,
+                'skipped': self.skipped,
+                'skip_ratio': self.skipped / self.checked if self.checked else 0.0,
+                'last_score': self.last_score
+            }
+
+    def _thumbnail(self, frame):
+        """Tiny blurred grayscale copy"""
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        small = cv2.resize(gray, self.thumb_size, interpolation=cv2.INTER_AREA)
+        return cv2.GaussianBlur(small, (3, 3), 0)
@@ -0,0 +1,171 @@
+"""
+Result Types for Coca-Cola Sorting System
+Compact detection and inspection result containers
+"""
+
+import numpy as np
+
+
+class Detection:
+    """
+    Single detection (lightweight view, created on iteration)
+    """
+
+    __slots__ = ('class_id', 'class_name', 'confidence', 'bbox')
+
+    def __init__(self, class_id, class_name, confidence, bbox):
+        self.class_id = class_id
+        self.class_name = class_name
+        self.confidence = confidence
+        self.bbox = bbox
+
+    def to_dict(self):
+        """Legacy dict format"""
+        return {
+            'class_id': self.class_id,
+            'class_name': self.class_name,
+            'confidence': self.confidence,
+            'bbox': self.bbox
+        }
+
+
+class Detections:
+    """
+    Columnar detection container
+
+    Keeps the decoder/NMS arrays as they are instead of building one dict
+    per box. Iterating yields Detection objects.
+    """
+
+    __slots__ = ('boxes', 'scores', 'class_ids', 'class_names')
+
+    def __init__(self, boxes, scores, class_ids, class_names):
+        """
+        Args:
+            boxes: int32 array (N, 4) as [x1, y1, x2, y2] in frame pixels
+            scores: float32 array (N,)
+            class_ids: int32 array (N,)
+            class_names: Class name list (shared, not copied)
+        """
+        self.boxes = boxes
+        self.scores = scores
+        self.class_ids = class_ids
+        self.class_names = class_names
+
+    @classmethod
+    def empty(cls, class_names):
+        """Container without detections"""
+        return cls(np.empty((0, 4), dtype=np.int32),
+                   np.empty((0,), dtype=np.float32),
+                   np.empty((0,), dtype=np.int32),
+                   class_names)
+
+    def __len__(self):
+        return len(self.scores)
+
+    def __iter__(self):
+        names = self.class_names
+        for bbox, confidence, class_id in zip(self.boxes.tolist(), self.scores.tolist(),
+                                              self.class_ids.tolist()):
+            yield Detection(class_id, names[class_id], confidence, bbox)
+
+    def to_list(self):
+        """Legacy list-of-dicts format"""
+        return [det.to_dict() for det in self]
+
+
+class InspectionResult:
+    """
+    Result of inspecting one bottle
+
+    Filled by AIEngine; the UI adds decision_latency and image_path.
+    """
+
+    __slots__ = ('result', 'reason', 'detections', 'has_cap', 'has_filled', 'has_label',
+                 'defects_found', 'early_decision', 'roi', 'frame', 'annotated_image',
+                 'processing_time', 'decision_latency', 'image_path', 'votes', 'display')
+
+    def __init__(self, result, reason, detections, has_cap=False, has_filled=False,
+                 has_label=False, defects_found=(), early_decision=None, frame=None):
+        """
+        Args:
+            result: 'OK' or 'NG'
+            reason: Explanation string
+            detections: Detections container
+            has_cap / has_filled / has_label: Required components found
+            defects_found: Defect class names (detection order)
+            early_decision: Pre-NMS decision ('OK'/'NG') or None
+            frame: Source frame (reference, not copied)
+        """
+        self.result = result
+        self.reason = reason
+        self.detections = detections
+        self.has_cap = has_cap
+        self.has_filled = has_filled
+        self.has_label = has_label
+        self.defects_found = list(defects_found)
+        self.early_decision = early_decision
+        self.roi = None
+        self.frame = frame
+        self.annotated_image = None
+        self.processing_time = 0.0
+        self.decision_latency = 0.0
+        self.image_path = ''
+        self.votes = None  # (ok, ng) frame votes when several frames were fused
+        self.display = None  # RoiGeometry when frame is a raw camera crop (see AIEngine.predict)
+
+    # Fields sent back from the inference process (no images)
+    MESSAGE_FIELDS = ('result', 'reason', 'has_cap', 'has_filled', 'has_label', 'defects_found',
+                      'early_decision', 'roi', 'processing_time', 'votes')
+    
+    def to_message(self):
+        """
+        Compact picklable form (detection arrays, no frame or images)
+        
+        Returns:
+            dict (a few hundred bytes for a typical bottle)
+        """
+        message = {name: getattr(self, name) for name in self.MESSAGE_FIELDS}
+        detections = self.detections
+        message['detections'] = (detections.boxes, detections.scores, detections.class_ids)
+        return message
+    
+    @classmethod
+    def from_message(cls, message, class_names, frame=None):
+        """
+        Rebuild a result from to_message()
+        
+        Args:
+            message: dict from to_message()
+            class_names: Class name list for the detections
+            frame: Source frame held by the caller (reference, not copied)
+            
+        Returns:
+            InspectionResult
+        """
+        result = cls(message['result'], message['reason'],
+                     Detections(*message['detections'], class_names), frame=frame)
+        for name in cls.MESSAGE_FIELDS[2:]:
+            setattr(result, name, message[name])
+        return result
+    
+    def to_dict(self):
+        """Legacy dict format (detections as a list of dicts)"""
+        return {
+            'result': self.result,
+            'reason': self.reason,
+            'detections': self.detections.to_list(),
+            'has_cap': self.has_cap,
+            'has_filled': self.has_filled,
+            'has_label': self.has_label,
+            'defects_found': list(self.defects_found),
+            'early_decision': self.early_decision,
+            'roi': self.roi,
+            'frame': self.frame,
+            'annotated_image': self.annotated_image,
+            'processing_time': self.processing_time,
+            'decision_latency': self.decision_latency,
+            'image_path': self.image_path,
+            'votes': self.votes,
+            'display': self.display
+        }
@@ -0,0 +1,168 @@
+"""
+Sorting Rules for Coca-Cola Sorting System
+Declarative OK/NG rules compiled to class masks
+"""
+
+import numpy as np
+
+
+class RuleSet:
+    """
+    Ordered sorting rules compiled for one SKU
+
+    Each rule is a class mask plus a confidence threshold per class, so a
+    frame is judged from its per-class confidence vector (best score of
+    each class, 0 if absent) with a few (rules x classes) array operations.
+    The first rule that fires decides; no rule firing means OK.
+
+    Rule types:
+        'reject_any': fires if any listed class is present (defects)
+        'require':    fires if any listed class is missing
+    """
+
+    TYPES = ('reject_any', 'require')
+
+    def __init__(self, name, rules, class_names):
+        """
+        Compile a rule list
+
+        Args:
+            name: SKU name (for messages)
+            rules: List of dicts {'type', 'classes', 'result' ('NG'),
+                'reason' (text before the class names), 'min_confidence' (0)}
+            class_names: Model class names; rules may use names or indices
+
+        Raises:
+            ValueError: Unknown rule type, class or result
+        """
+        self.name = name
+        self.class_names = list(class_names)
+        num_classes = len(self.class_names)
+
+        self.masks = np.zeros((len(rules), num_classes), dtype=bool)
+        self.thresholds = np.full((len(rules), num_classes), np.inf, dtype=np.float32)
+        self.is_require = np.zeros(len(rules), dtype=bool)
+        self.results = []
+        self.reasons = []
+
+        for index, rule in enumerate(rules):
+            rule_type = rule.get('type')
+            if rule_type not in self.TYPES:
+                raise ValueError(f"SKU '{name}' rule {index}: unknown type {rule_type!r} "
+                                 f"(expected one of {self.TYPES})")
+            result = rule.get('result', 'NG')
+            if result not in ('OK', 'NG'):
+                raise ValueError(f"SKU '{name}' rule {index}: result must be 'OK' or 'NG'")
+
+            class_ids = [self._class_id(c, index) for c in rule.get('classes', [])]
+            self.masks[index, class_ids] = True
+            # A class counts as present from min_confidence on (any detection if 0)
+            self.thresholds[index, class_ids] = max(float(rule.get('min_confidence', 0.0)), 1e-6)
+            self.is_require[index] = rule_type == 'require'
+            self.results.append(result)
+            self.reasons.append(rule.get('reason', 'Missing' if rule_type == 'require' else 'Defect'))
+
+    def _class_id(self, value, index):
+        """Resolve a class name or index"""
+        if isinstance(value, str):
+            if value not in self.class_names:
+                raise ValueError(f"SKU '{self.name}' rule {index}: unknown class {value!r}")
+            return self.class_names.index(value)
+        if not 0 <= int(value) < len(self.class_names):
+            raise ValueError(f"SKU '{self.name}' rule {index}: class index {value} out of range")
+        return int(value)
+
+    def evaluate(self, confidence):
+        """
+        Evaluate the rules on one or more frames
+
+        Args:
+            confidence: float array (classes,) or (frames, classes) with the
+                best score of each class (0 = absent)
+
+        Returns:
+            Tuple (fired, hits):
+                - fired: int array (frames,), index of the deciding rule or -1
+                - hits: bool array (frames, classes), classes that made the
+                  deciding rule fire (present defects / missing components)
+            For a 1-D input both have the frame axis removed.
+        """
+        conf = np.atleast_2d(confidence)
+        present = conf[:, None, :] >= self.thresholds[None]
+        hits = np.where(self.is_require[None, :, None], ~present, present) & self.masks[None]
+
+        rule_fired = hits.any(axis=2)
+        first = rule_fired.argmax(axis=1)
+        fired = np.where(rule_fired[np.arange(len(conf)), first], first, -1)
+        fired_hits = hits[np.arange(len(conf)), first] & (fired >= 0)[:, None]
+
+        if np.ndim(confidence) == 1:
+            return int(fired[0]), fired_hits[0]
+        return fired, fired_hits
+
+    def decide(self, confidence):
+        """
+        OK/NG for one or more frames
+
+        Args:
+            confidence: See evaluate()
+
+        Returns:
+            'OK'/'NG' (1-D input) or list of them
+        """
+        fired, _ = self.evaluate(confidence)
+        if np.ndim(fired) == 0:
+            return self.results[fired] if fired >= 0 else 'OK'
+        return [self.results[f] if f >= 0 else 'OK' for f in fired.tolist()]
+
+
+def class_confidence(scores, class_ids, num_classes):
+    """
+    Best score of each class (the vector the rules work on)
+
+    Args:
+        scores: float array (N,)
+        class_ids: int array (N,)
+        num_classes: Length of the vector
+
+    Returns:
+        float32 array (num_classes,), 0 for classes without detections
+    """
+    confidence = np.zeros(num_classes, dtype=np.float32)
+    np.maximum.at(confidence, class_ids, scores)
+    return confidence
+
+
+def legacy_rules(config):
+    """
+    Rule list equivalent to DEFECT_CLASSES / REQUIRED_COMPONENTS / REQUIRE_*
+
+    Args:
+        config: Configuration module
+
+    Returns:
+        List of rule dicts
+    """
+    components = getattr(config, 'REQUIRED_COMPONENTS', {'cap': 4, 'filled': 6, 'label': 7})
+    required = [components[name] for name in ('cap', 'filled', 'label')
+                if getattr(config, f'REQUIRE_{name.upper()}', True)]
+    return [
+        {'type': 'reject_any', 'classes': getattr(config, 'DEFECT_CLASSES', [0, 1, 2, 3])},
+        {'type': 'require', 'classes': required},
+    ]
+
+
+def compile_rule_sets(config, class_names):
+    """
+    Compile SORTING_RULES (one rule list per SKU)
+
+    Args:
+        config: Configuration module
+        class_names: Model class names
+
+    Returns:
+        dict {sku: RuleSet}; without SORTING_RULES a single 'default' SKU
+        built from the legacy settings
+    """
+    rule_lists = getattr(config, 'SORTING_RULES', None) or {'default': legacy_rules(config)}
+    return {sku: RuleSet(sku, rules, class_names) for sku, rules in rule_lists.items()}
@@ -16,6 +16,7 @@ from core.camera import Camera, DummyCamera
 from core.ai import AIEngine
 from core.hardware import HardwareController, DummyHardwareController
 from core.database import Database
+from core.log import setup_logging, stop_logging
 from ui.main_window import MainWindow
 import config
 
@@ -42,6 +43,7 @@ class ContinuousSortingSystem:
     def initialize_components(self):
         """Initialize all system components"""
         print("[System] Initializing components...")
+        setup_logging(config)
         
         try:
             # 1. Initialize Database
@@ -49,10 +51,11 @@ class ContinuousSortingSystem:
             self.database = Database(db_path=config.DATABASE_PATH)
             print("      ✓ Database ready")
             
-            # 2. Initialize AI Engine
+            # 2. Initialize AI Engine (loads + warms up while the rest starts)
             print("\n[2/4] Initializing AI engine...")
-            self.ai = AIEngine(model_path=config.MODEL_PATH, config=config)
-            print("      ✓ AI engine ready")
+            self.ai = AIEngine(model_path=config.MODEL_PATH, config=config, load_async=True)
+            self.ai.start_model_watch()
+            print("      ✓ AI engine loading in background")
             
             # 3. Initialize Camera
             print("\n[3/4] Initializing camera...")
@@ -167,11 +170,16 @@ class ContinuousSortingSystem:
             if self.hardware:
                 self.hardware.disconnect()
             
+            # Stop inference workers
+            if self.ai:
+                self.ai.shutdown()
+            
             # Destroy window
             if self.root:
                 self.root.destroy()
             
             print("[System] Shutdown complete")
+            stop_logging()
             
         except Exception as e:
             print(f"[ERROR] Shutdown error: {e}")
@@ -189,6 +197,7 @@ class ContinuousSortingSystem:
         print(f"Model:             {config.MODEL_PATH}")
         print(f"Confidence:        {config.CONFIDENCE_THRESHOLD}")
         print(f"NMS Threshold:     {config.NMS_THRESHOLD}")
+        print(f"Inference:         {config.INFERENCE_WORKERS} worker(s) x {config.NCNN_THREADS} thread(s)")
         print(f"Debug Mode:        {config.DEBUG_MODE}")
         print("=" * 70)
         print()
@@ -0,0 +1,120 @@
+import argparse
+import glob
+import os
+import statistics
+from typing import Dict, List, Optional
+
+import config
+from core.ai import AIEngine
+from test_model_batch import collect_images, evaluate_images, percentile
+
+
+def find_model_dirs(patterns: List[str]) -> List[str]:
+    """Expand folder patterns to NCNN model folders (baseline first)."""
+    dirs: List[str] = []
+    for pattern in patterns:
+        for d in sorted(glob.glob(pattern)):
+            if os.path.isfile(os.path.join(d, AIEngine.MODEL_FILES["fp32"][0])) and d not in dirs:
+                dirs.append(d)
+
+    baseline = os.path.normpath(config.MODEL_PATH)
+    dirs = [d for d in dirs if os.path.normpath(d) != baseline]
+    return [config.MODEL_PATH] + dirs
+
+
+def evaluate_model(model_dir: str, img_paths: List[str], batch_size: int) -> Optional[Dict]:
+    """Run the batch evaluation for one exported input size."""
+    ai = AIEngine(model_path=model_dir, config=config)
+    ai.debug_mode = False
+    if not ai.model_loaded:
+        print(f"[SWEEP] {model_dir}: model not loaded, skipping")
+        return None
+
+    rows, times, counts, infer_time = evaluate_images(ai, img_paths, batch_size)
+    ai.shutdown()
+    if not times:
+        return None
+
+    labelled = counts["expected_ok"] + counts["expected_ng"]
+    return {
+        "model": model_dir,
+        "size": f"{ai.input_w}x{ai.input_h}",
+        "pixels": ai.input_w * ai.input_h,
+        "results": {row.path: row.result for row in rows},
+        "mean_ms": statistics.mean(times),
+        "p95_ms": percentile(times, 0.95),
+        "throughput": counts["total"] / infer_time if infer_time > 0 else 0.0,
+        "accuracy": (counts["tp_ok"] + counts["tp_ng"]) / labelled * 100 if labelled else None,
+        "false_pass": counts["fp_ok"],
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Compare latency and OK/NG agreement of models exported at different input sizes."
+    )
+    parser.add_argument("--images", default="captures", help="Images to evaluate (default: captures).")
+    parser.add_argument("--models", nargs="*", default=["model/best_ncnn_model*"],
+                        help="Model folders or glob patterns (MODEL_PATH is always the baseline).")
+    parser.add_argument("--limit", type=int, default=0, help="Limit images (0 = no limit).")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--min-agreement", type=float, default=99.0,
+                        help="Minimum OK/NG agreement with the baseline in percent (default 99).")
+    args = parser.parse_args()
+
+    img_paths = collect_images(args.images)
+    if args.limit and args.limit > 0:
+        img_paths = img_paths[: args.limit]
+    if not img_paths:
+        print(f"[SWEEP] No images found under: {args.images}")
+        return 2
+
+    model_dirs = find_model_dirs(args.models)
+    if len(model_dirs) == 1:
+        print("[SWEEP] Only the baseline model was found. Export smaller sizes next to it, e.g.:")
+        print("    yolo export model=best.pt format=ncnn imgsz=320")
+        print("    yolo export model=best.pt format=ncnn imgsz=480,640   # h,w - matches 4:3 camera")
+        print("  and rename each best_ncnn_model folder to best_ncnn_model_<size>.")
+
+    results = []
+    for model_dir in model_dirs:
+        print(f"[SWEEP] Evaluating {model_dir} on {len(img_paths)} images...")
+        r = evaluate_model(model_dir, img_paths, args.batch_size)
+        if r is not None:
+            results.append(r)
+
+    if not results or results[0]["model"] != config.MODEL_PATH:
+        print("[SWEEP] Baseline model could not be evaluated.")
+        return 2
+
+    baseline = results[0]
+    for r in results:
+        common = [p for p in baseline["results"] if p in r["results"]]
+        same = sum(1 for p in common if baseline["results"][p] == r["results"][p])
+        r["agreement"] = same / len(common) * 100 if common else 0.0
+
+    print("\n" + "=" * 78)
+    print("[SWEEP] Input size vs latency / agreement with baseline")
+    print("=" * 78)
+    print(f"Images:    {args.images} ({len(img_paths)})")
+    print(f"Baseline:  {baseline['model']} ({baseline['size']})")
+    print()
+    print(f"{'size':>10}{'mean ms':>10}{'p95 ms':>10}{'img/s':>10}{'agree':>9}{'accuracy':>10}{'NG->OK':>8}  model")
+    for r in sorted(results, key=lambda r: r["pixels"]):
+        accuracy = f"{r['accuracy']:9.1f}%" if r["accuracy"] is not None else f"{'-':>10}"
+        print(f"{r['size']:>10}{r['mean_ms']:10.1f}{r['p95_ms']:10.1f}{r['throughput']:10.1f}"
+              f"{r['agreement']:8.1f}%{accuracy}{r['false_pass']:8d}  {r['model']}")
+
+    safe = [r for r in results if r["agreement"] >= args.min_agreement and r["false_pass"] <= baseline["false_pass"]]
+    best = min(safe, key=lambda r: r["mean_ms"])
+    print()
+    print(f"[SWEEP] Fastest size with >= {args.min_agreement:.1f}% agreement and no extra false passes: "
+          f"{best['size']} ({best['mean_ms']:.1f} ms)")
+    if best is not baseline:
+        print(f"[SWEEP] To use it set MODEL_PATH = \"{best['model']}\" in config.py")
+
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
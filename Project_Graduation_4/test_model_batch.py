@@ -4,12 +4,13 @@ import os
 import statistics
 import time
 from dataclasses import dataclass
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
 import cv2
 
 import config
 from core.ai import AIEngine
+from core.results import InspectionResult
 from core.camera import Camera, DummyCamera
 
 
@@ -58,6 +59,124 @@ def percentile(values: List[float], p: float) -> float:
     return d0 + d1
 
 
+def evaluate_images(
+    ai: AIEngine, img_paths: List[str], batch_size: int = 8, save_annotated: str = ""
+) -> Tuple[List[Row], List[float], Dict[str, int], float]:
+    """Run images through predict_batch and collect per-image rows, timings and confusion counts."""
+    rows: List[Row] = []
+    times: List[float] = []
+
+    counts: Dict[str, int] = {
+        "total": 0,
+        "expected_ok": 0,
+        "expected_ng": 0,
+        "pred_ok": 0,
+        "pred_ng": 0,
+        "tp_ok": 0,
+        "tp_ng": 0,
+        "fp_ok": 0,  # predicted OK but expected NG
+        "fp_ng": 0,  # predicted NG but expected OK
+        "missing_cap": 0,
+        "missing_filled": 0,
+        "missing_label": 0,
+        "defect": 0,
+        "early": 0,  # decided before NMS
+        "early_mismatch": 0,  # early decision differs from the full result
+    }
+
+    infer_time = 0.0
+    batch: List[tuple] = []
+    batch_size = max(1, batch_size)
+
+    def iter_results():
+        # Read images in chunks and run each chunk through predict_batch
+        nonlocal infer_time
+        for idx, p in enumerate(img_paths):
+            img = cv2.imread(p)
+            if img is not None:
+                batch.append((idx, p, img))
+            if batch and (len(batch) >= batch_size or idx == len(img_paths) - 1):
+                results = ai.predict_batch([item[2] for item in batch])
+                infer_time += ai.last_batch_stats["total_time"]
+                for item, r in zip(batch, results):
+                    yield item + (r,)
+                batch.clear()
+
+    for idx, p, img, r in iter_results():
+        ms = r.processing_time * 1000.0
+        times.append(ms)
+
+        expected = infer_expected_from_path(p)
+        if expected == "OK":
+            counts["expected_ok"] += 1
+        elif expected == "NG":
+            counts["expected_ng"] += 1
+
+        result = r.result
+        reason = r.reason
+        has_cap = bool(r.has_cap)
+        has_filled = bool(r.has_filled)
+        has_label = bool(r.has_label)
+
+        if result == "OK":
+            counts["pred_ok"] += 1
+        elif result == "NG":
+            counts["pred_ng"] += 1
+
+        # Simple reason breakdown
+        reason_l = (reason or "").lower()
+        if reason_l.startswith("missing:"):
+            if "cap" in reason_l:
+                counts["missing_cap"] += 1
+            if "filled" in reason_l:
+                counts["missing_filled"] += 1
+            if "label" in reason_l:
+                counts["missing_label"] += 1
+        if reason_l.startswith("defect:"):
+            counts["defect"] += 1
+
+        early = r.early_decision
+        if early:
+            counts["early"] += 1
+            if early != result:
+                counts["early_mismatch"] += 1
+
+        # Confusion (if expected is known)
+        if expected in ("OK", "NG") and result in ("OK", "NG"):
+            if expected == result == "OK":
+                counts["tp_ok"] += 1
+            elif expected == result == "NG":
+                counts["tp_ng"] += 1
+            elif expected == "NG" and result == "OK":
+                counts["fp_ok"] += 1
+            elif expected == "OK" and result == "NG":
+                counts["fp_ng"] += 1
+
+        rows.append(
+            Row(
+                path=p,
+                expected=expected,
+                result=result,
+                reason=reason,
+                ms=ms,
+                has_cap=has_cap,
+                has_filled=has_filled,
+                has_label=has_label,
+            )
+        )
+        counts["total"] += 1
+
+        if save_annotated:
+            out_img = ai.annotate(r)
+            if out_img is None:
+                out_img = img
+            base = os.path.basename(p)
+            out_path = os.path.join(save_annotated, f"{idx:05d}_{result}_{base}")
+            cv2.imwrite(out_path, out_img)
+
+    return rows, times, counts, infer_time
+
+
 def run_live(ai: AIEngine, args: argparse.Namespace) -> int:
     # Start camera (prefer project Camera so ROI/exposure settings match app)
     if getattr(config, "USE_DUMMY_CAMERA", False) or args.dummy:
@@ -82,41 +201,41 @@ def run_live(ai: AIEngine, args: argparse.Namespace) -> int:
         os.makedirs(args.save_annotated, exist_ok=True)
 
     last = None
-    last_result: Optional[dict] = None
+    last_result: Optional[InspectionResult] = None
+    last_ms = 0.0
+    frame_seq = None
     times: List[float] = []
     frame_idx = 0
 
     try:
         while True:
-            frame = cam.read_frame()
+            frame, frame_seq = cam.read_new_frame(frame_seq)
             if frame is None:
-                time.sleep(0.01)
+                time.sleep(0.005)
                 continue
 
             frame_idx += 1
             do_infer = (args.every <= 1) or (frame_idx % args.every == 0)
             if do_infer:
+                # Unchanged frames (idle belt) reuse the last result
                 start = time.time()
-                last_result = ai.predict(frame)
-                ms = (time.time() - start) * 1000.0
-                last_result["__ms"] = ms
-                times.append(ms)
+                last_result, inferred = ai.predict_gated(frame, frame_seq)
+                if inferred:
+                    last_ms = (time.time() - start) * 1000.0
+                    times.append(last_ms)
 
-                if args.print_each:
+                if inferred and args.print_each:
                     print(
-                        f"[LIVE] {frame_idx} | {last_result.get('result')} | "
-                        f"{last_result.get('reason')} | {ms:.1f}ms"
+                        f"[LIVE] {frame_idx} | {last_result.result} | "
+                        f"{last_result.reason} | {last_ms:.1f}ms"
                     )
 
-            if last_result and last_result.get("annotated_image") is not None:
-                last = last_result["annotated_image"]
-            else:
-                last = frame
+            last = ai.annotate(last_result) if last_result else None
+            last = last.copy() if last is not None else frame
 
             # Overlay quick stats
             if last_result:
-                ms = float(last_result.get("__ms", 0.0))
-                txt = f"{last_result.get('result')} | {ms:.1f}ms"
+                txt = f"{last_result.result} | {last_ms:.1f}ms"
                 cv2.putText(last, txt, (10, 25), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 255), 2)
 
             cv2.imshow("LIVE (press q to quit)", last)
@@ -135,6 +254,11 @@ def run_live(ai: AIEngine, args: argparse.Namespace) -> int:
             print(f"  median: {statistics.median(times):.1f}")
             print(f"  p95:    {percentile(times, 0.95):.1f}")
 
+        motion = ai.get_motion_stats()
+        if motion:
+            print(f"[LIVE] Motion gate skipped {motion['skipped']}/{motion['checked']} frames "
+                  f"({motion['skip_ratio']*100:.1f}%)")
+
         return 0
     finally:
         try:
@@ -161,6 +285,7 @@ def main() -> int:
     )
     parser.add_argument("--limit", type=int, default=0, help="Limit number of images (0 = no limit).")
     parser.add_argument("--warmup", type=int, default=5, help="Warmup iterations before measuring.")
+    parser.add_argument("--batch-size", type=int, default=8, help="Images per predict_batch call (default 8).")
     parser.add_argument("--save-annotated", default="", help="Output folder to save annotated images (optional).")
     parser.add_argument("--no-roi", action="store_true", help="Disable ROI crop for this run (temporary).")
     args = parser.parse_args()
@@ -192,97 +317,9 @@ def main() -> int:
     for _ in range(max(0, args.warmup)):
         _ = ai.predict(warm_img)
 
-    rows: List[Row] = []
-    times: List[float] = []
-
-    counts: Dict[str, int] = {
-        "total": 0,
-        "expected_ok": 0,
-        "expected_ng": 0,
-        "pred_ok": 0,
-        "pred_ng": 0,
-        "tp_ok": 0,
-        "tp_ng": 0,
-        "fp_ok": 0,  # predicted OK but expected NG
-        "fp_ng": 0,  # predicted NG but expected OK
-        "missing_cap": 0,
-        "missing_filled": 0,
-        "missing_label": 0,
-        "defect": 0,
-    }
-
     t0 = time.time()
-    for idx, p in enumerate(img_paths):
-        img = cv2.imread(p)
-        if img is None:
-            continue
-
-        start = time.time()
-        r = ai.predict(img)
-        ms = (time.time() - start) * 1000.0
-        times.append(ms)
-
-        expected = infer_expected_from_path(p)
-        if expected == "OK":
-            counts["expected_ok"] += 1
-        elif expected == "NG":
-            counts["expected_ng"] += 1
-
-        result = r.get("result", "UNKNOWN")
-        reason = r.get("reason", "")
-        has_cap = bool(r.get("has_cap", False))
-        has_filled = bool(r.get("has_filled", False))
-        has_label = bool(r.get("has_label", False))
-
-        if result == "OK":
-            counts["pred_ok"] += 1
-        elif result == "NG":
-            counts["pred_ng"] += 1
-
-        # Simple reason breakdown
-        reason_l = (reason or "").lower()
-        if reason_l.startswith("missing:"):
-            if "cap" in reason_l:
-                counts["missing_cap"] += 1
-            if "filled" in reason_l:
-                counts["missing_filled"] += 1
-            if "label" in reason_l:
-                counts["missing_label"] += 1
-        if reason_l.startswith("defect:"):
-            counts["defect"] += 1
-
-        # Confusion (if expected is known)
-        if expected in ("OK", "NG") and result in ("OK", "NG"):
-            if expected == result == "OK":
-                counts["tp_ok"] += 1
-            elif expected == result == "NG":
-                counts["tp_ng"] += 1
-            elif expected == "NG" and result == "OK":
-                counts["fp_ok"] += 1
-            elif expected == "OK" and result == "NG":
-                counts["fp_ng"] += 1
-
-        rows.append(
-            Row(
-                path=p,
-                expected=expected,
-                result=result,
-                reason=reason,
-                ms=ms,
-                has_cap=has_cap,
-                has_filled=has_filled,
-                has_label=has_label,
-            )
-        )
-        counts["total"] += 1
-
-        if args.save_annotated:
-            out_img = r.get("annotated_image", None)
-            if out_img is None:
-                out_img = img
-            base = os.path.basename(p)
-            out_path = os.path.join(args.save_annotated, f"{idx:05d}_{result}_{base}")
-            cv2.imwrite(out_path, out_img)
+    rows, times, counts, infer_time = evaluate_images(ai, img_paths, args.batch_size, args.save_annotated)
+    batch_size = max(1, args.batch_size)
 
     dt = time.time() - t0
     if not times:
@@ -306,11 +343,15 @@ def main() -> int:
     print(f"  median: {statistics.median(times):.1f}")
     print(f"  p95:    {percentile(times, 0.95):.1f}")
     print(f"  min/max:{min(times):.1f}/{max(times):.1f}")
+    print(f"Throughput:            {counts['total'] / infer_time if infer_time > 0 else 0.0:.1f} img/s "
+          f"(batch size {batch_size})")
     print()
 
     print("Predictions:")
     print(f"  OK: {counts['pred_ok']}")
     print(f"  NG: {counts['pred_ng']}")
+    print(f"  Early decisions: {counts['early']}/{counts['total']} "
+          f"(mismatches: {counts['early_mismatch']})")
     print()
 
     if counts["expected_ok"] + counts["expected_ng"] > 0:
@@ -8,6 +8,7 @@ import cv2
 
 import config
 from core.ai import AIEngine
+from core.results import InspectionResult
 from core.camera import Camera, DummyCamera
 
 
@@ -73,39 +74,42 @@ def main() -> int:
 
     times: List[float] = []
     frame_idx = 0
-    last_result: Optional[dict] = None
+    last_result: Optional[InspectionResult] = None
+    last_ms = 0.0
+    frame_seq = None
 
     try:
         while True:
-            frame = cam.read_frame()
+            frame, frame_seq = cam.read_new_frame(frame_seq)
             if frame is None:
-                time.sleep(0.01)
+                time.sleep(0.005)
                 continue
 
             frame_idx += 1
             do_infer = (args.every <= 1) or (frame_idx % args.every == 0)
 
             if do_infer:
+                # Unchanged frames (idle belt) reuse the last result
                 start = time.time()
-                last_result = ai.predict(frame)
-                ms = (time.time() - start) * 1000.0
-                last_result["__ms"] = ms
-                times.append(ms)
+                last_result, inferred = ai.predict_gated(frame, frame_seq)
+                if inferred:
+                    last_ms = (time.time() - start) * 1000.0
+                    times.append(last_ms)
 
-                if args.print_each:
+                if inferred and args.print_each:
                     print(
-                        f"[LIVE] {frame_idx} | {last_result.get('result')} | "
-                        f"{last_result.get('reason')} | {ms:.1f}ms"
+                        f"[LIVE] {frame_idx} | {last_result.result} | "
+                        f"{last_result.reason} | {last_ms:.1f}ms"
                     )
 
-            if last_result and last_result.get("annotated_image") is not None:
-                view = last_result["annotated_image"].copy()
+            annotated = ai.annotate(last_result) if last_result else None
+            if annotated is not None:
+                view = annotated.copy()
             else:
                 view = frame.copy()
 
             if last_result:
-                ms = float(last_result.get("__ms", 0.0))
-                txt = f"{last_result.get('result')} | {ms:.1f}ms"
+                txt = f"{last_result.result} | {last_ms:.1f}ms"
                 cv2.putText(view, txt, (10, 25), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 255), 2)
 
             cv2.imshow("LIVE YOLO (q=quit, s=save)", view)
@@ -124,6 +128,11 @@ def main() -> int:
             print(f"  median: {statistics.median(times):.1f}")
             print(f"  p95:    {percentile(times, 0.95):.1f}")
 
+        motion = ai.get_motion_stats()
+        if motion:
+            print(f"[LIVE TEST] Motion gate skipped {motion['skipped']}/{motion['checked']} frames "
+                  f"({motion['skip_ratio']*100:.1f}%)")
+
         return 0
     finally:
         try:
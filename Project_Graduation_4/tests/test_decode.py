@@ -0,0 +1,52 @@
+"""Output decoding (AIEngine._parse_ncnn_output)"""
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from core.ai import AIEngine
+from core.backends import OutputLayout
+
+
+def make_engine(monkeypatch):
+    monkeypatch.setattr(config, 'INFERENCE_PROCESS', False)
+    return AIEngine(model_path='/nonexistent', config=config)
+
+
+def synthetic_output(num_classes, anchors=8400):
+    """(4+nc, anchors) tensor with one confident 'cap' box at (320, 320)"""
+    output = np.zeros((4 + num_classes, anchors), dtype=np.float32)
+    output[:4, 100] = (320, 320, 100, 200)  # cx, cy, w, h in model input pixels
+    output[4 + 4, 100] = 0.9
+    return output
+
+
+def test_decode_channels_first(monkeypatch):
+    engine = make_engine(monkeypatch)
+    try:
+        num_classes = len(engine.class_names)
+        engine.output_layout = OutputLayout(True, 4 + num_classes, 8400, (1.0, 1.0))
+        boxes, scores, class_ids = engine._parse_ncnn_output(
+            synthetic_output(num_classes), engine.input_w, engine.input_h)
+        assert class_ids.tolist() == [4]
+        assert np.allclose(scores, [0.9])
+        assert boxes.tolist() == [[270, 220, 370, 420]]
+    finally:
+        engine.shutdown()
+
+
+def test_decode_channels_last(monkeypatch):
+    engine = make_engine(monkeypatch)
+    try:
+        num_classes = len(engine.class_names)
+        engine.output_layout = OutputLayout(False, 4 + num_classes, 8400, (1.0, 1.0))
+        output = np.ascontiguousarray(synthetic_output(num_classes).T)
+        boxes, _, class_ids = engine._parse_ncnn_output(output, engine.input_w, engine.input_h)
+        assert class_ids.tolist() == [4]
+        assert boxes.tolist() == [[270, 220, 370, 420]]
+    finally:
+        engine.shutdown()
@@ -0,0 +1,52 @@
+"""Multi-frame voting (AIEngine.fuse_results)"""
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from core.ai import AIEngine
+from core.results import Detections, InspectionResult
+
+
+def make_engine(monkeypatch, voting_mode):
+    monkeypatch.setattr(config, 'VOTING_MODE', voting_mode)
+    monkeypatch.setattr(config, 'INFERENCE_PROCESS', False)
+    # Defects only: frames without detections pass
+    monkeypatch.setattr(config, 'SORTING_RULES',
+                        {'default': [{'type': 'reject_any', 'classes': ['Cap-Defect']}]})
+    monkeypatch.setattr(config, 'ACTIVE_SKU', 'default')
+    return AIEngine(model_path='/nonexistent', config=config)
+
+
+def empty_result(decision, class_names):
+    return InspectionResult(decision, 'test', Detections.empty(class_names))
+
+
+def test_confidence_all_ok_without_detections(monkeypatch):
+    engine = make_engine(monkeypatch, 'confidence')
+    try:
+        results = [empty_result('OK', engine.class_names) for _ in range(3)]
+        fused = engine.fuse_results(results)
+        assert fused.result == 'OK'
+        assert fused.votes == (3, 0)
+    finally:
+        engine.shutdown()
+
+
+def test_confidence_weighs_detections(monkeypatch):
+    engine = make_engine(monkeypatch, 'confidence')
+    try:
+        ok = empty_result('OK', engine.class_names)
+        ng = InspectionResult('NG', 'test', Detections(np.zeros((1, 4), dtype=np.int32),
+                                                       np.array([0.9], dtype=np.float32),
+                                                       np.array([0], dtype=np.int32),
+                                                       engine.class_names))
+        fused = engine.fuse_results([ok, ok, ng])
+        assert fused.result == 'NG'
+        assert fused is ng
+    finally:
+        engine.shutdown()
@@ -0,0 +1,179 @@
+import argparse
+import itertools
+import json
+import os
+import platform
+import statistics
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+import config
+from core.ai import AIEngine
+from test_model_batch import percentile
+
+
+def option_matrix(thread_counts: List[int]) -> List[Dict]:
+    """All ncnn.Option combinations to benchmark."""
+    combos = []
+    # fp16 arithmetic only makes sense on top of fp16 storage
+    fp16_modes = ((False, False), (True, False), (True, True))
+    for (fp16_storage, fp16_arith), winograd, sgemm, packing, threads in itertools.product(
+        fp16_modes, (True, False), (True, False), (True, False), thread_counts
+    ):
+        combos.append({
+            "num_threads": threads,
+            "use_fp16_storage": fp16_storage,
+            "use_fp16_arithmetic": fp16_arith,
+            "use_winograd_convolution": winograd,
+            "use_sgemm_convolution": sgemm,
+            "use_packing_layout": packing,
+        })
+    return combos
+
+
+def run_once(net, mat) -> Tuple[float, Optional[np.ndarray]]:
+    start = time.perf_counter()
+    ex = net.create_extractor()
+    ex.input("in0", mat)
+    ret, out = ex.extract("out0")
+    ms = (time.perf_counter() - start) * 1000.0
+    return ms, (np.array(out) if ret == 0 else None)
+
+
+def benchmark(ai: AIEngine, mat, combo: Dict, warmup: int, runs: int) -> Optional[Tuple[List[float], np.ndarray]]:
+    """Load a net with the given options and time it on one input."""
+    options = {key: combo[key] for key in AIEngine.TUNABLE_OPTIONS}
+    net = ai._create_net(combo["num_threads"], options)
+    if net is None:
+        return None
+
+    for _ in range(warmup):
+        run_once(net, mat)
+
+    times: List[float] = []
+    out = None
+    for _ in range(runs):
+        ms, out = run_once(net, mat)
+        if out is None:
+            return None
+        times.append(ms)
+
+    net.clear()
+    return times, out
+
+
+def describe(combo: Dict) -> str:
+    flags = [key.replace("use_", "").replace("_convolution", "") for key in AIEngine.TUNABLE_OPTIONS if combo[key]]
+    return f"threads={combo['num_threads']} " + ",".join(flags)
+
+
+def main() -> int:
+    cpu_count = os.cpu_count() or 1
+    default_threads = sorted({t for t in (1, 2, 4, cpu_count) if t <= cpu_count})
+
+    parser = argparse.ArgumentParser(description="Benchmark ncnn.Option combinations and save the fastest profile.")
+    parser.add_argument("--image", default="", help="Input image (default: synthetic frame).")
+    parser.add_argument("--threads", default=",".join(map(str, default_threads)),
+                        help="Comma-separated thread counts to try.")
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--max-score-diff", type=float, default=0.02,
+                        help="Reject options whose class scores differ more than this from the fp32 baseline.")
+    parser.add_argument("--precision", default=getattr(config, "MODEL_PRECISION", "fp32"), choices=["fp32", "int8"])
+    parser.add_argument("--output", default="", help="Profile path (default: <MODEL_PATH>/<NCNN_PROFILE_FILE>).")
+    parser.add_argument("--dry-run", action="store_true", help="Print the winner without writing the profile.")
+    args = parser.parse_args()
+
+    config.INFERENCE_BACKEND = "ncnn"
+    config.INFERENCE_PROCESS = False  # The net and its output layout must live in this process
+    ai = AIEngine(model_path=config.MODEL_PATH, config=config, precision=args.precision)
+    ai.debug_mode = False
+    if not ai.model_loaded or ai.backend.name != "ncnn":
+        print("[TUNE] NCNN model not loaded.")
+        return 2
+
+    if args.image:
+        frame = cv2.imread(args.image)
+        if frame is None:
+            print(f"[TUNE] Failed to read {args.image}")
+            return 2
+    else:
+        rng = np.random.default_rng(0)
+        frame = rng.integers(0, 256, size=(config.CAMERA_HEIGHT, config.CAMERA_WIDTH, 3), dtype=np.uint8)
+    mat, _ = ai._preprocess(frame)
+
+    thread_counts = [int(t) for t in args.threads.split(",") if t.strip()]
+    combos = option_matrix(thread_counts)
+
+    # Reference output: ncnn defaults without fp16, most threads
+    baseline_combo = {
+        "num_threads": max(thread_counts),
+        "use_fp16_storage": False,
+        "use_fp16_arithmetic": False,
+        "use_winograd_convolution": True,
+        "use_sgemm_convolution": True,
+        "use_packing_layout": True,
+    }
+    baseline = benchmark(ai, mat, baseline_combo, 1, 1)
+    if baseline is None:
+        print("[TUNE] Baseline inference failed.")
+        return 2
+    # Class score rows whatever the export layout (box rows come first)
+    baseline_scores = ai._output_view(baseline[1])[4:]
+
+    print(f"[TUNE] Benchmarking {len(combos)} option combinations ({args.runs} runs each)...")
+    results = []
+    for i, combo in enumerate(combos, 1):
+        r = benchmark(ai, mat, combo, args.warmup, args.runs)
+        if r is None:
+            print(f"  [{i:3d}/{len(combos)}] {describe(combo):70} FAILED")
+            continue
+        times, out = r
+        scores = ai._output_view(out)[4:] if out.shape == baseline[1].shape else None
+        score_diff = float(np.abs(scores - baseline_scores).max()) if scores is not None else float("inf")
+        median = statistics.median(times)
+        results.append((median, percentile(times, 0.95), score_diff, combo))
+        print(f"  [{i:3d}/{len(combos)}] {describe(combo):70} {median:8.1f} ms  diff={score_diff:.4f}")
+
+    accepted = [r for r in results if r[2] <= args.max_score_diff]
+    if not accepted:
+        print("[TUNE] No option combination within the score tolerance.")
+        return 1
+    accepted.sort(key=lambda r: r[0])
+
+    print("\n" + "=" * 70)
+    print("[TUNE] Fastest option combinations")
+    print("=" * 70)
+    for median, p95, score_diff, combo in accepted[:10]:
+        print(f"  {median:8.1f} ms (p95 {p95:6.1f})  diff={score_diff:.4f}  {describe(combo)}")
+
+    best_median, best_p95, best_diff, best = accepted[0]
+    profile = dict(best)
+    profile.update({
+        "precision": ai.precision,
+        "latency_ms": round(best_median, 2),
+        "latency_p95_ms": round(best_p95, 2),
+        "max_score_diff": round(best_diff, 5),
+        "machine": platform.machine(),
+        "cpu_count": cpu_count,
+        "model": config.MODEL_PATH,
+        "created": datetime.now().isoformat(timespec="seconds"),
+    })
+
+    print(f"\n[TUNE] Winner: {describe(best)} ({best_median:.1f} ms)")
+    if args.dry_run:
+        return 0
+
+    out_path = args.output or os.path.join(config.MODEL_PATH, ai.ncnn_profile_file or "ncnn_profile.json")
+    with open(out_path, "w") as f:
+        json.dump(profile, f, indent=2)
+    print(f"[TUNE] Profile saved to {out_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
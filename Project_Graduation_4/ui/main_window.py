@@ -8,9 +8,14 @@ import tkinter as tk
 from tkinter import ttk
 from PIL import Image, ImageTk
 import cv2
+import numpy as np
 import time
 import threading
 
+from core.log import get_logger
+
+log = get_logger("UI")
+
 
 class MainWindow:
     """
@@ -36,7 +41,17 @@ class MainWindow:
         self.database = database
         
         self.system_running = False
-        self.processing = False
+        
+        # Bottles being inspected (more than one only with an inference pool)
+        self.max_in_flight = 1
+        self.in_flight = 0
+        self.in_flight_lock = threading.Lock()
+        
+        # Decisions must reach the Arduino FIFO in trigger order
+        self.decision_lock = threading.Lock()
+        self.pending_decisions = {}
+        self.next_ticket = 0
+        self.next_decision = 0
         
         # UI elements
         self.live_label = None
@@ -45,7 +60,8 @@ class MainWindow:
         self.stats_label = None
         
         # Latest frames
-        self.latest_live_frame = None
+        self.display_buffer = np.empty((480, 640, 3), dtype=np.uint8)  # Live view RGB image
+        self.display_scaled = np.empty((480, 640, 3), dtype=np.uint8)  # ROI crop resized for it
         self.latest_snapshot = None
         
         # Statistics
@@ -58,6 +74,9 @@ class MainWindow:
         
         # Start video update loop
         self._update_video()
+        
+        # Enable START once the AI engine has loaded and warmed up
+        self._check_ai_ready()
     
     def _setup_ui(self):
         """Setup UI layout"""
@@ -128,17 +147,18 @@ class MainWindow:
                 font=('Arial', 14, 'bold'), bg='#34495e', fg='white').pack(pady=10)
         
         # System status
-        self.status_label = tk.Label(right_frame, text="● STOPPED", 
+        self.status_label = tk.Label(right_frame, text="● LOADING MODEL...", 
                                      font=('Arial', 12, 'bold'),
-                                     bg='#34495e', fg='#e74c3c')
+                                     bg='#34495e', fg='#f39c12')
         self.status_label.pack(pady=10)
         
-        # Start button
+        # Start button (enabled when the AI engine is ready)
         self.start_btn = tk.Button(right_frame, text="START SYSTEM",
                                    font=('Arial', 12, 'bold'),
                                    bg='#27ae60', fg='white',
                                    width=18, height=2,
-                                   command=self.start_system)
+                                   command=self.start_system,
+                                   state=tk.DISABLED)
         self.start_btn.pack(pady=5)
         
         # Stop button
@@ -175,6 +195,21 @@ class MainWindow:
                                      command=self.view_history)
         self.history_btn.pack(pady=5)
         
+        # Model hot-swap buttons (the line keeps running)
+        self.reload_btn = tk.Button(right_frame, text="RELOAD MODEL",
+                                    font=('Arial', 11),
+                                    bg='#8e44ad', fg='white',
+                                    width=18, height=2,
+                                    command=self.reload_model)
+        self.reload_btn.pack(pady=5)
+        
+        self.rollback_btn = tk.Button(right_frame, text="ROLLBACK MODEL",
+                                      font=('Arial', 11),
+                                      bg='#7f8c8d', fg='white',
+                                      width=18, height=2,
+                                      command=self.rollback_model)
+        self.rollback_btn.pack(pady=5)
+        
         # Exit button
         self.exit_btn = tk.Button(right_frame, text="EXIT",
                                   font=('Arial', 11),
@@ -191,14 +226,16 @@ class MainWindow:
     def _update_video(self):
         """Update live video display (runs continuously)"""
         if self.camera and self.camera.is_running():
-            frame = self.camera.read_frame()
+            # Borrow the camera buffer (no copy); the raw ROI crop is resized
+            # once into the preallocated display buffers
+            with self.camera.frame_view() as frame:
+                if frame is not None:
+                    if frame.shape[:2] != (480, 640):
+                        frame = cv2.resize(frame, (640, 480), dst=self.display_scaled)
+                    display_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=self.display_buffer)
             
             if frame is not None:
-                self.latest_live_frame = frame
-                
                 # Convert to PhotoImage
-                display_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                display_frame = cv2.resize(display_frame, (640, 480))
                 img = Image.fromarray(display_frame)
                 imgtk = ImageTk.PhotoImage(image=img)
                 
@@ -213,13 +250,36 @@ class MainWindow:
         # Schedule next update (30 FPS)
         self.root.after(33, self._update_video)
     
+    def _check_ai_ready(self):
+        """Poll AI readiness and enable START when it is ready"""
+        if not self.ai.is_ready():
+            self.root.after(100, self._check_ai_ready)
+            return
+        
+        print(f"[UI] AI engine ready (time-to-ready: {self.ai.time_to_ready:.2f}s)")
+        self.status_label.configure(text="● STOPPED", fg='#e74c3c')
+        self.start_btn.configure(state=tk.NORMAL)
+    
     def start_system(self):
         """Start automatic sorting system"""
-        if self.system_running:
+        if self.system_running or not self.ai.is_ready():
             return
         
         print("[UI] Starting system...")
         
+        # One bottle in flight per inference worker
+        pool = getattr(self.ai, 'pool', None)
+        self.max_in_flight = pool.num_workers if pool else 1
+        
+        # Empty-belt reference for the bottle locator (before the belt moves)
+        locator = getattr(self.ai, 'locator', None)
+        if locator and locator.capture_on_start:
+            frame = self.camera.read_frame(raw=True)  # Same crop the AI inspects
+            if frame is not None:
+                locator.set_background(frame)
+            elif not locator.has_background():
+                print("[WARNING] No empty-belt reference, locator disabled until one is set")
+        
         # Start conveyor belt (relay ON)
         self.hardware.start_conveyor()
         
@@ -254,79 +314,151 @@ class MainWindow:
         self.stop_btn.configure(state=tk.DISABLED)
         
         print("[UI] System stopped - Conveyor stopped, detection paused")
+        
+        for line in self.ai.latency.format_stats():
+            print(f"[Latency] {line}")
     
-    def on_bottle_detected(self, timestamp):
+    def on_bottle_detected(self, timestamp, trigger_time=None):
         """
         Handle bottle detection from Arduino
         CONTROL FIRST STRATEGY: Capture -> AI -> Send Decision -> Update UI
         
         Args:
             timestamp: Detection timestamp from Arduino (or None)
+            trigger_time: time.monotonic() when the sensor fired; the frame
+                taken closest to it is inspected (None = latest frame)
         """
-        if not self.system_running or self.processing:
+        if not self.system_running:
             return
         
-        print(f"[UI] Bottle detected! (timestamp: {timestamp})")
+        trace = self.ai.latency.begin()
+        
+        with self.in_flight_lock:
+            if self.in_flight >= self.max_in_flight:
+                return
+            self.in_flight += 1
+            ticket = self.next_ticket
+            self.next_ticket += 1
+        
+        log.info("Bottle detected! (timestamp: %s)", timestamp)
         
         # Process in separate thread to avoid blocking
-        thread = threading.Thread(target=self._process_bottle, daemon=True)
+        thread = threading.Thread(target=self._process_bottle, args=(ticket, trace, trigger_time),
+                                  daemon=True)
         thread.start()
     
-    def _process_bottle(self):
+    def _process_bottle(self, ticket, trace=None, trigger_time=None):
         """
         Process bottle detection (runs in separate thread)
         CRITICAL: Send decision to Arduino IMMEDIATELY after AI
+        
+        Args:
+            ticket: Trigger sequence number (decisions are sent in this order)
+            trace: LatencyTrace started at the trigger (optional)
+            trigger_time: time.monotonic() when the sensor fired (optional)
         """
-        self.processing = True
+        decided = []
         
         try:
             start_time = time.time()
             
-            # STEP 1: Capture frame
-            frame = self.camera.capture_snapshot()
-            if frame is None:
-                print("[ERROR] Failed to capture frame")
-                self.processing = False
+            # STEP 1: Capture frame(s) - several only while the budget allows.
+            # Raw ROI crops: resampled once into the model input, results
+            # are mapped to display coordinates by the AI (display=geometry)
+            geometry = self.camera.geometry
+            num_frames = self.ai.num_capture_frames
+            if num_frames > 1:
+                frames = self.camera.capture_frames(
+                    num_frames, self.ai.frame_delay,
+                    lambda n: self.ai.frames_within_budget(time.time() - start_time, n),
+                    trigger_time=trigger_time, raw=True)
+            else:
+                frame = self.camera.capture_snapshot(trigger_time, raw=True)
+                frames = [frame] if frame is not None else []
+            if not frames:
+                log.error("Failed to capture frame")
                 return
+            if trace:
+                trace.mark('frame_selected')
             
-            # STEP 2: Run AI prediction
-            result = self.ai.predict(frame)
+            # STEP 2 + 3: Run AI prediction and SEND DECISION TO ARDUINO
+            # IMMEDIATELY (Control First!) - the callback fires as soon as
+            # OK/NG is known, usually before NMS; detections finish after
+            def on_decision(decision):
+                decided.append(time.time() - start_time)
+                self._queue_decision(ticket, decision, trace)
             
-            # STEP 3: SEND DECISION TO ARDUINO IMMEDIATELY (Control First!)
-            decision = result['result']
-            if decision == 'OK':
-                self.hardware.send_ok()
+            if len(frames) > 1:
+                result = self.ai.predict_multi(frames, on_decision=on_decision, trace=trace,
+                                               display=geometry)
             else:
-                self.hardware.send_ng()
+                result = self.ai.predict(frames[0], on_decision=on_decision, trace=trace,
+                                         display=geometry)
             
-            print(f"[UI] Decision sent to Arduino: {decision}")
+            result.decision_latency = decided[0]
+            log.info("Decision sent to Arduino: %s (%.1f ms after trigger%s)",
+                     result.result, result.decision_latency * 1000,
+                     ", early" if result.early_decision else "")
             
             # STEP 4: Now update UI (after hardware control is done)
+            self.ai.annotate(result)
+            if trace:
+                trace.mark('annotated')
             self.root.after(0, self._display_result, result)
             
             # STEP 5: Save to database (lowest priority)
-            self._save_result(result)
+            self._save_result(result, trace)
             
             # STEP 6: Update statistics
             self._update_statistics()
             
         except Exception as e:
-            print(f"[ERROR] Processing failed: {e}")
-            import traceback
-            traceback.print_exc()
+            log.exception("Processing failed: %s", e)
         finally:
-            self.processing = False
+            if not decided:
+                # Never block later bottles behind a failed one
+                self._queue_decision(ticket, None)
+            with self.in_flight_lock:
+                self.in_flight -= 1
+            self.ai.latency.commit(trace)
+    
+    def _queue_decision(self, ticket, decision, trace=None):
+        """
+        Send a decision to the Arduino in trigger order (never blocks on
+        earlier bottles; may be called from an inference worker thread)
+        
+        Args:
+            ticket: Trigger sequence number
+            decision: 'OK', 'NG', or None to skip this bottle
+            trace: LatencyTrace of the bottle ('decision_sent' is marked
+                once the command was written)
+        """
+        with self.decision_lock:
+            self.pending_decisions[ticket] = (decision, trace)
+            
+            # Send every decision that is now next in line
+            while self.next_decision in self.pending_decisions:
+                pending, pending_trace = self.pending_decisions.pop(self.next_decision)
+                self.next_decision += 1
+                if pending == 'OK':
+                    self.hardware.send_ok()
+                elif pending == 'NG':
+                    self.hardware.send_ng()
+                else:
+                    continue
+                if pending_trace:
+                    pending_trace.mark('decision_sent')
     
     def _display_result(self, result):
         """
         Display result in UI (called from main thread)
         
         Args:
-            result: Result dict from AI
+            result: InspectionResult from AI
         """
-        # Display annotated image
-        if 'annotated_image' in result:
-            img = result['annotated_image']
+        # Display annotated image (drawn after the decision went out)
+        img = self.ai.annotate(result)
+        if img is not None:
             img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
             img_rgb = cv2.resize(img_rgb, (640, 480))
             img_pil = Image.fromarray(img_rgb)
@@ -336,49 +468,53 @@ class MainWindow:
             self.snapshot_label.configure(image=imgtk)
         
         # Display result
-        decision = result['result']
+        decision = result.result
         if decision == 'OK':
             self.result_label.configure(text="✓ OK", fg='#27ae60', bg='#d5f4e6')
         else:
             self.result_label.configure(text="✗ NG", fg='#e74c3c', bg='#fadbd8')
         
         # Display reason
-        reason = result.get('reason', '')
-        self.reason_label.configure(text=reason)
+        self.reason_label.configure(text=result.reason)
         
         # Display processing time
-        proc_time = result.get('processing_time', 0)
-        self.time_label.configure(text=f"Processing: {proc_time*1000:.1f} ms")
+        self.time_label.configure(text=f"Processing: {result.processing_time*1000:.1f} ms | "
+                                       f"Decision: {result.decision_latency*1000:.1f} ms")
     
-    def _save_result(self, result):
+    def _save_result(self, result, trace=None):
         """
         Save result to database
         
         Args:
-            result: Result dict from AI
+            result: InspectionResult from AI
+            trace: LatencyTrace of the bottle (optional)
         """
         # Chia nhỏ: luôn cố gắng ghi DB, kể cả khi lưu ảnh bị lỗi
         image_path = ""
 
         # 1. Lưu ảnh (nếu có), không để lỗi ảnh chặn việc ghi DB
         try:
-            decision = result.get('result', 'UNKNOWN')
+            decision = result.result
             save_dir = "captures/ok" if decision == 'OK' else "captures/ng"
-            image = result.get('annotated_image')
+            image = self.ai.annotate(result)
 
             if image is not None:
                 image_path = self.camera.save_image(image, save_dir, decision)
         except Exception as e:
-            print(f"[ERROR] Failed to save image for result: {e}")
+            log.error("Failed to save image for result: %s", e)
+        if trace:
+            trace.mark('saved')
 
         # 2. Ghi đường dẫn ảnh (nếu thành công) vào result và luôn cố gắng ghi DB
         if image_path:
-            result['image_path'] = image_path
+            result.image_path = image_path
 
         try:
             self.database.add_inspection(result)
         except Exception as e:
-            print(f"[ERROR] Failed to add inspection to database: {e}")
+            log.error("Failed to add inspection to database: %s", e)
+        if trace:
+            trace.mark('persisted')
     
     def _update_statistics(self):
         """Update statistics display"""
@@ -399,7 +535,18 @@ class MainWindow:
             self.root.after(0, self.stats_label.configure, {'text': stats_text})
             
         except Exception as e:
-            print(f"[ERROR] Failed to update statistics: {e}")
+            log.error("Failed to update statistics: %s", e)
+    
+    def reload_model(self):
+        """Load the model folder again in the background and swap it in"""
+        if not self.ai.is_ready():
+            return
+        if self.ai.reload_model():
+            print("[UI] Model reload started (line keeps running)")
+    
+    def rollback_model(self):
+        """Switch back to the previous model"""
+        self.ai.rollback()
     
     def view_history(self):
         """Open history window"""